@@ -0,0 +1,230 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from src.core.engine import *
+from src.core.serial_pool import SerialPortPool
+from src.core.station import *
+from src.devices.emulator import *
+
+# ========================== BENCH STATS: START ==========================
+_BENCH_MODEL = "BENCH"
+_BENCH_SSN2 = "SSN2-BENCH"
+_BENCH_SSN8 = "SSN8-BENCH"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q: 0..100), 0.0 nếu không có mẫu."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100.0 * len(ordered) + 0.4999)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "n": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+# ========================== BENCH STATS: END ==========================
+
+# ========================== BENCH RUNNER: START ==========================
+def run_bench(
+    cycles: int = 100,
+    *,
+    mode: str = "2book",
+    book_gap: float = 0.0,
+    prefetch: bool = False,
+    adaptive: bool = False,
+    camera: EmulatorProfile = EmulatorProfile(latency=0.02),
+    golden_eye: EmulatorProfile = EmulatorProfile(),
+    sfc: EmulatorProfile = EmulatorProfile(),
+    seed: Optional[int] = 1,
+    trace_path: Optional[str] = None,
+    log_callback=print,
+) -> Dict:
+    """
+    Chạy `cycles` lần StationEngine.run_cycle (cùng flow với start_check)
+    trên FakeStation, trả dict kết quả (throughput, p50/p95/p99 từng stage).
+
+    book_gap: thời gian giả lập công nhân quét BOOK2 sau BOOK1 (giây).
+    prefetch=True: bắt đầu camera + Golden Eye ngay sau BOOK1 như [FLOW] prefetch.
+    trace_path: ghi span các cycle (Chrome trace JSON) sau khi chạy xong.
+    """
+    station = FakeStation(camera=camera, golden_eye=golden_eye, sfc=sfc, rotate=True, seed=seed)
+    pool = SerialPortPool(log_callback=lambda msg: None)
+    engine = StationEngine(
+        pool=pool,
+        ports=station.ports,
+        model_map={_BENCH_MODEL: {"SSN2": _BENCH_SSN2, "SSN8": _BENCH_SSN8}},
+        adaptive=AdaptiveTimeouts(pool.latency) if adaptive else None,
+        log_callback=lambda msg: None,
+    )
+    book2 = _BENCH_SSN8 if mode == "2book" else ""
+    totals: List[float] = []
+    stages: Dict[str, List[float]] = {name: [] for name in STAGES}
+    failures: Dict[str, int] = {}
+    passed = 0
+
+    try:
+        pool.prewarm([station.camera.path, station.golden_eye.path, station.sfc.path])
+        t_start = time.perf_counter()
+        for i in range(cycles):
+            t_unit = time.perf_counter()
+            ctx = engine.new_cycle(mode, _BENCH_MODEL, _BENCH_SSN2, book2)
+            ctx.t0 = t_unit
+            if prefetch:
+                engine.start_prefetch(ctx.unit_key)
+            if book_gap > 0:
+                time.sleep(book_gap)
+            res = engine.run_cycle(ctx)
+
+            totals.append(res.total)
+            for name, seconds in res.stages.items():
+                stages[name].append(seconds)
+            if res.ok:
+                passed += 1
+            else:
+                key = res.message.split("|", 1)[0].strip()
+                failures[key] = failures.get(key, 0) + 1
+            if log_callback is not None and (i + 1) % max(1, cycles // 10) == 0:
+                log_callback(f"[BENCH] {i + 1}/{cycles} cycles")
+        wall = time.perf_counter() - t_start
+        if trace_path:
+            engine.tracer.export_chrome(trace_path)
+    finally:
+        engine.close()
+        pool.close_all()
+        station.close()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "cycles": cycles,
+            "mode": mode,
+            "book_gap": book_gap,
+            "prefetch": prefetch,
+            "adaptive": adaptive,
+            "camera": vars(camera),
+            "golden_eye": vars(golden_eye),
+            "sfc": vars(sfc),
+            "seed": seed,
+        },
+        "wall": wall,
+        "passed": passed,
+        "failed": cycles - passed,
+        "failures": failures,
+        "units_per_hour": cycles / wall * 3600.0 if wall > 0 else 0.0,
+        "cycle": summarize(totals),
+        "stages": {name: summarize(values) for name, values in stages.items() if values},
+    }
+
+
+def format_report(result: Dict, baseline: Optional[Dict] = None) -> str:
+    """Bảng kết quả; có baseline thì thêm cột chênh lệch p50."""
+    lines = [
+        f"cycles={result['config']['cycles']} passed={result['passed']} failed={result['failed']} "
+        f"wall={result['wall']:.2f}s throughput={result['units_per_hour']:.0f} units/h",
+    ]
+    if baseline is not None:
+        base_uph = baseline.get("units_per_hour", 0.0)
+        if base_uph:
+            lines[0] += f" ({(result['units_per_hour'] / base_uph - 1.0) * 100:+.1f}% vs baseline)"
+
+    header = f"{'stage':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    if baseline is not None:
+        header += f"{'Δp50':>9}"
+    lines.append(header)
+    rows = [("cycle", result["cycle"], (baseline or {}).get("cycle"))]
+    rows += [
+        (name, stats, (baseline or {}).get("stages", {}).get(name))
+        for name, stats in result["stages"].items()
+    ]
+    for name, stats, base in rows:
+        row = f"{name:<12}" + "".join(f"{stats[k] * 1000:>7.1f}ms" for k in ("p50", "p95", "p99", "max"))
+        if baseline is not None:
+            row += f"{(stats['p50'] - base['p50']) * 1000:>+7.1f}ms" if base else f"{'-':>9}"
+        lines.append(row)
+    for message, count in result["failures"].items():
+        lines.append(f"  {count}x {message}")
+    return "\n".join(lines)
+# ========================== BENCH RUNNER: END ==========================
+
+# ========================== BENCH CLI: START ==========================
+def _profile(latency: float, args) -> EmulatorProfile:
+    return EmulatorProfile(
+        latency=latency,
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        drop_rate=args.drop_rate,
+        garbage_rate=args.garbage_rate,
+        chunk=args.chunk,
+    )
+
+
+def _main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.bench",
+        description="Benchmark cycle start_check (StationEngine) trên thiết bị giả (pty).",
+    )
+    parser.add_argument("-n", "--cycles", type=int, default=100)
+    parser.add_argument("--mode", choices=("1book", "2book"), default="2book")
+    parser.add_argument("--book-gap", type=float, default=0.0, help="giây giữa BOOK1 và BOOK2")
+    parser.add_argument("--prefetch", action="store_true")
+    parser.add_argument("--adaptive", action="store_true", help="dùng AdaptiveTimeouts")
+    parser.add_argument("--camera-latency", type=float, default=0.02)
+    parser.add_argument("--golden-eye-latency", type=float, default=0.05)
+    parser.add_argument("--sfc-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0)
+    parser.add_argument("--chunk", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="ghi kết quả JSON ra file")
+    parser.add_argument("--baseline", help="file JSON của lần chạy trước để so sánh")
+    parser.add_argument("--trace", help="ghi Chrome trace JSON (chrome://tracing / Perfetto)")
+    args = parser.parse_args(argv)
+
+    result = run_bench(
+        args.cycles,
+        mode=args.mode,
+        book_gap=args.book_gap,
+        prefetch=args.prefetch,
+        adaptive=args.adaptive,
+        camera=_profile(args.camera_latency, args),
+        golden_eye=_profile(args.golden_eye_latency, args),
+        sfc=_profile(args.sfc_latency, args),
+        seed=args.seed,
+        trace_path=args.trace,
+        log_callback=lambda msg: print(msg, file=sys.stderr),
+    )
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    print(format_report(result, baseline))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 0
+# ========================== BENCH CLI: END ==========================
+
+__all__ = [
+    "percentile",
+    "summarize",
+    "run_bench",
+    "format_report",
+]
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -0,0 +1,269 @@
+import asyncio
+import contextlib
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Dict, Optional, Tuple, TypeVar
+import serial
+from src.core.core import CAMERA_CMD, SFCResult, SFCStreamParser
+from src.core.core import _decode_frame
+from src.core.serial_pool import SerialPortPool
+from src.core.serial_reader import PortResponse, UNTIL_FRAME, UNTIL_STATUS
+from src.core.station import *
+
+T = TypeVar("T")
+
+# ========================== ASYNC SERIAL IO: START ==========================
+class AsyncSerialIO:
+    """
+    API async cho lớp I/O trạm, chạy trên SerialPortPool + reader thread.
+
+    Mỗi exchange là 1 Future của PortChannel được bọc bằng asyncio.wrap_future,
+    nên không chiếm thread nào khi chờ. Cancel task -> bỏ request ngay,
+    port sẵn sàng cho lần gửi tiếp theo.
+
+    Usage:
+        io = AsyncSerialIO(pool)
+        sn = await io.scan("COM5")
+        ok, msg = await io.send_and_wait("DSN=...,END", port="COM8", read_timeout=10)
+    """
+
+    def __init__(
+        self,
+        pool: Optional[SerialPortPool] = None,
+        baudrate: int = 9600,
+        log_callback=print,
+        lease_timeout: Optional[float] = None,
+    ):
+        self.pool = pool or SerialPortPool(baudrate=baudrate, log_callback=log_callback)
+        self._baudrate = baudrate
+        self._log = log_callback
+        # thời gian tối đa chờ port rảnh (code sync khác đang giữ lease),
+        # None -> bằng timeout của chính request
+        self.lease_timeout = lease_timeout
+        # 1 event loop phục vụ nhiều trạm: xếp hàng theo port bằng asyncio.Lock,
+        # không block loop bằng threading.Lock của pool
+        self._port_locks: Dict[str, asyncio.Lock] = {}
+
+    def _port_lock(self, port: str) -> asyncio.Lock:
+        lock = self._port_locks.get(port)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._port_locks[port] = lock
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def _lease(self, port: str, acquire_timeout: float):
+        """
+        pool.lease() trong executor: chờ threading.Lock của port (code sync có thể
+        đang giữ) và serial open đều là blocking -> không chạy trên event loop.
+        """
+        loop = asyncio.get_running_loop()
+        lease = self.pool.lease(port, self._baudrate, acquire_timeout=acquire_timeout)
+        entered = loop.run_in_executor(None, lease.__enter__)
+        try:
+            ch = await asyncio.shield(entered)
+        except asyncio.CancelledError:
+            # executor vẫn có thể lấy được port sau khi task bị cancel -> trả lại ngay
+            entered.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None or lease.__exit__(None, None, None)
+            )
+            raise
+        try:
+            yield ch
+        except BaseException as e:
+            if not lease.__exit__(type(e), e, e.__traceback__):
+                raise
+        else:
+            lease.__exit__(None, None, None)
+
+    async def exchange(self, port: str, payload: bytes, until: str, timeout: float, parser=None) -> PortResponse:
+        """
+        Gửi payload, chờ response tối đa `timeout` giây (await được, cancel được).
+        Port đang bị giữ -> chờ tối đa lease_timeout (mặc định = timeout) rồi SerialException.
+        """
+        acquire_timeout = timeout if self.lease_timeout is None else self.lease_timeout
+        async with self._port_lock(port):
+            async with self._lease(port, acquire_timeout) as ch:
+                fut: Future = ch.submit(payload, until, parser)
+                try:
+                    return await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+                except asyncio.TimeoutError:
+                    return ch.abandon(fut)
+                except asyncio.CancelledError:
+                    ch.abandon(fut, record_latency=False)
+                    raise
+
+    async def scan(self, port: str = "COM5", timeout_sec: float = 5.0) -> Optional[bytes]:
+        """Bản async của control_comscan."""
+        try:
+            resp = await self.exchange(port, CAMERA_CMD, UNTIL_FRAME, timeout_sec)
+        except serial.SerialException as e:
+            self._log(f"[ERROR] Serial error on {port}: {e}")
+            return None
+        return resp.data if resp.frames else None
+
+    async def send_and_wait(
+        self,
+        text: str,
+        port: str = "COM7",
+        write_append_crlf: bool = True,
+        read_timeout: float = 5.0,
+    ) -> Tuple[bool, str]:
+        """Bản async của send_text_and_wait, cùng kiểu trả về (ok, message)."""
+        send_str = text + ("\r\n" if write_append_crlf else "")
+        try:
+            resp = await self.exchange(port, send_str.encode("utf-8"), UNTIL_STATUS, read_timeout)
+        except serial.SerialException as e:
+            self._log(f"[ERROR] Serial error on {port}: {e}")
+            return False, f"Serial error: {e}"
+
+        response = "\n".join(_decode_frame(frame) for frame in resp.frames)
+        if "FAIL" in response or "ERRO" in response:
+            return False, f"{port} FAIL - {response.strip()}"
+        if response:
+            return True, response.strip()
+        return False, "No response (timeout)"
+
+    async def send_and_parse(
+        self,
+        text: str,
+        port: str = "COM7",
+        write_append_crlf: bool = True,
+        read_timeout: float = 5.0,
+    ) -> Tuple[bool, str, SFCResult]:
+        """Bản async của send_and_parse: (ok, message, SFCResult)."""
+        empty = SFCResult(dsn=None, status=None, fields={})
+        send_str = text + ("\r\n" if write_append_crlf else "")
+        try:
+            resp = await self.exchange(
+                port, send_str.encode("utf-8"), UNTIL_STATUS, read_timeout, parser=SFCStreamParser()
+            )
+        except serial.SerialException as e:
+            self._log(f"[ERROR] Serial error on {port}: {e}")
+            return False, f"Serial error: {e}", empty
+
+        res: SFCResult = resp.parsed or empty
+        response = _decode_frame(resp.data).strip()
+        if res.status in ("FAIL", "ERRO"):
+            return False, f"{port} FAIL - {response}", res
+        if response:
+            return True, response, res
+        return False, "No response (timeout)", res
+
+    def close(self) -> None:
+        self.pool.close_all()
+# ========================== ASYNC SERIAL IO: END ==========================
+
+# ========================== ASYNC STATION FLOW: START ==========================
+class AsyncStationFlow:
+    """
+    Chuỗi start_check (camera -> Golden Eye // SFC lần 1 -> SFC confirm)
+    dạng coroutine. Mỗi bước có timeout riêng; cancel task là dừng ngay
+    exchange đang treo.
+
+    Usage:
+        flow = AsyncStationFlow(io, StationPorts("COM5", "COM4", "COM8"))
+        ok, msg = await flow.run(mode="2book", book1=..., book2=...,
+                                 expected_ssn2=..., expected_ssn8=...)
+    """
+
+    def __init__(
+        self,
+        io: AsyncSerialIO,
+        ports: StationPorts,
+        timeouts: StepTimeouts = StepTimeouts(),
+        log_callback=print,
+    ):
+        self.io = io
+        self.ports = ports
+        self.timeouts = timeouts
+        self._log = log_callback
+        self.dsn: str = ""
+
+    async def run(
+        self,
+        *,
+        mode: str,
+        book1: str,
+        book2: str,
+        expected_ssn2: str,
+        expected_ssn8: str,
+        upc: str = "",
+    ) -> Tuple[bool, str]:
+        fail_msg = check_books(mode, book1, book2, expected_ssn2, expected_ssn8)
+        if fail_msg:
+            return False, fail_msg
+
+        scan = await self.io.scan(self.ports.camera, timeout_sec=self.timeouts.camera)
+        if scan is None:
+            return False, f"FAIL:{self.ports.camera} - No response from camera"
+        scanned_sn = clean_scanned_sn(scan)
+        self._log(f"scanned SN: {scanned_sn}")
+
+        # Golden Eye và SFC lần 1 chỉ cần SN đã quét -> chạy song song
+        (ok_ge, _, res_ge), (ok1, _, res1) = await asyncio.gather(
+            self.io.send_and_parse(scanned_sn, port=self.ports.golden_eye, read_timeout=self.timeouts.golden_eye),
+            self.io.send_and_parse(f"DSN={scanned_sn},END", port=self.ports.sfc, read_timeout=self.timeouts.sfc_query),
+        )
+        if not ok_ge:
+            return False, f"FAIL:{self.ports.golden_eye} - No response from Golden Eye!"
+        fail_msg = check_golden_eye(res_ge, scanned_sn, self.ports.golden_eye)
+        if fail_msg:
+            return False, fail_msg
+        dsn = scanned_sn
+        self.dsn = dsn
+        usb_cable = str(res_ge.fields.get("SSN4", ""))
+
+        if not ok1:
+            return False, "FAIL: ERROR: No response from COM SFC"
+        fail_msg = check_sfc_query(dsn, usb_cable, upc, res1)
+        if fail_msg:
+            return False, fail_msg
+
+        book1, book2 = confirm_books(mode, book1, book2)
+        ok2, _ = await self.io.send_and_wait(
+            confirm_payload(dsn, book1, book2), port=self.ports.sfc, read_timeout=self.timeouts.sfc_confirm
+        )
+        if not ok2:
+            return False, "FAIL: ERROR: Reponse 2 FAIL"
+        return True, "ALL PASSED"
+# ========================== ASYNC STATION FLOW: END ==========================
+
+# ========================== STATION LOOP THREAD: START ==========================
+class StationLoop:
+    """
+    1 thread chạy asyncio event loop, dùng chung cho nhiều trạm.
+    Gọi từ thread khác (vd. Tk main thread) qua submit() -> concurrent Future,
+    future.cancel() sẽ cancel coroutine tương ứng trên loop.
+    """
+
+    def __init__(self, name: str = "StationLoop"):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        if not self._loop.is_running():
+            self._loop.close()
+# ========================== STATION LOOP THREAD: END ==========================
+
+__all__ = [
+    "AsyncSerialIO",
+    "AsyncStationFlow",
+    "StationLoop",
+]
@@ -0,0 +1,366 @@
+import configparser
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from src.core.model_store import SqliteModelStore
+from src.core.station import StationPorts
+
+# ========================== STATION CONFIG: START ==========================
+_log = logging.getLogger(__name__)
+
+# Section không phải mã hàng trong config.ini
+RESERVED_SECTIONS: Tuple[str, ...] = ("COM", "FLOW", "TIMEOUT", "MODELS", "LOG", "KPI", "UI")
+
+# [COM] bắt buộc có, thiếu key nào thì bổ sung khi load
+COM_DEFAULTS = {
+    "camera_comscan": "COM5",
+    "sfc_com": "COM8",
+    "golden_eye_com": "COM4",
+}
+
+
+def is_model_section(section: str) -> bool:
+    return section.upper() not in RESERVED_SECTIONS
+
+
+def _reserved_model_sections(cfg: configparser.ConfigParser) -> Tuple[str, ...]:
+    """Section trùng tên section hệ thống ([UI], [KPI]...) nhưng có SSN2/SSN8 -> mã hàng bị che."""
+    return tuple(
+        section for section in cfg.sections()
+        if not is_model_section(section) and (cfg.has_option(section, "SSN2") or cfg.has_option(section, "SSN8"))
+    )
+
+
+@dataclass(frozen=True)
+class StationConfig:
+    """
+    Snapshot bất biến của config.ini tại 1 thời điểm.
+    model_map: { "53-100252": {"SSN2": "...", "SSN8": "..."}, ... } (read-only)
+    ssn_index: index ngược SSN2/SSN8 -> các mã hàng có SSN đó
+    """
+    ports: StationPorts = StationPorts()
+    model_map: Mapping[str, Mapping[str, str]] = field(default_factory=lambda: MappingProxyType({}))
+    ssn_index: Mapping[str, Tuple[str, ...]] = field(default_factory=lambda: MappingProxyType({}))
+    flow_prefetch: bool = False
+    flow_pipeline: bool = False
+    timeout_adaptive: bool = False
+    timeout_floor: float = 1.0
+    timeout_ceiling: Optional[float] = None
+    timeout_percentile: float = 0.99
+    timeout_margin: float = 2.0
+    log_profile: str = "debug"
+    kpi_journal: str = "kpi.journal"
+    kpi_fsync_interval: float = 1.0
+    ui_fps: float = 20.0
+    ui_poll_ms: int = 10
+    version: int = 0
+
+    @property
+    def model_codes(self) -> list:
+        return sorted(self.model_map.keys())
+
+    def detect_models(self, book1: str, mode: str = "2book") -> Tuple[str, ...]:
+        """
+        Các mã hàng khớp với BOOK1 vừa quét (tra index, không duyệt model_map).
+        2book: BOOK1 phải là SSN2; 1book: SSN2 hoặc SSN8 đều được (như check_books).
+        """
+        codes = self.ssn_index.get(book1.strip(), ())
+        if mode == "2book":
+            codes = tuple(code for code in codes if self.model_map[code]["SSN2"] == book1.strip())
+        return codes
+
+
+def build_ssn_index(model_map: Mapping[str, Mapping[str, str]]) -> Dict[str, Tuple[str, ...]]:
+    """{ ssn: (model_code, ...) } cho mọi SSN2/SSN8 khác rỗng."""
+    index: Dict[str, List[str]] = {}
+    for code, info in model_map.items():
+        for ssn in {info.get("SSN2", ""), info.get("SSN8", "")}:
+            if ssn:
+                index.setdefault(ssn, []).append(code)
+    return {ssn: tuple(sorted(codes)) for ssn, codes in index.items()}
+
+
+def _with_model(snap: StationConfig, code: str, ssn2: str, ssn8: str) -> StationConfig:
+    """
+    Snapshot mới = snap + 1 mã hàng thêm / sửa: chỉ sửa các SSN của mã hàng đó trong index
+    (không đọc lại config.ini / DB, không dựng lại index). Vẫn copy 2 dict (O(số model))
+    vì snapshot cũ phải giữ nguyên cho worker đang dùng.
+    """
+    info = {"SSN2": ssn2.strip(), "SSN8": ssn8.strip()}
+    models = dict(snap.model_map)
+    old = models.get(code)
+    models[code] = MappingProxyType(info)
+
+    index = dict(snap.ssn_index)
+    if old is not None:
+        for ssn in {old.get("SSN2", ""), old.get("SSN8", "")}:
+            codes = tuple(c for c in index.get(ssn, ()) if c != code)
+            if codes:
+                index[ssn] = codes
+            else:
+                index.pop(ssn, None)
+    for ssn in {info["SSN2"], info["SSN8"]}:
+        if ssn:
+            index[ssn] = tuple(sorted(set(index.get(ssn, ())) | {code}))
+    return replace(
+        snap,
+        model_map=MappingProxyType(models),
+        ssn_index=MappingProxyType(index),
+        version=snap.version + 1,
+    )
+
+
+def _ini_models(cfg: configparser.ConfigParser) -> Dict[str, Dict[str, str]]:
+    return {
+        section: {
+            "SSN2": cfg.get(section, "SSN2", fallback="").strip(),
+            "SSN8": cfg.get(section, "SSN8", fallback="").strip(),
+        }
+        for section in cfg.sections()
+        if is_model_section(section)
+    }
+
+
+def _ini_rows(model_map: Mapping[str, Mapping[str, str]]) -> Tuple[Tuple[str, str, str], ...]:
+    return tuple(sorted((code, info["SSN2"], info["SSN8"]) for code, info in model_map.items()))
+
+
+def _parse(
+    cfg: configparser.ConfigParser,
+    version: int,
+    model_map: Optional[Mapping[str, Mapping[str, str]]] = None,
+) -> StationConfig:
+    if model_map is None:
+        model_map = _ini_models(cfg)
+    models = {code: MappingProxyType(dict(info)) for code, info in model_map.items()}
+
+    return StationConfig(
+        ports=StationPorts(
+            camera=cfg.get("COM", "camera_comscan", fallback="COM5").strip(),
+            golden_eye=cfg.get("COM", "golden_eye_com", fallback="COM4").strip(),
+            sfc=cfg.get("COM", "sfc_com", fallback="COM8").strip(),
+        ),
+        model_map=MappingProxyType(models),
+        ssn_index=MappingProxyType(build_ssn_index(models)),
+        # [FLOW] (tuỳ chọn) prefetch = true -> quét camera sớm sau BOOK1
+        flow_prefetch=cfg.getboolean("FLOW", "prefetch", fallback=False),
+        # [FLOW] (tuỳ chọn) pipeline = true -> mở input unit sau trong lúc chờ SFC confirm
+        flow_pipeline=cfg.getboolean("FLOW", "pipeline", fallback=False),
+        # [TIMEOUT] (tuỳ chọn) adaptive = true -> timeout = percentile độ trễ * margin,
+        # kẹp trong [floor, ceiling] giây (ceiling trống -> timeout mặc định từng bước)
+        timeout_adaptive=cfg.getboolean("TIMEOUT", "adaptive", fallback=False),
+        timeout_floor=cfg.getfloat("TIMEOUT", "floor", fallback=1.0),
+        timeout_ceiling=cfg.getfloat("TIMEOUT", "ceiling", fallback=None),
+        timeout_percentile=cfg.getfloat("TIMEOUT", "percentile", fallback=99.0) / 100.0,
+        timeout_margin=cfg.getfloat("TIMEOUT", "margin", fallback=2.0),
+        # [LOG] (tuỳ chọn) profile = quiet -> bỏ log debug từng frame, console chỉ WARNING
+        log_profile=cfg.get("LOG", "profile", fallback="debug").strip().lower(),
+        # [KPI] (tuỳ chọn) journal = file nhật ký KPI (tương đối theo thư mục config.ini,
+        # trống -> tắt), fsync_interval = số giây giữa 2 lần ghi + fsync
+        kpi_journal=cfg.get("KPI", "journal", fallback="kpi.journal").strip(),
+        kpi_fsync_interval=cfg.getfloat("KPI", "fsync_interval", fallback=1.0),
+        # [UI] (tuỳ chọn) fps = số lần vẽ lại tối đa / giây của KPI, status, Main Cause,
+        # poll_ms = chu kỳ (ms) Tk thread rút kết quả từ worker thread
+        ui_fps=cfg.getfloat("UI", "fps", fallback=20.0),
+        ui_poll_ms=cfg.getint("UI", "poll_ms", fallback=10),
+        version=version,
+    )
+# ========================== STATION CONFIG: END ==========================
+
+# ========================== CONFIG STORE: START ==========================
+class ConfigStore:
+    """
+    Đọc config.ini 1 lần, các lần sau chỉ os.stat() (tối đa 1 lần / check_interval giây).
+    File đổi (mtime/size) -> parse lại, trả snapshot StationConfig mới.
+    Snapshot bất biến nên worker thread dùng thoải mái, không cần lock.
+
+    [MODELS] store = sqlite -> mã hàng nằm trong SqliteModelStore (db = models.db),
+    section mã hàng trong config.ini bị bỏ qua (lần đầu DB rỗng thì được import sang).
+
+    Usage:
+        store = ConfigStore(get_config_path())
+        cfg = store.snapshot()          # rẻ, gọi mỗi cycle được
+        cfg.ports.sfc, cfg.model_map["53-100252"]["SSN2"]
+        store.save_models(new_map)      # ghi model, giữ [COM]/[FLOW]/[TIMEOUT]
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int, int]] = None  # (mtime_ns, size, db_version)
+        self._checked = 0.0
+        self._snapshot = StationConfig()
+        self.models: Optional[SqliteModelStore] = None
+        self._ignored_ini: Tuple[Tuple[str, str, str], ...] = ()
+        self._hidden_models: Tuple[str, ...] = ()
+        self.reload()
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        db_version = self.models.data_version() if self.models is not None else 0
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, db_version
+
+    def _open_models(self, cfg: configparser.ConfigParser) -> Optional[SqliteModelStore]:
+        """[MODELS] store = sqlite -> mở DB (1 lần), None nếu dùng section trong config.ini."""
+        if cfg.get("MODELS", "store", fallback="ini").strip().lower() != "sqlite":
+            if self.models is not None:
+                self.models.close()
+                self.models = None
+            return None
+        db_path = self.path.parent / cfg.get("MODELS", "db", fallback="models.db").strip()
+        if self.models is None or self.models.path != db_path:
+            if self.models is not None:
+                self.models.close()
+            self.models = SqliteModelStore(db_path)
+            ini_models = _ini_models(cfg)
+            if ini_models and not self.models.count():
+                self.models.import_map(ini_models)
+                self._ignored_ini = _ini_rows(ini_models)
+        self._warn_ignored_ini(cfg)
+        return self.models
+
+    def _warn_ignored_ini(self, cfg: configparser.ConfigParser) -> None:
+        """store = sqlite: section mã hàng trong config.ini không còn tác dụng -> báo mỗi khi chúng đổi."""
+        ignored = _ini_rows(_ini_models(cfg))
+        if ignored and ignored != self._ignored_ini:
+            codes = [row[0] for row in ignored]
+            _log.warning(
+                "[CONFIG] [MODELS] store = sqlite: %d model section(s) in %s are ignored, "
+                "edit models in %s instead (%s%s)",
+                len(codes), self.path.name, self.models.path.name,
+                ", ".join(codes[:5]), ", ..." if len(codes) > 5 else "",
+            )
+        self._ignored_ini = ignored
+
+    def _warn_hidden_models(self, cfg: configparser.ConfigParser) -> None:
+        """Mã hàng trùng tên section hệ thống bị bỏ qua khi đọc -> báo mỗi khi danh sách đổi."""
+        hidden = _reserved_model_sections(cfg)
+        if hidden and hidden != self._hidden_models:
+            _log.warning(
+                "[CONFIG] model section(s) %s in %s use a reserved section name %s and are ignored, "
+                "rename the model code",
+                ", ".join(f"[{name}]" for name in hidden), self.path.name, "/".join(RESERVED_SECTIONS),
+            )
+        self._hidden_models = hidden
+
+    def _read(self) -> configparser.ConfigParser:
+        cfg = configparser.ConfigParser()
+        if self.path.exists():
+            cfg.read(self.path, encoding="utf-8")
+        return cfg
+
+    def _write(self, cfg: configparser.ConfigParser) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            cfg.write(f)
+
+    def reload(self) -> StationConfig:
+        """Parse lại config.ini (bổ sung [COM] nếu thiếu, chỉ ghi file khi có thay đổi)."""
+        with self._lock:
+            cfg = self._read()
+            changed = False
+            if not cfg.has_section("COM"):
+                cfg.add_section("COM")
+                changed = True
+            for k, v in COM_DEFAULTS.items():
+                if not cfg.has_option("COM", k):
+                    cfg.set("COM", k, v)
+                    changed = True
+            if changed:
+                try:
+                    self._write(cfg)
+                except OSError:
+                    pass
+
+            self._warn_hidden_models(cfg)
+            models = self._open_models(cfg)
+            self._stamp = self._stat()
+            self._checked = time.monotonic()
+            self._snapshot = _parse(
+                cfg, self._snapshot.version + 1, models.all() if models is not None else None
+            )
+            return self._snapshot
+
+    def snapshot(self) -> StationConfig:
+        """Snapshot hiện tại; file đổi từ lần check trước -> reload."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._snapshot
+        self._checked = now
+        if self._stat() != self._stamp:
+            return self.reload()
+        return self._snapshot
+
+    def save_models(self, model_map: Mapping[str, Mapping[str, str]]) -> StationConfig:
+        """
+        Ghi toàn bộ model_map: vào SQLite nếu bật, ngược lại ra file ini
+        nhưng GIỮ các section [COM]/[FLOW]/[TIMEOUT]/[MODELS]/[LOG]/[KPI]/[UI].
+        """
+        if self.models is not None:
+            self.models.upsert_many(
+                ((code, info.get("SSN2", ""), info.get("SSN8", "")) for code, info in model_map.items()),
+                replace=True,
+            )
+            return self.reload()
+        with self._lock:
+            cfg = self._read()
+            # Xóa hết section model cũ
+            for sec in list(cfg.sections()):
+                if is_model_section(sec):
+                    cfg.remove_section(sec)
+
+            # Ghi lại model sections (mã trùng section hệ thống sẽ trộn vào [COM]/[UI]... -> bỏ)
+            for code, info in model_map.items():
+                if not is_model_section(code):
+                    _log.warning("[CONFIG] model code %r is a reserved section name, not saved", code)
+                    continue
+                if not cfg.has_section(code):
+                    cfg.add_section(code)
+                if info.get("SSN2"):
+                    cfg.set(code, "SSN2", info["SSN2"])
+                if info.get("SSN8"):
+                    cfg.set(code, "SSN8", info["SSN8"])
+            self._write(cfg)
+        return self.reload()
+
+    def upsert_model(self, code: str, ssn2: str, ssn8: str = "") -> StationConfig:
+        """
+        Thêm / sửa 1 mã hàng.
+        SQLite: ghi đúng 1 dòng, snapshot sửa tại chỗ (_with_model), không reload.
+        ini: ghi lại cả file + reload.
+        """
+        if self.models is not None:
+            code = code.strip()
+            self.models.upsert(code, ssn2, ssn8)
+            with self._lock:
+                self._snapshot = _with_model(self._snapshot, code, ssn2, ssn8)
+                return self._snapshot
+        if not is_model_section(code):
+            raise ValueError(f"Model code {code!r} trùng tên section hệ thống ({'/'.join(RESERVED_SECTIONS)})")
+        model_map = {c: dict(info) for c, info in self._snapshot.model_map.items()}
+        model_map[code] = {"SSN2": ssn2, "SSN8": ssn8}
+        return self.save_models(model_map)
+
+    def close(self) -> None:
+        if self.models is not None:
+            self.models.close()
+            self.models = None
+# ========================== CONFIG STORE: END ==========================
+
+__all__ = [
+    "RESERVED_SECTIONS",
+    "is_model_section",
+    "build_ssn_index",
+    "StationConfig",
+    "ConfigStore",
+]
@@ -1,39 +1,49 @@
-from typing import Dict, Optional, NamedTuple
-import re
+from typing import Dict, Optional, NamedTuple, Tuple
+import logging
 import serial
-import time
 from src.utils.utils import *
+from src.core.serial_pool import SerialPortPool
+from src.core.serial_reader import PortChannel, STATUS_TOKENS, UNTIL_FRAME, UNTIL_STATUS
+
+# Log debug từng frame: đi qua LogPipeline (capture "src"), profile quiet sẽ bỏ
+_log = logging.getLogger(__name__)
+
+def _open_channel(port: str, baudrate: int, pool: Optional[SerialPortPool] = None):
+    """
+    Có pool -> mượn channel đang mở sẵn (không open/close lại mỗi lần).
+    Không có pool -> mở channel mới, tự đóng khi ra khỏi with.
+    """
+    if pool is not None:
+        return pool.lease(port, baudrate)
+    return PortChannel(port, baudrate)
+
+def _decode_frame(frame: bytes) -> str:
+    try:
+        return frame.decode("utf-8")
+    except UnicodeDecodeError:
+        return frame.decode("latin-1", errors="ignore")
+
 # ========================== COM CAM SCANNER: control_comscan_camera START ==========================
+# Lệnh trigger camera: 16 54 0D (HEX: 0x16 0x54 0x0D)
+CAMERA_CMD = bytes([0x16, 0x54, 0x0D])
+
 def control_comscan(
     port: str = "COM5",
     baudrate: int = 9600,
     timeout_sec: float = 5.0,
     log_callback = print,
+    pool: Optional[SerialPortPool] = None,
 ) -> bytes | None:
-    # Lệnh: 16 54 0D (giả sử đây là HEX: 0x16 0x54 0x0D)
-    cmd = bytes([0x16, 0x54, 0x0D])
+    cmd = CAMERA_CMD
 
     try:
-        with serial.Serial(port, baudrate, timeout=0) as ser:
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-            ser.write(cmd)
-            ser.flush()
-
-            deadline = time.time() + timeout_sec
-            recv = bytearray()
-
-            while time.time() < deadline:
-                if ser.in_waiting:
-                    recv.extend(ser.read(ser.in_waiting))
-                if recv:
-                    break
-                time.sleep(0.01)
-
-            if recv:
-                return bytes(recv) # GT542A0154530005
-            else:
-                return None
+        # Reader thread trả frame đầu tiên ngay khi camera gửi xong (CR/LF hoặc im lặng)
+        with _open_channel(port, baudrate, pool) as ch:
+            resp = ch.exchange(cmd, until=UNTIL_FRAME, timeout=timeout_sec)
+
+        if resp.frames:
+            return resp.data # GT542A0154530005
+        return None
 
     except serial.SerialException as e:
         log_callback(f"[ERROR] Serial error on {port}: {e}")
@@ -46,6 +56,109 @@ class SFCResult(NamedTuple):
     status: Optional[str]
     fields: Dict[str, str]
 
+# , | ; và CR/LF đều là dấu phân cách token
+_SFC_SEPARATORS = bytes.maketrans(b"|;\r\n", b",,,,")
+# Status chuẩn PASS/FAIL/ERRO (như FrameAssembler); thiết bị cũ gửi ERROR -> ERRO
+_SFC_STATUS = tuple(tok.encode("ascii") for tok in STATUS_TOKENS)
+_SFC_STATUS_ALIAS = {b"ERROR": b"ERRO"}
+
+
+class SFCStreamParser:
+    """
+    Parser SFC / Golden Eye dạng stream: nhận byte tới đâu tách token tới đó,
+    1 lần duyệt, không nối chuỗi theo dòng, không regex.
+
+        parser = SFCStreamParser()
+        parser.feed(b"DSN=ABC,SS")          # -> None (chưa có status)
+        parser.feed(b"N4=123,PASS\r\n")     # -> SFCResult(dsn="ABC", status="PASS", ...)
+
+    stop_at_status=True: dừng ngay khi gặp PASS/ERRO/FAIL (dùng khi đọc từ port).
+    Token cuối chưa có dấu phân cách (vd. "...,FAIL" có thể còn "URE_CODE=3" tới sau)
+    chỉ được coi là status khi reply đã hết: idle() (port im lặng) hoặc finish().
+    stop_at_status=False: đọc hết chuỗi, status cuối cùng thắng (như parser cũ).
+    """
+
+    def __init__(self, stop_at_status: bool = True):
+        self.stop_at_status = stop_at_status
+        self.raw = bytearray()
+        self._partial = b""
+        self._first = True
+        self._fields: Dict[str, str] = {}
+        self._dsn: Optional[str] = None
+        self._status: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.stop_at_status and self._status is not None
+
+    def feed(self, data: bytes) -> Optional[SFCResult]:
+        """Trả SFCResult khi đã gặp status token, chưa có thì None."""
+        if self.done:
+            return self.result()
+        self.raw.extend(data)
+
+        parts = data.translate(_SFC_SEPARATORS).split(b",")
+        parts[0] = self._partial + parts[0]
+        self._partial = parts.pop()
+        for tok in parts:
+            self._token(tok)
+            if self.done:
+                return self.result()
+        return None
+
+    def idle(self) -> Optional[SFCResult]:
+        """
+        Port im lặng 1 idle_gap: token dở dang là status (thiết bị không gửi
+        dấu phân cách / xuống dòng sau status) -> coi reply đã xong.
+        """
+        if self.done or not self._partial:
+            return self.result() if self.done else None
+        tok = self._partial.strip().upper()
+        if _SFC_STATUS_ALIAS.get(tok, tok) not in _SFC_STATUS:
+            return None
+        self._token(self._partial)
+        self._partial = b""
+        return self.result()
+
+    def finish(self) -> SFCResult:
+        """Hết dữ liệu: xử lý nốt token dở dang và trả kết quả hiện có."""
+        if self._partial and not self.done:
+            self._token(self._partial)
+        self._partial = b""
+        return self.result()
+
+    def result(self) -> SFCResult:
+        return SFCResult(dsn=self._dsn, status=self._status, fields=dict(self._fields))
+
+    def _token(self, tok: bytes) -> None:
+        tok = tok.strip()
+        if not tok:
+            return
+        if self._first:
+            self._first = False
+            # Bỏ prefix "SFC:" nếu có (SFC: ..., hoặc SFC , ...)
+            if tok[:3].upper() == b"SFC":
+                head, sep, rest = tok.partition(b":")
+                tok = rest.strip() if sep else tok[3:].lstrip(b" :")
+                if not tok:
+                    return
+
+        key, eq, value = tok.partition(b"=")
+        if eq:
+            k = _decode_frame(key.strip()).upper()
+            v = _decode_frame(value.strip())
+            self._fields[k] = v
+            if k == "DSN":
+                self._dsn = v
+            return
+
+        # Không có '=', giả sử là status (PASS/ERRO/FAIL/…), token lạ bỏ qua
+        upper_tok = tok.upper()
+        upper_tok = _SFC_STATUS_ALIAS.get(upper_tok, upper_tok)
+        if upper_tok in _SFC_STATUS:
+            self._status = upper_tok.decode("ascii")
+
+
 def parse_sfc_response(raw: str,log_callback = print,) -> SFCResult:
     log_callback("Start Parsing")
     """
@@ -63,47 +176,11 @@ def parse_sfc_response(raw: str,log_callback = print,) -> SFCResult:
         log_callback(f"Parsed: Get none response")
         return SFCResult(dsn=None, status=None, fields={})
 
-    # Bỏ khoảng trắng đầu/đuôi + xuống dòng
-    s = raw.strip()
-
-    # Bỏ prefix "SFC:" nếu có
-    if s.upper().startswith("SFC"):
-        # SFC: ..., hoặc SFC , ...
-        # tách ra phần sau dấu ':' nếu có
-        parts = s.split(":", 1)
-        if len(parts) == 2:
-            s = parts[1].strip()
-        else:
-            # không có ':' thì cứ dùng lại s
-            s = s[3:].lstrip(" :")
-
-    # Tách token theo , ; | (có thể kèm khoảng trắng)
-    tokens = [tok.strip() for tok in re.split(r"[,\|;]", s) if tok.strip()]
-
-    fields: Dict[str, str] = {}
-    dsn: Optional[str] = None
-    status: Optional[str] = None
-
-    for tok in tokens:
-        # Nếu dạng key=value
-        if "=" in tok:
-            key, value = tok.split("=", 1)
-            key = key.strip().upper()
-            value = value.strip()
-            fields[key] = value
-
-            if key == "DSN":
-                dsn = value
-        else:
-            # Không có '=', giả sử là status (PASS/ERRO/FAIL/…)
-            upper_tok = tok.upper()
-            if upper_tok in ("PASS", "ERRO", "FAIL", "ERROR"):
-                status = upper_tok
-            else:
-                # token lạ thì có thể bỏ qua hoặc log lại tùy ý
-                pass
-    log_callback(f"Parsed: STATUS={status} | DSN={dsn} | FIELDS={fields}")
-    return SFCResult(dsn=dsn, status=status, fields=fields)
+    parser = SFCStreamParser(stop_at_status=False)
+    parser.feed(raw.strip().encode("utf-8"))
+    res = parser.finish()
+    log_callback(f"Parsed: STATUS={res.status} | DSN={res.dsn} | FIELDS={res.fields}")
+    return res
 
 # ========================== SFC Parser: END ==========================
 
@@ -115,6 +192,7 @@ def send_text_and_wait(
     write_append_crlf: bool = True,
     read_timeout: float = 5.0,
     log_callback = print,
+    pool: Optional[SerialPortPool] = None,
 ):
     """
     Gửi chuỗi text ra cổng COM rồi chờ response tối đa read_timeout giây.
@@ -124,49 +202,78 @@ def send_text_and_wait(
         (False, message)      nếu timeout hoặc lỗi
     """
     try:
-        # timeout=0 để tự mình quản lý timeout bằng vòng while + time.time()
-        with serial.Serial(port, baudrate, timeout=0) as ser:
-            # ---- GỬI DỮ LIỆU ----
-            send_str = text + ("\r\n" if write_append_crlf else "")
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-            ser.write(send_str.encode("utf-8"))
-            ser.flush()
-
-            # ---- CHỜ RESPONSE ----
-            deadline = time.time() + read_timeout
-            response = ""
-
-            while time.time() < deadline:
-                line = ser.readline()  # đọc theo \n, nếu thiết bị gửi dạng text
-                if line:
-                    try:
-                        decoded = line.decode("utf-8")
-                    except UnicodeDecodeError:
-                        decoded = line.decode("latin-1", errors="ignore")
-
-                    response += decoded
-                    print(f"[debug][{port}] -> {decoded!r}")
-
-                    if "PASS" in response or "ERRO" in response or "FAIL" in response:
-                        break
-                else:
-                    time.sleep(0.01)
-
-            if "FAIL" in response or "ERRO" in response:
-                res = response.strip()
-                return False, f"{port} FAIL - {res}"
-            if response:
-                return True, response.strip()
-            return False, "No response (timeout)"
+        # Reader thread của port báo về ngay khi có frame chứa PASS/ERRO/FAIL
+        # pool != None -> dùng lại channel đang mở của SerialPortPool
+        send_str = text + ("\r\n" if write_append_crlf else "")
+        with _open_channel(port, baudrate, pool) as ch:
+            resp = ch.exchange(send_str.encode("utf-8"), until=UNTIL_STATUS, timeout=read_timeout)
+
+        lines = [_decode_frame(frame) for frame in resp.frames]
+        if _log.isEnabledFor(logging.DEBUG):
+            for decoded in lines:
+                _log.debug("[%s] -> %r", port, decoded)
+        response = "\n".join(lines)
+
+        if "FAIL" in response or "ERRO" in response:
+            res = response.strip()
+            return False, f"{port} FAIL - {res}"
+        if response:
+            return True, response.strip()
+        return False, "No response (timeout)"
 
     except serial.SerialException as e:
         log_callback(f"[ERROR] Serial error on {port}: {e}")
         return False, f"Serial error: {e}"
+
+
+def send_and_parse(
+    text: str,
+    port: str = "COM7",
+    baudrate: int = 9600,
+    write_append_crlf: bool = True,
+    read_timeout: float = 5.0,
+    log_callback = print,
+    pool: Optional[SerialPortPool] = None,
+) -> Tuple[bool, str, SFCResult]:
+    """
+    Như send_text_and_wait nhưng parse response ngay trong reader thread
+    (SFCStreamParser), trả về luôn SFCResult khi status token vừa tới.
+
+    Return:
+        (ok, message, SFCResult)
+        ok=False nếu status là FAIL/ERRO, timeout không có dữ liệu hoặc lỗi serial.
+    """
+    empty = SFCResult(dsn=None, status=None, fields={})
+    try:
+        send_str = text + ("\r\n" if write_append_crlf else "")
+        with _open_channel(port, baudrate, pool) as ch:
+            resp = ch.exchange(
+                send_str.encode("utf-8"),
+                until=UNTIL_STATUS,
+                timeout=read_timeout,
+                parser=SFCStreamParser(),
+            )
+    except serial.SerialException as e:
+        log_callback(f"[ERROR] Serial error on {port}: {e}")
+        return False, f"Serial error: {e}", empty
+
+    res: SFCResult = resp.parsed or empty
+    response = _decode_frame(resp.data).strip()
+    log_callback(f"[{port}] -> {response!r} | STATUS={res.status} | DSN={res.dsn} | FIELDS={res.fields}")
+
+    if res.status in ("FAIL", "ERRO"):
+        return False, f"{port} FAIL - {response}", res
+    if response:
+        return True, response, res
+    return False, "No response (timeout)", res
 # ========================== Send Text to COM(x): END ==========================
 
 __all__ = [
+    "CAMERA_CMD",
     "control_comscan",
     "parse_sfc_response",
+    "SFCResult",
+    "SFCStreamParser",
     "send_text_and_wait",
+    "send_and_parse",
 ]
\ No newline at end of file
@@ -0,0 +1,279 @@
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Hashable, Mapping, Optional, Tuple
+from src.core.core import *
+from src.core.serial_pool import SerialPortPool
+from src.core.station import *
+from src.core.trace import Tracer
+
+# model_map: { "53-100252": {"SSN2": "...", "SSN8": "..."}, ... }
+ModelMap = Mapping[str, Mapping[str, str]]
+
+# ========================== CYCLE RESULT: START ==========================
+STAGES = ("config", "camera", "golden_eye", "sfc_query", "sfc_confirm")
+
+
+@dataclass
+class CycleResult:
+    """
+    Kết quả 1 cycle: ok/message như start_check cũ + thời gian từng stage (giây).
+    Golden Eye và SFC lần 1 chạy song song nên tổng các stage có thể > total.
+    """
+    seq: int
+    ok: bool
+    message: str
+    dsn: str = ""
+    stages: Dict[str, float] = field(default_factory=dict)
+    total: float = 0.0
+    prefetched: bool = False
+
+    def stage_summary(self) -> str:
+        return " ".join(f"{name}={self.stages[name]:.3f}s" for name in STAGES if name in self.stages)
+# ========================== CYCLE RESULT: END ==========================
+
+# ========================== STATION ENGINE: START ==========================
+class StationEngine:
+    """
+    Flow kiểm tra 1 unit, không phụ thuộc Tk:
+        config -> camera -> (Golden Eye // SFC lần 1) -> so sánh -> SFC confirm
+
+    - config_loader(): trả (StationPorts, model_map) mới nhất, gọi đầu mỗi cycle.
+      Mặc định trả ports/model_map truyền vào constructor (chạy headless).
+    - on_dsn(ctx): gọi khi DSN đã xác nhận (GUI hiển thị DSN).
+    - on_release(ctx): gọi khi unit không cần nằm trên fixture nữa (pipeline).
+    - tracer: span từng stage (ring buffer), export Chrome trace bằng
+      engine.tracer.export_chrome(path).
+    - adaptive: AdaptiveTimeouts (tuỳ chọn) -> deadline từng bước theo độ trễ
+      thực tế của port (pool.latency) thay vì `timeouts` cố định.
+    Các callback chạy ở worker thread; GUI tự bounce về main thread.
+
+    Usage (headless):
+        engine = StationEngine(ports=StationPorts("COM5", "COM4", "COM8"), model_map=models)
+        res = engine.run_cycle(engine.new_cycle("2book", "53-100252", ssn2, ssn8))
+        print(res.ok, res.message, res.stage_summary())
+    """
+
+    def __init__(
+        self,
+        *,
+        pool: Optional[SerialPortPool] = None,
+        ports: StationPorts = StationPorts(),
+        model_map: Optional[ModelMap] = None,
+        timeouts: StepTimeouts = StepTimeouts(),
+        adaptive: Optional[AdaptiveTimeouts] = None,
+        tracer: Optional[Tracer] = None,
+        config_loader: Optional[Callable[[], Tuple[StationPorts, ModelMap]]] = None,
+        executor: Optional[Executor] = None,
+        baudrate: int = 9600,
+        log_callback=print,
+        debug_callback=None,
+        on_dsn: Optional[Callable[[CycleContext], None]] = None,
+        on_release: Optional[Callable[[CycleContext], None]] = None,
+    ):
+        self._own_pool = pool is None
+        self.pool = pool or SerialPortPool(baudrate=baudrate, log_callback=debug_callback or log_callback)
+        self.ports = ports
+        self.model_map: ModelMap = model_map or {}
+        self.timeouts = timeouts
+        self.adaptive = adaptive
+        self.tracer = tracer or Tracer()
+        self._config_loader = config_loader
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=3, thread_name_prefix="StationIO")
+        self.baudrate = baudrate
+        self._log = log_callback
+        self._debug = debug_callback or log_callback
+        self.on_dsn = on_dsn
+        self.on_release = on_release
+        self._seq = 0
+        self._prefetch: Optional[ScanPrefetch] = None
+        # DSN của các cycle gần nhất (đang chạy / vừa xong): BOOK1 giống nhau với mọi unit
+        # cùng model nên key prefetch không phân biệt được unit cũ còn nằm trên fixture
+        self._recent_dsns: Deque[str] = deque(maxlen=4)
+
+    # ---- cycle request ----
+    def new_cycle(self, mode: str, model: str, book1: str, book2: str = "", upc: str = "") -> CycleContext:
+        """Tạo cycle request (mode, model, books) với số thứ tự mới."""
+        self._seq += 1
+        return CycleContext(seq=self._seq, mode=mode, model=model, book1=book1, book2=book2, upc=upc)
+
+    # ---- timeouts ----
+    def timeout(self, step: str, port: str) -> float:
+        """Deadline của bước `step` (camera/golden_eye/sfc_query/sfc_confirm) trên `port`."""
+        if self.adaptive is not None:
+            return self.adaptive.budget(step, port)
+        return getattr(self.timeouts, step)
+
+    # ---- device exchanges ----
+    def scan_camera(self) -> Optional[bytes]:
+        return control_comscan(
+            port=self.ports.camera,
+            baudrate=self.baudrate,
+            timeout_sec=self.timeout("camera", self.ports.camera),
+            log_callback=self._debug,
+            pool=self.pool,
+        )
+
+    def golden_eye_lookup(self, scanned_sn: str) -> Tuple[bool, str, SFCResult]:
+        return send_and_parse(
+            text=f"{scanned_sn}", port=self.ports.golden_eye, baudrate=self.baudrate,
+            read_timeout=self.timeout("golden_eye", self.ports.golden_eye), log_callback=self._debug, pool=self.pool,
+        )
+
+    def sfc_exchange(self, text: str, read_timeout: float) -> Tuple[bool, str, SFCResult]:
+        return send_and_parse(
+            text=text, port=self.ports.sfc, baudrate=self.baudrate,
+            read_timeout=read_timeout, log_callback=self._debug, pool=self.pool,
+        )
+
+    # ---- prefetch ----
+    def start_prefetch(self, key: Hashable) -> None:
+        """Quét camera + Golden Eye chạy nền cho unit `key` (xem ScanPrefetch)."""
+        self.discard_prefetch()
+        self._prefetch = ScanPrefetch(
+            self.executor, key,
+            scan=lambda: self._traced("prefetch.camera", self.scan_camera),
+            lookup=lambda sn: self._traced("prefetch.golden_eye", self.golden_eye_lookup, sn),
+        )
+
+    def discard_prefetch(self) -> None:
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is not None:
+            prefetch.discard()
+
+    def _take_prefetch(self, key: Hashable):
+        """Lấy kết quả prefetch nếu vẫn đúng unit, ngược lại bỏ đi."""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return None
+        if not prefetch.matches(key):
+            prefetch.discard()
+            self._debug("[PREFETCH] unit changed, discard cached scan")
+            return None
+        taken = prefetch.take(timeout=self.timeout("camera", self.ports.camera))
+        if taken is not None and clean_scanned_sn(taken[0]) in self._recent_dsns:
+            # prefetch chạy khi unit trước còn trên fixture -> quét lại unit mới
+            prefetch.discard()
+            self._debug(f"[PREFETCH] cached scan is previous unit {clean_scanned_sn(taken[0])}, rescan")
+            return None
+        return taken
+
+    # ---- main flow ----
+    def run_cycle(self, ctx: CycleContext) -> CycleResult:
+        """Chạy toàn bộ flow cho 1 unit (blocking, gọi từ worker thread)."""
+        result = CycleResult(seq=ctx.seq, ok=False, message="")
+        with self.tracer.span("cycle", seq=ctx.seq, mode=ctx.mode) as span_args:
+            try:
+                result.ok, result.message = self._run(ctx, result)
+            finally:
+                result.dsn = ctx.dsn
+                result.total = time.perf_counter() - ctx.t0
+                span_args.update(ok=result.ok, dsn=ctx.dsn, prefetched=result.prefetched)
+        return result
+
+    def _traced(self, name: str, fn, *args):
+        with self.tracer.span(name):
+            return fn(*args)
+
+    def _timed(self, stages: Dict[str, float], name: str, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            with self.tracer.span(name):
+                return fn(*args)
+        finally:
+            # cộng dồn: prefetch bị loại + quét lại đều tính vào "camera"
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def _run(self, ctx: CycleContext, result: CycleResult) -> Tuple[bool, str]:
+        stages = result.stages
+
+        if self._config_loader is not None:
+            self.ports, self.model_map = self._timed(stages, "config", self._config_loader)
+        else:
+            stages["config"] = 0.0
+        if self.adaptive is not None:
+            self._log(f"[TIMEOUT] {self.adaptive.describe(self.ports)}")
+
+        if not self.model_map:
+            return False, f"FAIL: No Model Code [2]"
+        if not ctx.model or ctx.model not in self.model_map:
+            return False, f"FAIL: No Model Code [3]"
+
+        mode = ctx.mode
+        expected_ssn2 = self.model_map[ctx.model].get("SSN2", "").strip()
+        expected_ssn8 = self.model_map[ctx.model].get("SSN8", "").strip()
+
+        fail_msg = check_books(mode, ctx.book1, ctx.book2, expected_ssn2, expected_ssn8)
+        if fail_msg:
+            return False, fail_msg
+
+        # Prefetch (nếu có): camera + Golden Eye đã chạy từ lúc commit BOOK1
+        prefetched = self._timed(stages, "camera", self._take_prefetch, ctx.unit_key)
+        if prefetched is not None:
+            scan, fut_golden_eye = prefetched
+            result.prefetched = True
+            self._log("[PREFETCH] use cached camera scan")
+        else:
+            scan = self._timed(stages, "camera", self.scan_camera)
+            fut_golden_eye = None
+        if scan is None:
+            return False, f"FAIL:{self.ports.camera} - No response from camera"
+        scanned_sn = clean_scanned_sn(scan)
+        self._recent_dsns.append(scanned_sn)
+        self._log(f"scanned SN: {scanned_sn}")
+
+        # Golden Eye và SFC lần 1 chỉ cần SN đã quét -> gửi song song,
+        # so sánh DSN/SSN4 khi cả 2 kết quả về
+        if fut_golden_eye is None:
+            fut_golden_eye = self.executor.submit(self._timed, stages, "golden_eye", self.golden_eye_lookup, scanned_sn)
+        ok1, _, res1 = self._timed(stages, "sfc_query", self.sfc_exchange, f"DSN={scanned_sn},END", self.timeout("sfc_query", self.ports.sfc))
+        ok_golden_eye, _, res_golden_eye = fut_golden_eye.result() # DSN=...,SSN4=...,PASS
+
+        port_ge = self.ports.golden_eye
+        if not ok_golden_eye:
+            return False, f"FAIL:{port_ge} - No response from Golden Eye!"
+        fail_msg = check_golden_eye(res_golden_eye, scanned_sn, port_ge)
+        if fail_msg:
+            return False, fail_msg
+        ctx.dsn = scanned_sn
+        # USB CABLE = SSN4
+        ctx.usb_cable = str(res_golden_eye.fields.get("SSN4", ""))
+        if self.on_dsn is not None:
+            self.on_dsn(ctx)
+
+        if not ok1:
+            return False, f"FAIL: ERROR: No response from COM SFC"
+        ctx.sfc_fields.update(res1.fields)
+        fail_msg = check_sfc_query(ctx.dsn, ctx.usb_cable, ctx.upc, res1)
+        if fail_msg:
+            return False, fail_msg
+
+        # Unit không cần nằm trên fixture nữa -> pipeline mở input cho unit sau
+        if self.on_release is not None:
+            self.on_release(ctx)
+
+        # WSL SSN2 / QSG SSN8
+        book1, book2 = confirm_books(mode, ctx.book1, ctx.book2)
+        ok2, _, res2 = self._timed(
+            stages, "sfc_confirm", self.sfc_exchange, confirm_payload(ctx.dsn, book1, book2), self.timeout("sfc_confirm", self.ports.sfc)
+        ) # DSN=%,SSN2=%,SSN8=%,PASS
+        if not ok2:
+            return False, f"FAIL: ERROR: Reponse 2 FAIL"
+        ctx.sfc_fields.update(res2.fields)
+        return True, "ALL PASSED"
+
+    def close(self) -> None:
+        self.discard_prefetch()
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._own_pool:
+            self.pool.close_all()
+# ========================== STATION ENGINE: END ==========================
+
+__all__ = [
+    "STAGES",
+    "CycleResult",
+    "StationEngine",
+]
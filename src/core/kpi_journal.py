@@ -0,0 +1,219 @@
+import math
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+# ========================== KPI JOURNAL: START ==========================
+# Header file: magic + version + kích thước record (đổi format -> đổi version)
+_MAGIC = b"BKPJ"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+
+# 1 record = 40 byte: ts (ms epoch), ok, shift, cycle_time (NaN = không có), model
+RECORD = struct.Struct("<qBBxxf24s")
+MODEL_BYTES = 24
+SHIFTS = ("DAY", "NIGHT")
+_SHIFT_CODES = {name: i for i, name in enumerate(SHIFTS)}
+
+
+class KPIRecord(NamedTuple):
+    ts_ms: int
+    ok: bool
+    shift: str              # "DAY" | "NIGHT"
+    cycle_time: Optional[float]
+    model: str
+
+    @property
+    def ts(self) -> datetime:
+        return datetime.fromtimestamp(self.ts_ms / 1000.0)
+
+
+def _to_ms(ts: datetime) -> int:
+    return int(round(ts.timestamp() * 1000.0))
+
+
+def pack_record(ts: datetime, ok: bool, shift: str, cycle_time: Optional[float] = None, model: str = "") -> bytes:
+    return RECORD.pack(
+        _to_ms(ts),
+        1 if ok else 0,
+        _SHIFT_CODES.get(shift, 0),
+        math.nan if cycle_time is None else float(cycle_time),
+        model.encode("utf-8")[:MODEL_BYTES],
+    )
+
+
+def unpack_record(fields: Tuple[int, int, int, float, bytes]) -> KPIRecord:
+    ts_ms, ok, shift, cycle_time, model = fields
+    return KPIRecord(
+        ts_ms,
+        bool(ok),
+        SHIFTS[shift] if shift < len(SHIFTS) else SHIFTS[0],
+        None if math.isnan(cycle_time) else cycle_time,
+        model.rstrip(b"\0").decode("utf-8", errors="ignore"),
+    )
+
+
+def _seek_index(f, count: int, since_ms: int) -> int:
+    """Index record đầu tiên có ts >= since_ms (tìm nhị phân, đọc 8 byte mỗi bước)."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(_HEADER.size + mid * RECORD.size)
+        (ts_ms,) = struct.unpack("<q", f.read(8))
+        if ts_ms < since_ms:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def read_records(path, since: Optional[datetime] = None) -> bytes:
+    """
+    Đọc (chỉ đọc, không cần mở KPIJournal) các record từ `since`.
+    Record ghi dở ở cuối file (app đang ghi) bị bỏ qua.
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if header != _HEADER.pack(_MAGIC, _VERSION, RECORD.size):
+            raise ValueError(f"{path}: not a KPI journal (v{_VERSION})")
+        count = (os.fstat(f.fileno()).st_size - _HEADER.size) // RECORD.size
+        start = _seek_index(f, count, _to_ms(since)) if since is not None else 0
+        f.seek(_HEADER.size + start * RECORD.size)
+        return f.read((count - start) * RECORD.size)
+
+
+class KPIJournal:
+    """
+    Nhật ký KPI dạng append-only, record nhị phân cố định 40 byte
+    -> khởi động lại giữa ca vẫn dựng lại được sản lượng theo giờ / ca.
+
+    append() chỉ nối vào buffer RAM (gọi từ Tk thread không block);
+    thread nền ghi + fsync buffer mỗi `fsync_interval` giây.
+    Mất điện chỉ mất tối đa ~fsync_interval giây dữ liệu; record ghi dở
+    ở cuối file bị cắt bỏ khi mở lại.
+
+    Record ghi theo thứ tự thời gian nên replay(since=...) tìm nhị phân
+    vị trí bắt đầu -> replay vài ngày gần nhất không phụ thuộc độ dài file.
+
+    Usage:
+        journal = KPIJournal("kpi.journal", fsync_interval=1.0)
+        journal.append(datetime.now(), True, "DAY", 1.23, "53-100252")
+        for rec in journal.replay(since=datetime(2024, 5, 1, 7, 30)):
+            ...
+        journal.close()
+    """
+
+    def __init__(self, path, *, fsync_interval: float = 1.0):
+        self.path = Path(path)
+        self.fsync_interval = max(float(fsync_interval), 0.05)
+        self._lock = threading.Lock()       # buffer
+        self._io_lock = threading.Lock()    # file
+        self._buf = bytearray()
+        self._file = self._open()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="KPIJournal", daemon=True)
+        self._thread.start()
+
+    # ---- file ----
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        header = _HEADER.pack(_MAGIC, _VERSION, RECORD.size)
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, "rb") as f:
+                if f.read(_HEADER.size) != header:
+                    # format khác / file hỏng -> giữ lại để tra cứu, mở file mới
+                    f.close()
+                    self.path.replace(self.path.with_name(self.path.name + time.strftime(".%Y%m%d_%H%M%S.bad")))
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            with open(self.path, "wb") as f:
+                f.write(header)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            # cắt record ghi dở (mất điện giữa lúc write)
+            size = self.path.stat().st_size
+            whole = _HEADER.size + (size - _HEADER.size) // RECORD.size * RECORD.size
+            if whole != size:
+                os.truncate(self.path, whole)
+        return open(self.path, "ab")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    # ---- ghi ----
+    def append(
+        self,
+        ts: datetime,
+        ok: bool,
+        shift: str,
+        cycle_time: Optional[float] = None,
+        model: str = "",
+    ) -> None:
+        rec = pack_record(ts, ok, shift, cycle_time, model)
+        with self._lock:
+            self._buf += rec
+
+    def flush(self) -> int:
+        """Ghi buffer ra file + fsync, trả số record đã ghi."""
+        with self._io_lock:
+            with self._lock:
+                data, self._buf = bytes(self._buf), bytearray()
+            if not data or self._file.closed:
+                return 0
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return len(data) // RECORD.size
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(self.fsync_interval + 1.0)
+        try:
+            self.flush()
+        finally:
+            with self._io_lock:
+                self._file.close()
+
+    # ---- đọc ----
+    def __len__(self) -> int:
+        with self._lock:
+            pending = len(self._buf)
+        size = self.path.stat().st_size - _HEADER.size
+        return (size + pending) // RECORD.size
+
+    def read(self, since: Optional[datetime] = None) -> bytes:
+        """Các record (đã flush) từ `since` (None = toàn bộ), nối liền nhau, RECORD.size byte mỗi record."""
+        self.flush()
+        return read_records(self.path, since)
+
+    def iter_raw(self, since: Optional[datetime] = None) -> Iterator[Tuple[int, int, int, float, bytes]]:
+        """
+        Tuple thô (ts_ms, ok, shift_code, cycle_time|NaN, model_bytes) từ `since`
+        -> đọc 1 lần + struct.iter_unpack, không dựng object mỗi record.
+        """
+        return RECORD.iter_unpack(self.read(since))
+
+    def replay(self, since: Optional[datetime] = None) -> Iterator[KPIRecord]:
+        """Các record (đã flush) từ thời điểm `since` (None = toàn bộ), theo thứ tự ghi."""
+        for fields in self.iter_raw(since):
+            yield unpack_record(fields)
+# ========================== KPI JOURNAL: END ==========================
+
+__all__ = [
+    "RECORD",
+    "SHIFTS",
+    "KPIRecord",
+    "pack_record",
+    "unpack_record",
+    "read_records",
+    "KPIJournal",
+]
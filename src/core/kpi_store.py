@@ -0,0 +1,377 @@
+import argparse
+import csv
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.core.kpi_journal import MODEL_BYTES, SHIFTS, KPIJournal, read_records
+
+try:
+    import numpy as np  # type: ignore
+    HAS_NUMPY = True
+except Exception:
+    np = None
+    HAS_NUMPY = False
+
+# ========================== KPI COLUMN STORE: START ==========================
+# Thời gian lưu theo giờ địa phương (wall-clock ms, không timezone) -> giờ / ca / KPI day
+# tính bằng phép chia nguyên trên cả mảng, không đổi datetime từng event.
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+_HOUR_MS = 3_600_000
+_HALF_HOUR_MS = _HOUR_MS // 2
+_SHIFT_MS = 12 * _HOUR_MS
+_DAY_MS = 24 * _HOUR_MS
+_DAY_START_MS = 7 * _HOUR_MS + _HALF_HOUR_MS      # KPI day / ca sáng bắt đầu 07:30
+# số bucket tối đa mỗi ca trong rollup "shift_hour" (07:30-08:00, 08:00-09:00, ..., 19:00-19:30)
+_SHIFT_SLOTS = 16
+
+# dtype khớp kpi_journal.RECORD ("<qBBxxf24s")
+_JOURNAL_DTYPE = None if np is None else np.dtype([
+    ("ts", "<i8"), ("ok", "u1"), ("shift", "u1"), ("pad", "V2"), ("cycle", "<f4"), ("model", f"S{MODEL_BYTES}"),
+])
+
+ROLLUPS = ("hour", "day", "shift", "shift_hour", "model")
+
+
+def wall_ms(ts: datetime) -> int:
+    """datetime (giờ địa phương, naive) -> wall-clock ms."""
+    return (ts.replace(tzinfo=None) - _EPOCH) // _MS
+
+
+def kpi_day_of(day_index: int) -> str:
+    return (_EPOCH + timedelta(days=int(day_index))).date().isoformat()
+
+
+class KPIRow(NamedTuple):
+    key: Any
+    total: int
+    passed: int
+    cycle_mean: Optional[float]
+
+    @property
+    def failed(self) -> int:
+        return self.total - self.passed
+
+    @property
+    def yield_pct(self) -> float:
+        return (self.passed / self.total * 100.0) if self.total > 0 else 100.0
+
+
+class KPIRollup(NamedTuple):
+    """Kết quả gộp dạng cột: keys[i] là nhóm thứ i (đã sort), các mảng cùng độ dài."""
+    by: str
+    keys: Any           # np.ndarray int64
+    total: Any
+    passed: Any
+    cycle_sum: Any      # float64, chỉ tính event có cycle time
+    cycle_n: Any
+    models: Tuple[str, ...] = ()
+
+    def _decode(self, key: int) -> Any:
+        if self.by == "hour":
+            return _EPOCH + timedelta(hours=key)
+        if self.by == "day":
+            return kpi_day_of(key)
+        if self.by == "shift":
+            return kpi_day_of(key // 2), SHIFTS[key % 2]
+        if self.by == "shift_hour":
+            shift_index, slot = divmod(key, _SHIFT_SLOTS)
+            return kpi_day_of(shift_index // 2), SHIFTS[shift_index % 2], slot
+        return self.models[key]
+
+    def rows(self) -> List[KPIRow]:
+        return [
+            KPIRow(
+                self._decode(int(k)),
+                int(t),
+                int(p),
+                float(cs / cn) if cn else None,
+            )
+            for k, t, p, cs, cn in zip(self.keys, self.total, self.passed, self.cycle_sum, self.cycle_n)
+        ]
+
+
+class KPIStore:
+    """
+    Event KPI dạng cột (NumPy): ts int64 (wall-clock ms), pass bool,
+    cycle time float32 (NaN = không có), model int32 (index vào danh sách model).
+    ~17 byte / event -> giữ vài tháng lịch sử trong RAM, rollup theo giờ / ca /
+    KPI day / model bằng vài phép toán trên cả mảng (mili giây cho hàng triệu event).
+
+    Event nối theo thứ tự thời gian (journal / update_kpi) nên lọc since/until
+    dùng searchsorted thay vì mask cả mảng.
+
+    Usage:
+        store = KPIStore.from_journal(journal, since=datetime.now() - timedelta(days=90))
+        store.append(datetime.now(), True, 1.23, "53-100252")
+        for row in store.rollup("shift", since=...).rows():
+            row.key, row.total, row.passed, row.yield_pct, row.cycle_mean
+    """
+
+    def __init__(self, capacity: int = 4096):
+        if np is None:
+            raise RuntimeError("KPIStore requires numpy")
+        capacity = max(int(capacity), 16)
+        self._n = 0
+        self._ts = np.empty(capacity, np.int64)
+        self._ok = np.empty(capacity, np.bool_)
+        self._cycle = np.empty(capacity, np.float32)
+        self._model = np.empty(capacity, np.int32)
+        self._models: List[str] = []
+        self._model_codes: Dict[str, int] = {}
+        # False khi có event lùi giờ (chỉnh đồng hồ) -> rollup đi đường sort tổng quát
+        self._sorted = True
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def models(self) -> Tuple[str, ...]:
+        return tuple(self._models)
+
+    # ---- ghi ----
+    def _model_code(self, model: str) -> int:
+        code = self._model_codes.get(model)
+        if code is None:
+            code = self._model_codes[model] = len(self._models)
+            self._models.append(model)
+        return code
+
+    def _reserve(self, extra: int) -> None:
+        need = self._n + extra
+        if need <= len(self._ts):
+            return
+        cap = max(need, len(self._ts) * 2)
+        for name in ("_ts", "_ok", "_cycle", "_model"):
+            old = getattr(self, name)
+            new = np.empty(cap, old.dtype)
+            new[: self._n] = old[: self._n]
+            setattr(self, name, new)
+
+    def append(self, ts: datetime, ok: bool, cycle_time: Optional[float] = None, model: str = "") -> None:
+        with self._lock:
+            self._reserve(1)
+            i = self._n
+            t = wall_ms(ts)
+            if i and t < self._ts[i - 1]:
+                self._sorted = False
+            self._ts[i] = t
+            self._ok[i] = bool(ok)
+            self._cycle[i] = np.nan if cycle_time is None else cycle_time
+            self._model[i] = self._model_code(model)
+            self._n = i + 1
+
+    def extend(self, ts_ms, ok, cycle, model_codes, models: List[str]) -> None:
+        """Nối nhiều event (mảng cùng độ dài); model_codes là index vào `models`."""
+        remap = np.array([self._model_code(m) for m in models], dtype=np.int32)
+        n = len(ts_ms)
+        with self._lock:
+            self._reserve(n)
+            sl = slice(self._n, self._n + n)
+            self._ts[sl] = ts_ms
+            ts = self._ts[: self._n + n]
+            if n and ((self._n and ts[self._n] < ts[self._n - 1]) or bool(np.any(ts[self._n + 1:] < ts[self._n:-1]))):
+                self._sorted = False
+            self._ok[sl] = ok
+            self._cycle[sl] = cycle
+            self._model[sl] = remap[model_codes] if n else model_codes
+            self._n += n
+
+    def load_journal(self, journal, since: Optional[datetime] = None) -> int:
+        """
+        Đọc journal (KPIJournal đang mở, hoặc đường dẫn file -> chỉ đọc) từ `since`
+        vào store bằng np.frombuffer, trả số event.
+        """
+        data = journal.read(since) if isinstance(journal, KPIJournal) else read_records(journal, since)
+        recs = np.frombuffer(data, dtype=_JOURNAL_DTYPE)
+        if not len(recs):
+            return 0
+        epoch_ms = recs["ts"]
+        # epoch -> giờ địa phương: offset timezone tính 1 lần cho mỗi giờ UTC (đúng cả khi đổi DST)
+        hours, inv = np.unique(epoch_ms // _HOUR_MS, return_inverse=True)
+        offsets = np.array(
+            [wall_ms(datetime.fromtimestamp(int(h) * 3600)) - int(h) * _HOUR_MS for h in hours],
+            dtype=np.int64,
+        )
+        names, codes = np.unique(recs["model"], return_inverse=True)
+        self.extend(
+            epoch_ms + offsets[inv],
+            recs["ok"] != 0,
+            recs["cycle"],
+            codes.astype(np.int32),
+            [name.rstrip(b"\0").decode("utf-8", errors="ignore") for name in names],
+        )
+        return len(recs)
+
+    @classmethod
+    def from_journal(cls, journal, since: Optional[datetime] = None) -> "KPIStore":
+        store = cls()
+        store.load_journal(journal, since)
+        return store
+
+    # ---- đọc ----
+    def columns(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        model: Optional[str] = None,
+    ) -> Tuple[Any, Any, Any, Any]:
+        """
+        (ts, ok, cycle, model_code) của các event trong [since, until).
+        View read-only: append sau đó chỉ ghi phía sau / sang mảng mới, không đổi view.
+        """
+        with self._lock:
+            n, ordered = self._n, self._sorted
+            cols = (self._ts[:n], self._ok[:n], self._cycle[:n], self._model[:n])
+        ts = cols[0]
+        if ordered:
+            lo = int(np.searchsorted(ts, wall_ms(since), "left")) if since is not None else 0
+            hi = int(np.searchsorted(ts, wall_ms(until), "left")) if until is not None else n
+            cols = tuple(c[lo:hi] for c in cols)
+        elif since is not None or until is not None:
+            mask = np.ones(n, np.bool_)
+            if since is not None:
+                mask &= ts >= wall_ms(since)
+            if until is not None:
+                mask &= ts < wall_ms(until)
+            cols = tuple(c[mask] for c in cols)
+        if model is not None:
+            mask = cols[3] == self._model_codes.get(model, -1)
+            cols = tuple(c[mask] for c in cols)
+        for c in cols:
+            c.flags.writeable = False
+        return cols
+
+    @staticmethod
+    def _keys(by: str, ts):
+        """Key nhóm (int64) của các thời điểm wall-clock ms `ts`."""
+        rel = ts - _DAY_START_MS
+        if by == "hour":
+            return ts // _HOUR_MS
+        if by == "day":
+            return rel // _DAY_MS
+        if by == "shift":
+            return rel // _SHIFT_MS
+        return rel // _SHIFT_MS * _SHIFT_SLOTS + (rel % _SHIFT_MS + _HALF_HOUR_MS) // _HOUR_MS
+
+    @staticmethod
+    def _edges(by: str, first: int, last: int):
+        """Biên các nhóm thời gian phủ [first, last] (wall-clock ms, tăng dần)."""
+        def grid(step: int, offset: int):
+            lo = (first - offset) // step * step + offset
+            return np.arange(lo, last + step + 1, step, dtype=np.int64)
+
+        if by == "hour":
+            return grid(_HOUR_MS, 0)
+        if by == "day":
+            return grid(_DAY_MS, _DAY_START_MS)
+        if by == "shift":
+            return grid(_SHIFT_MS, _DAY_START_MS)
+        # shift_hour: biên giờ tròn + biên ca (07:30 / 19:30)
+        return np.union1d(grid(_HOUR_MS, 0), grid(_SHIFT_MS, _DAY_START_MS))
+
+    def rollup(
+        self,
+        by: str,
+        *,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        model: Optional[str] = None,
+    ) -> KPIRollup:
+        """
+        Gộp event theo `by`:
+          hour       -> giờ đồng hồ (HH:00-HH+1:00)
+          day        -> KPI day (07:30 -> 07:30 hôm sau)
+          shift      -> (KPI day, DAY/NIGHT)
+          shift_hour -> (KPI day, ca, slot) — slot 0 = 07:30-08:00 / 19:30-20:00, như bảng theo giờ
+          model      -> mã hàng
+        Nhóm không có event không có trong kết quả.
+        """
+        if by not in ROLLUPS:
+            raise ValueError(f"rollup by must be one of {ROLLUPS}, got {by!r}")
+        ts, ok, cycle, mcode = self.columns(since, until, model)
+        if not len(ts):
+            empty = np.zeros(0, np.int64)
+            return KPIRollup(by, empty, empty, empty, np.zeros(0, np.float64), empty, self.models)
+        has_cycle = ~np.isnan(cycle)
+
+        if by == "model" or not self._sorted:
+            if by == "model":
+                # model code đã là số nhỏ liên tục -> bincount thẳng, không cần sort
+                uniq, inv = np.arange(len(self._models), dtype=np.int64), mcode
+            else:
+                uniq, inv = np.unique(self._keys(by, ts), return_inverse=True)
+            size = len(uniq)
+            total = np.bincount(inv, minlength=size)
+            passed = np.bincount(inv, weights=ok, minlength=size).astype(np.int64)
+            cycle_sum = np.bincount(inv, weights=np.where(has_cycle, cycle, 0.0), minlength=size)
+            cycle_n = np.bincount(inv, weights=has_cycle, minlength=size).astype(np.int64)
+            keep = np.flatnonzero(total)
+            return KPIRollup(by, uniq[keep], total[keep], passed[keep], cycle_sum[keep], cycle_n[keep], self.models)
+
+        # ts đã sort -> biên nhóm tìm bằng searchsorted trên vài nghìn biên,
+        # không tính key cho từng event; tổng từng nhóm bằng reduceat
+        edges = self._edges(by, int(ts[0]), int(ts[-1]))
+        bounds = np.searchsorted(ts, edges)
+        keep = np.flatnonzero(bounds[1:] > bounds[:-1])
+        starts = bounds[keep]
+        total = bounds[keep + 1] - starts
+        passed = np.add.reduceat(ok, starts, dtype=np.int64)
+        cycle_sum = np.add.reduceat(np.where(has_cycle, cycle, 0.0), starts, dtype=np.float64)
+        cycle_n = np.add.reduceat(has_cycle, starts, dtype=np.int64)
+        return KPIRollup(by, self._keys(by, edges[keep]), total, passed, cycle_sum, cycle_n, self.models)
+
+    def export_csv(self, path, by: str = "hour", **filters: Any) -> int:
+        """Ghi rollup ra CSV (key, total, pass, fail, yield, cycle_mean), trả số dòng."""
+        rows = self.rollup(by, **filters).rows()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("key", "total", "pass", "fail", "yield", "cycle_mean"))
+            for row in rows:
+                key = " ".join(str(k) for k in row.key) if isinstance(row.key, tuple) else row.key
+                writer.writerow((
+                    key, row.total, row.passed, row.failed, f"{row.yield_pct:.2f}",
+                    "" if row.cycle_mean is None else f"{row.cycle_mean:.3f}",
+                ))
+        return len(rows)
+# ========================== KPI COLUMN STORE: END ==========================
+
+# ========================== KPI STORE CLI: START ==========================
+def _main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.kpi_store",
+        description="Rollup KPI journal theo giờ / ca / ngày / model ra CSV.",
+    )
+    parser.add_argument("journal", help="file kpi.journal")
+    parser.add_argument("--by", choices=ROLLUPS, default="hour")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="YYYY-MM-DD[THH:MM]")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="YYYY-MM-DD[THH:MM]")
+    parser.add_argument("--model")
+    parser.add_argument("-o", "--output", help="file CSV (mặc định in ra màn hình)")
+    args = parser.parse_args(argv)
+
+    # chỉ đọc file -> chạy được trong lúc app đang ghi journal
+    store = KPIStore.from_journal(args.journal, since=args.since)
+    filters = {"until": args.until, "model": args.model}
+    if args.output:
+        print(f"{store.export_csv(args.output, args.by, **filters)} rows -> {args.output}")
+        return 0
+    for row in store.rollup(args.by, **filters).rows():
+        mean = "-" if row.cycle_mean is None else f"{row.cycle_mean:.3f}s"
+        print(f"{row.key}\t{row.passed}/{row.total}\t{row.yield_pct:.1f}%\t{mean}")
+    return 0
+# ========================== KPI STORE CLI: END ==========================
+
+__all__ = [
+    "HAS_NUMPY",
+    "ROLLUPS",
+    "KPIRow",
+    "KPIRollup",
+    "KPIStore",
+]
+
+if __name__ == "__main__":
+    sys.exit(_main())
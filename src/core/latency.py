@@ -0,0 +1,284 @@
+import bisect
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ========================== LATENCY HISTOGRAM: START ==========================
+# Biên bucket chia theo log: 1ms -> ~60s, mỗi bucket lớn hơn bucket trước 15%
+_BUCKET_EDGES: List[float] = []
+_edge = 0.001
+while _edge < 60.0:
+    _BUCKET_EDGES.append(_edge)
+    _edge *= 1.15
+_BUCKET_EDGES.append(60.0)
+
+
+class LatencyHistogram:
+    """
+    Histogram độ trễ (giây) của 1 port, cửa sổ trượt `window` mẫu gần nhất.
+
+    Mẫu mới vào -> +1 bucket, mẫu cũ nhất rơi khỏi cửa sổ -> -1 bucket,
+    nên percentile() chỉ duyệt số bucket (cố định), không sort mẫu.
+    Timeout không phải là mẫu độ trễ: chỉ đếm số lần timeout liên tiếp.
+    Thread-safe: reader thread ghi, worker thread đọc.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._counts = [0] * (len(_BUCKET_EDGES) + 1)
+        self._recent: Deque[int] = deque()
+        self._lock = threading.Lock()
+        self.last: Optional[float] = None
+        self.timeouts_in_row = 0
+
+    def record(self, seconds: float) -> None:
+        idx = bisect.bisect_left(_BUCKET_EDGES, seconds)
+        with self._lock:
+            self.timeouts_in_row = 0
+            self._counts[idx] += 1
+            self._recent.append(idx)
+            if len(self._recent) > self.window:
+                self._counts[self._recent.popleft()] -= 1
+            self.last = seconds
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts_in_row += 1
+
+    @property
+    def count(self) -> int:
+        return len(self._recent)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Cận trên của bucket chứa percentile q (0..1), None nếu chưa có mẫu.
+        Làm tròn lên theo bucket -> deadline không bao giờ thấp hơn thực tế.
+        """
+        with self._lock:
+            n = len(self._recent)
+            if not n:
+                return None
+            rank = max(1, int(q * n + 0.999999))
+            seen = 0
+            for idx, c in enumerate(self._counts):
+                seen += c
+                if seen >= rank:
+                    return _BUCKET_EDGES[min(idx, len(_BUCKET_EDGES) - 1)]
+        return _BUCKET_EDGES[-1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._recent.clear()
+            self.last = None
+            self.timeouts_in_row = 0
+
+
+class LatencyTracker:
+    """1 LatencyHistogram cho mỗi port (camera, Golden Eye, SFC...)."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._hists: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, port: str) -> LatencyHistogram:
+        with self._lock:
+            hist = self._hists.get(port)
+            if hist is None:
+                hist = LatencyHistogram(self.window)
+                self._hists[port] = hist
+            return hist
+
+    def ports(self) -> List[str]:
+        with self._lock:
+            return list(self._hists)
+# ========================== LATENCY HISTOGRAM: END ==========================
+
+# ========================== STREAMING STATS: START ==========================
+class P2Quantile:
+    """
+    Ước lượng quantile q theo luồng bằng thuật toán P² (Jain & Chlamtac 1985):
+    5 marker (min, q/2, q, (1+q)/2, max), bộ nhớ O(1), không giữ mẫu.
+    """
+
+    __slots__ = ("q", "count", "_h", "_n", "_ns", "_dn")
+
+    def __init__(self, q: float):
+        self.q = q
+        self.count = 0
+        self._h: List[float] = []                   # chiều cao marker
+        self._n = [0, 1, 2, 3, 4]                   # vị trí marker (0-based)
+        self._dn = (0.0, q / 2, q, (1 + q) / 2, 1.0)
+        self._ns = [0.0, 2 * q, 4 * q, 2 + 2 * q, 4.0]  # vị trí mong muốn
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        h = self._h
+        if self.count <= 5:
+            bisect.insort(h, x)
+            return
+
+        n = self._n
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        ns, dn = self._ns, self._dn
+        for i in range(5):
+            ns[i] += dn[i]
+
+        for i in (1, 2, 3):
+            d = ns[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                hp = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not h[i - 1] < hp < h[i + 1]:
+                    hp = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = hp
+                n[i] += d
+
+    def extend(self, values: Iterable[float]) -> None:
+        """Sketch rỗng + >= 5 mẫu -> đặt marker đúng quantile của mẫu đã sort (replay nhanh)."""
+        if self.count:
+            for x in values:
+                self.add(x)
+            return
+        xs = sorted(values)
+        N = len(xs)
+        if N < 5:
+            for x in xs:
+                self.add(x)
+            return
+        ns = [(N - 1) * p for p in self._dn]
+        n1 = min(max(round(ns[1]), 1), N - 4)
+        n2 = min(max(round(ns[2]), n1 + 1), N - 3)
+        n3 = min(max(round(ns[3]), n2 + 1), N - 2)
+        self._n = [0, n1, n2, n3, N - 1]
+        self._ns = ns
+        self._h = [xs[i] for i in self._n]
+        self.count = N
+
+    def value(self) -> Optional[float]:
+        if not self.count:
+            return None
+        if self.count <= 5:
+            return self._h[round(self.q * (len(self._h) - 1))]
+        return self._h[2]
+
+
+class RunningStats:
+    """Mean / variance theo luồng (Welford), gộp lô bằng công thức Chan."""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = x if self.min is None or x < self.min else self.min
+        self.max = x if self.max is None or x > self.max else self.max
+
+    def extend(self, values: Sequence[float]) -> None:
+        nb = len(values)
+        if not nb:
+            return
+        mb = math.fsum(values) / nb
+        m2b = math.fsum((x - mb) * (x - mb) for x in values)
+        n = self.count + nb
+        delta = mb - self.mean
+        self.mean += delta * nb / n
+        self._m2 += m2b + delta * delta * self.count * nb / n
+        self.count = n
+        lo, hi = min(values), max(values)
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stdev(self) -> Optional[float]:
+        var = self.variance
+        return math.sqrt(var) if var is not None else None
+
+
+class CycleStats:
+    """
+    Thống kê cycle time bộ nhớ cố định: Welford mean/stdev + P² cho từng quantile.
+    Mean che mất các lần SFC treo ~10s; p99 thì không.
+
+    Usage:
+        st = CycleStats()
+        st.add(1.02); st.extend(values)
+        st.mean, st.stdev, st.quantile(0.99), st.summary()
+    """
+
+    __slots__ = ("stats", "_sketches")
+
+    def __init__(self, quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99)):
+        self.stats = RunningStats()
+        self._sketches = {q: P2Quantile(q) for q in quantiles}
+
+    @property
+    def count(self) -> int:
+        return self.stats.count
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.stats.mean if self.stats.count else None
+
+    @property
+    def stdev(self) -> Optional[float]:
+        return self.stats.stdev
+
+    def add(self, x: float) -> None:
+        self.stats.add(x)
+        for sk in self._sketches.values():
+            sk.add(x)
+
+    def extend(self, values: Sequence[float]) -> None:
+        self.stats.extend(values)
+        for sk in self._sketches.values():
+            sk.extend(values)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q phải nằm trong `quantiles` lúc tạo."""
+        return self._sketches[q].value()
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {"n": self.count, "mean": self.mean, "stdev": self.stdev}
+        for q, sk in self._sketches.items():
+            out[f"p{q * 100:g}"] = sk.value()
+        out["max"] = self.stats.max
+        return out
+# ========================== STREAMING STATS: END ==========================
+
+__all__ = [
+    "LatencyHistogram",
+    "LatencyTracker",
+    "P2Quantile",
+    "RunningStats",
+    "CycleStats",
+]
@@ -0,0 +1,176 @@
+import argparse
+import csv
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+# ========================== SQLITE MODEL STORE: START ==========================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    code    TEXT PRIMARY KEY,
+    ssn2    TEXT NOT NULL DEFAULT '',
+    ssn8    TEXT NOT NULL DEFAULT '',
+    updated TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_models_ssn2 ON models(ssn2);
+CREATE INDEX IF NOT EXISTS idx_models_ssn8 ON models(ssn8);
+"""
+
+_UPSERT = """
+INSERT INTO models(code, ssn2, ssn8) VALUES (?, ?, ?)
+ON CONFLICT(code) DO UPDATE SET
+    ssn2 = excluded.ssn2,
+    ssn8 = excluded.ssn8,
+    updated = datetime('now', 'localtime')
+"""
+
+CSV_FIELDS = ("model", "ssn2", "ssn8")
+
+
+class SqliteModelStore:
+    """
+    Danh mục mã hàng trong SQLite (WAL): tra theo mã hàng / SSN có index,
+    sửa 1 model chỉ ghi 1 dòng thay vì ghi lại cả config.ini.
+
+    Bật bằng config.ini:
+        [MODELS]
+        store = sqlite
+        db = models.db          ; đường dẫn tương đối theo thư mục config.ini
+
+    Usage:
+        store = SqliteModelStore("models.db")
+        store.upsert("53-100252", "SSN2...", "SSN8...")
+        store.find_by_ssn("SSN2...")        # -> ("53-100252",)
+        store.import_csv("models.csv")      # cột: model,ssn2,ssn8
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 1 connection dùng chung (Tk thread + worker), tuần tự hoá bằng lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ---- đọc ----
+    def get(self, code: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT ssn2, ssn8 FROM models WHERE code = ?", (code,)).fetchone()
+        return None if row is None else {"SSN2": row[0], "SSN8": row[1]}
+
+    def find_by_ssn(self, ssn: str) -> Tuple[str, ...]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT code FROM models WHERE ssn2 = ?1 UNION SELECT code FROM models WHERE ssn8 = ?1 ORDER BY code",
+                (ssn,),
+            ).fetchall()
+        return tuple(r[0] for r in rows)
+
+    def all(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT code, ssn2, ssn8 FROM models ORDER BY code").fetchall()
+        return {code: {"SSN2": ssn2, "SSN8": ssn8} for code, ssn2, ssn8 in rows}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def data_version(self) -> int:
+        """Đổi mỗi khi connection KHÁC (process khác) commit -> dùng để invalidate cache."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ---- ghi ----
+    def upsert(self, code: str, ssn2: str, ssn8: str = "") -> None:
+        with self._lock:
+            self._conn.execute(_UPSERT, (code.strip(), ssn2.strip(), ssn8.strip()))
+
+    def upsert_many(self, rows: Iterable[Tuple[str, str, str]], replace: bool = False) -> int:
+        """Ghi nhiều model trong 1 transaction; replace=True xoá danh mục cũ trước."""
+        rows = [(c.strip(), s2.strip(), s8.strip()) for c, s2, s8 in rows if c and c.strip()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self._conn.execute("DELETE FROM models")
+                self._conn.executemany(_UPSERT, rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def delete(self, code: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM models WHERE code = ?", (code,))
+
+    # ---- CSV ----
+    @staticmethod
+    def _read_csv(path) -> Iterator[Tuple[str, str, str]]:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                row = {(k or "").strip().lower(): (v or "") for k, v in row.items()}
+                yield row.get("model", ""), row.get("ssn2", ""), row.get("ssn8", "")
+
+    def import_csv(self, path, replace: bool = False) -> int:
+        """CSV có header model,ssn2,ssn8 -> upsert tất cả, trả số dòng."""
+        return self.upsert_many(self._read_csv(path), replace=replace)
+
+    def export_csv(self, path) -> int:
+        models = self.all()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for code, info in models.items():
+                writer.writerow((code, info["SSN2"], info["SSN8"]))
+        return len(models)
+
+    def import_map(self, model_map: Mapping[str, Mapping[str, str]]) -> int:
+        """Chuyển model_map (vd. section cũ trong config.ini) vào DB."""
+        return self.upsert_many(
+            (code, info.get("SSN2", ""), info.get("SSN8", "")) for code, info in model_map.items()
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+# ========================== SQLITE MODEL STORE: END ==========================
+
+# ========================== MODEL STORE CLI: START ==========================
+def _main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.model_store",
+        description="Import / export danh mục mã hàng (SQLite) từ / ra CSV (model,ssn2,ssn8).",
+    )
+    parser.add_argument("command", choices=("import", "export", "count"))
+    parser.add_argument("csv", nargs="?", help="file CSV")
+    parser.add_argument("--db", default="models.db")
+    parser.add_argument("--replace", action="store_true", help="import: xoá danh mục cũ trước")
+    args = parser.parse_args(argv)
+
+    store = SqliteModelStore(args.db)
+    try:
+        if args.command == "count":
+            print(store.count())
+        elif not args.csv:
+            parser.error(f"{args.command} cần đường dẫn CSV")
+        elif args.command == "import":
+            print(f"imported {store.import_csv(args.csv, replace=args.replace)} models -> {args.db}")
+        else:
+            print(f"exported {store.export_csv(args.csv)} models -> {args.csv}")
+    finally:
+        store.close()
+    return 0
+# ========================== MODEL STORE CLI: END ==========================
+
+__all__ = [
+    "CSV_FIELDS",
+    "SqliteModelStore",
+]
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -0,0 +1,146 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+import serial
+from src.core.latency import LatencyTracker
+from src.core.serial_reader import PortChannel
+
+# ========================== SERIAL PORT POOL: START ==========================
+class _PortSlot:
+    """
+    Một cổng COM trong pool: giữ PortChannel (serial + reader thread) + lock độc quyền.
+    """
+    def __init__(self, port: str, baudrate: int, log_callback=print, latency: Optional[LatencyTracker] = None):
+        self.port = port
+        self._latency = latency
+        self.baudrate = baudrate
+        self.lock = threading.Lock()
+        self.channel: Optional[PortChannel] = None
+        self._log = log_callback
+
+    def ensure_open(self, baudrate: int) -> PortChannel:
+        # Đổi baudrate trên cổng đang mở không cần đóng/mở lại
+        if self.channel is not None and self.channel.alive:
+            if self.channel.baudrate != baudrate:
+                self.channel.baudrate = baudrate
+                self.baudrate = baudrate
+            return self.channel
+
+        self.close()
+        self.baudrate = baudrate
+        hist = self._latency.histogram(self.port) if self._latency is not None else None
+        self.channel = PortChannel(self.port, baudrate, log_callback=self._log, latency=hist)
+        return self.channel
+
+    def close(self) -> None:
+        if self.channel is None:
+            return
+        try:
+            self.channel.close()
+        except Exception:
+            pass
+        self.channel = None
+
+
+class SerialPortPool:
+    """
+    Giữ mỗi cổng COM (camera, Golden Eye, SFC) mở suốt ca làm việc.
+
+    - Mỗi port chỉ open 1 lần, các lần sau dùng lại.
+    - lease(port) trả về PortChannel với quyền độc quyền (1 người dùng / port).
+    - Nếu port biến mất (SerialException) -> đóng slot, lần lease sau tự mở lại.
+    - pool.latency: histogram độ trễ từng port (giữ qua các lần reconnect).
+
+    Usage:
+        pool = SerialPortPool()
+        with pool.lease("COM8") as ch:
+            resp = ch.exchange(b"DSN=...,END\\r\\n", timeout=10)
+        pool.close_all()
+    """
+
+    def __init__(self, baudrate: int = 9600, log_callback=print):
+        self._baudrate = baudrate
+        self._log = log_callback
+        self._slots: Dict[str, _PortSlot] = {}
+        self._slots_lock = threading.Lock()
+        self._closed = False
+        self.latency = LatencyTracker()
+
+    def _get_slot(self, port: str) -> _PortSlot:
+        with self._slots_lock:
+            if self._closed:
+                raise serial.SerialException("Port pool is closed")
+            slot = self._slots.get(port)
+            if slot is None:
+                slot = _PortSlot(port, self._baudrate, self._log, self.latency)
+                self._slots[port] = slot
+            return slot
+
+    @contextmanager
+    def lease(
+        self,
+        port: str,
+        baudrate: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+    ) -> Iterator[PortChannel]:
+        """
+        Mượn độc quyền cổng `port`. Block tới khi port rảnh
+        (hoặc tới acquire_timeout giây -> SerialException).
+        """
+        slot = self._get_slot(port)
+        if acquire_timeout is None:
+            slot.lock.acquire()
+        elif not slot.lock.acquire(timeout=acquire_timeout):
+            raise serial.SerialException(f"{port} busy (lease timeout {acquire_timeout}s)")
+
+        try:
+            try:
+                channel = slot.ensure_open(baudrate or self._baudrate)
+            except serial.SerialException:
+                slot.close()
+                raise
+            try:
+                yield channel
+            except (serial.SerialException, OSError):
+                # Port rút ra / driver lỗi -> bỏ handle cũ, lần sau reconnect
+                self._log(f"[WARN] {port} lost, will reconnect on next use")
+                slot.close()
+                raise
+        finally:
+            slot.lock.release()
+
+    def prewarm(self, ports: Iterable[str]) -> None:
+        """Mở sẵn các port đã cấu hình (lỗi chỉ log, không raise)."""
+        for port in ports:
+            if not port:
+                continue
+            try:
+                with self.lease(port):
+                    pass
+            except serial.SerialException as e:
+                self._log(f"[WARN] Cannot open {port}: {e}")
+
+    def is_open(self, port: str) -> bool:
+        slot = self._slots.get(port)
+        return bool(slot is not None and slot.channel is not None and slot.channel.alive)
+
+    def close(self, port: str) -> None:
+        with self._slots_lock:
+            slot = self._slots.pop(port, None)
+        if slot is not None:
+            with slot.lock:
+                slot.close()
+
+    def close_all(self) -> None:
+        with self._slots_lock:
+            self._closed = True
+            slots = list(self._slots.values())
+            self._slots.clear()
+        for slot in slots:
+            with slot.lock:
+                slot.close()
+# ========================== SERIAL PORT POOL: END ==========================
+
+__all__ = [
+    "SerialPortPool",
+]
@@ -0,0 +1,320 @@
+import re
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from typing import Any, List, NamedTuple, Optional, Tuple
+import serial
+
+# ========================== FRAME ASSEMBLER: START ==========================
+STATUS_TOKENS: Tuple[str, ...] = ("PASS", "FAIL", "ERRO")
+
+# Chờ tới frame đầu tiên (camera) hoặc tới frame có PASS/FAIL/ERRO (SFC, Golden Eye)
+UNTIL_FRAME = "frame"
+UNTIL_STATUS = "status"
+
+_EOL = re.compile(rb"[\r\n]")
+_STATUS_IN = re.compile(rb"(?:^|[,|;:\s])(?:PASS|FAIL|ERRO)", re.IGNORECASE)
+_STATUS_TAIL = re.compile(rb"(?:^|[,|;:\s])(?:PASS|FAIL|ERROR?)\s*$", re.IGNORECASE)
+
+
+def is_status_frame(frame: bytes) -> bool:
+    """Frame có chứa token trạng thái PASS/FAIL/ERRO hay không."""
+    return _STATUS_IN.search(frame) is not None
+
+
+class FrameAssembler:
+    """
+    Ghép byte nhận được thành frame.
+    - Cắt frame tại CR/LF.
+    - Phần chưa có CR/LF nhưng kết thúc bằng token PASS/FAIL/ERRO chỉ thành frame
+      khi port đã im lặng (flush_status), vì "...,FAIL" có thể còn "URE_CODE=3" tới sau
+      (thiết bị không gửi xuống dòng sau status).
+    Frame trả về không chứa CR/LF, frame rỗng bị bỏ.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        frames: List[bytes] = []
+        buf = self._buf
+        buf.extend(data)
+
+        while True:
+            m = _EOL.search(buf)
+            if m is None:
+                break
+            end = m.start()
+            if end:
+                frames.append(bytes(buf[:end]))
+            del buf[:end + 1]
+        return frames
+
+    def has_partial(self) -> bool:
+        return bool(self._buf)
+
+    def flush(self) -> Optional[bytes]:
+        """Trả phần dở dang (nếu có) như 1 frame và xoá buffer."""
+        if not self._buf:
+            return None
+        frame = bytes(self._buf)
+        self._buf.clear()
+        return frame
+
+    def flush_status(self) -> Optional[bytes]:
+        """Như flush() nhưng chỉ khi phần dở dang kết thúc bằng token status."""
+        if _STATUS_TAIL.search(self._buf) is None:
+            return None
+        return self.flush()
+
+    def clear(self) -> None:
+        self._buf.clear()
+# ========================== FRAME ASSEMBLER: END ==========================
+
+# ========================== PORT CHANNEL: START ==========================
+class PortResponse(NamedTuple):
+    frames: Tuple[bytes, ...]
+    complete: bool          # False nếu hết deadline trước khi có terminator
+    parsed: Optional[Any] = None    # kết quả parser (nếu submit kèm parser)
+
+    @property
+    def data(self) -> bytes:
+        return b"\r\n".join(self.frames)
+
+
+class _PendingRequest:
+    def __init__(self, until: str, parser=None):
+        self.until = until
+        self.parser = parser
+        self.t0 = time.perf_counter()
+        self.frames: List[bytes] = []
+        self.future: "Future[PortResponse]" = Future()
+
+    def response(self, complete: bool) -> PortResponse:
+        if self.parser is None:
+            return PortResponse(tuple(self.frames), complete=complete)
+        raw = bytes(self.parser.raw)
+        parsed = self.parser.result() if complete else self.parser.finish()
+        return PortResponse((raw,) if raw else (), complete=complete, parsed=parsed)
+
+    def add(self, frame: bytes) -> bool:
+        """Thêm frame, trả True nếu request đã đủ điều kiện hoàn tất."""
+        self.frames.append(frame)
+        if self.until == UNTIL_FRAME:
+            return True
+        return is_status_frame(frame)
+
+
+class PortChannel:
+    """
+    1 cổng COM mở sẵn + 1 reader thread.
+
+    Reader thread block trên ser.read() (OS đánh thức khi có byte), ghép frame
+    bằng FrameAssembler rồi giao cho request đang chờ qua Future.
+    Byte tới khi không có request nào chờ được coi là rác và bị bỏ.
+
+    submit(..., parser=...) bỏ qua FrameAssembler: byte nhận được đưa thẳng
+    vào parser (feed(data), idle(), .done, .raw, result(), finish(), vd. SFCStreamParser),
+    Future hoàn tất ngay khi parser.done, hoặc khi port im lặng 1 idle_gap mà
+    parser.idle() xác nhận token cuối là status.
+
+    latency (LatencyHistogram, tuỳ chọn): ghi thời gian submit -> response của
+    mỗi request; request bị bỏ vì timeout chỉ được đếm (record_timeout).
+
+    Usage:
+        with PortChannel("COM8") as ch:
+            resp = ch.exchange(b"DSN=...,END\\r\\n", until=UNTIL_STATUS, timeout=10)
+    """
+
+    def __init__(
+        self,
+        port: str,
+        baudrate: int = 9600,
+        *,
+        idle_gap: float = 0.05,
+        log_callback=print,
+        latency=None,
+    ):
+        self.port = port
+        self._log = log_callback
+        self.latency = latency
+        # read timeout = khoảng lặng để flush frame không có CR/LF (camera)
+        self._ser = serial.Serial(port, baudrate, timeout=idle_gap)
+        self._lock = threading.Lock()
+        self._assembler = FrameAssembler()
+        self._pending: Optional[_PendingRequest] = None
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=f"PortReader-{port}", daemon=True)
+        self._thread.start()
+
+    # ---- context manager ----
+    def __enter__(self) -> "PortChannel":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ---- properties ----
+    @property
+    def alive(self) -> bool:
+        return self._error is None and not self._stop.is_set() and self._ser.is_open
+
+    @property
+    def baudrate(self) -> int:
+        return self._ser.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value: int) -> None:
+        self._ser.baudrate = value
+
+    # ---- public API ----
+    def submit(self, payload: bytes, until: str = UNTIL_STATUS, parser=None) -> "Future[PortResponse]":
+        """
+        Đăng ký request rồi ghi payload. Trả Future hoàn tất ngay khi
+        reader thread thấy terminator (hoặc parser báo done).
+        """
+        with self._lock:
+            if not self.alive:
+                raise serial.SerialException(f"{self.port} is not open: {self._error}")
+            if self._pending is not None:
+                self._pending.future.cancel()
+            # tương đương reset_input_buffer: bỏ dữ liệu cũ chưa ai đọc
+            self._assembler.clear()
+            req = _PendingRequest(until, parser)
+            self._pending = req
+
+        try:
+            self._ser.write(payload)
+            self._ser.flush()
+        except (serial.SerialException, OSError) as e:
+            self._mark_dead(e)
+            raise serial.SerialException(f"Write error on {self.port}: {e}") from e
+        return req.future
+
+    def abandon(self, future: "Future[PortResponse]", record_latency: bool = True) -> PortResponse:
+        """
+        Bỏ request (timeout / cancel) và trả lại những gì đã nhận được.
+        record_latency=False: bị cancel (không phải timeout) -> không tính vào histogram.
+        """
+        with self._lock:
+            req = self._pending
+            if req is not None and req.future is future:
+                partial = self._assembler.flush()
+                if partial and req.parser is None:
+                    req.frames.append(partial)
+                self._pending = None
+                future.cancel()
+                if record_latency and self.latency is not None:
+                    self.latency.record_timeout()
+                return req.response(complete=False)
+        if future.done() and not future.cancelled():
+            return future.result()
+        return PortResponse((), complete=False)
+
+    def exchange(
+        self,
+        payload: bytes,
+        until: str = UNTIL_STATUS,
+        timeout: float = 5.0,
+        parser=None,
+    ) -> PortResponse:
+        """Gửi payload, chờ response tối đa `timeout` giây."""
+        fut = self.submit(payload, until, parser)
+        try:
+            return fut.result(timeout=max(timeout, 0.0))
+        except FutureTimeout:
+            return self.abandon(fut)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(self._ser.timeout or 0.0, 0.05) * 4)
+        try:
+            self._ser.close()
+        except Exception:
+            pass
+        with self._lock:
+            if self._pending is not None:
+                self._pending.future.cancel()
+                self._pending = None
+
+    def _record_latency(self, req: _PendingRequest) -> None:
+        if self.latency is not None:
+            self.latency.record(time.perf_counter() - req.t0)
+
+    # ---- reader thread ----
+    def _mark_dead(self, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+            req, self._pending = self._pending, None
+        if req is not None:
+            _complete(req.future, error=serial.SerialException(f"{self.port} lost: {error}"))
+
+    def _run(self) -> None:
+        ser = self._ser
+        while not self._stop.is_set():
+            try:
+                data = ser.read(max(1, ser.in_waiting))
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                # TypeError/AttributeError: pyserial khi port bị đóng giữa chừng
+                if not self._stop.is_set():
+                    self._log(f"[ERROR] Reader {self.port} stopped: {e}")
+                    self._mark_dead(e)
+                return
+
+            with self._lock:
+                req = self._pending
+                if req is not None and req.parser is not None:
+                    # parser stream: byte vào thẳng parser, không ghép frame / regex
+                    # im lặng 1 idle_gap -> parser quyết định token dở dang có phải status
+                    if data:
+                        if req.parser.feed(data) is None:
+                            continue
+                    elif req.parser.idle() is None:
+                        continue
+                elif data:
+                    frames = self._assembler.feed(data)
+                    if req is None or not any(req.add(frame) for frame in frames):
+                        continue
+                elif req is not None and self._assembler.has_partial():
+                    # im lặng 1 idle_gap -> coi phần dở dang là 1 frame
+                    # (UNTIL_STATUS: chỉ khi nó kết thúc bằng status, không thì chờ tiếp)
+                    if req.until == UNTIL_FRAME:
+                        frame = self._assembler.flush()
+                    else:
+                        frame = self._assembler.flush_status()
+                    if frame is None or not req.add(frame):
+                        continue
+                else:
+                    continue
+                self._pending = None
+
+            self._record_latency(req)
+            _complete(req.future, req.response(complete=True))
+
+
+def _complete(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    """
+    Hoàn tất future từ reader thread. Future có thể bị cancel() từ thread khác
+    không qua lock (vd. asyncio.wait_for hết giờ) -> bỏ qua, reader thread không được chết.
+    """
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+# ========================== PORT CHANNEL: END ==========================
+
+__all__ = [
+    "STATUS_TOKENS",
+    "UNTIL_FRAME",
+    "UNTIL_STATUS",
+    "is_status_frame",
+    "FrameAssembler",
+    "PortResponse",
+    "PortChannel",
+]
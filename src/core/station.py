@@ -0,0 +1,291 @@
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from src.core.core import SFCResult
+from src.core.latency import LatencyTracker
+
+# ========================== STATION CHECKS: START ==========================
+# Các bước so sánh của start_check, tách riêng (không phụ thuộc Tk) để
+# flow đồng bộ (BookyApp) và flow async (AsyncStationFlow) dùng chung.
+# Mỗi hàm trả None nếu OK, hoặc message FAIL.
+
+
+def _is_blank(value: Optional[str]) -> bool:
+    return not value or not value.strip()
+
+
+def check_books(
+    mode: str,
+    book1: str,
+    book2: str,
+    expected_ssn2: str,
+    expected_ssn8: str,
+) -> Optional[str]:
+    """So BOOK1/BOOK2 đã quét với SSN2/SSN8 của model."""
+    if mode == "1book":
+        # Chỉ cần BOOK1
+        if _is_blank(book1):
+            return f"FAIL: Sảo sách sai! | Scan book wrong! |BOOK1={book1}|"
+        # Compare BOOK1 with config SSN2 or SSN8 (whichever exists)
+        if book1 == expected_ssn2 or book1 == expected_ssn8:
+            return None
+        return f"FAIL: BOOK1 mismatch! | Expected={expected_ssn2 or expected_ssn8} | Got={book1}"
+
+    # mode == "2book": cần cả BOOK1 và BOOK2
+    if _is_blank(book1) or _is_blank(book2):
+        return (
+            f"FAIL: Sảo sách sai! | Scan book wrong! |"
+            f"BOOK1={book1}|BOOK2={book2}|"
+        )
+    if book1 == expected_ssn2 and book2 == expected_ssn8:
+        return None
+    return (
+        f"FAIL: BOOK mismatch! | "
+        f"Expected SSN2={expected_ssn2}, SSN8={expected_ssn8} | "
+        f"Got BOOK1={book1}, BOOK2={book2}"
+    )
+
+
+def clean_scanned_sn(scan: bytes) -> str:
+    """Bỏ CR/LF khỏi dữ liệu camera trả về."""
+    clean_bytes = scan.replace(b"\r", b"").replace(b"\n", b"")
+    return clean_bytes.decode("utf-8", errors="ignore")
+
+
+def check_golden_eye(res: SFCResult, scanned_sn: str, port: str) -> Optional[str]:
+    """DSN Golden Eye trả về phải khớp SN camera quét được."""
+    dsn1 = res.dsn or ""
+    if dsn1 != scanned_sn:
+        return (
+            f"FAIL:{port} - DSN from Golden Eye không khớp với SN đã quét | "
+            f"DSN from Golden Eye not match scanned SN | DSN1={dsn1}|scanned_SN={scanned_sn}|{port}"
+        )
+    return None
+
+
+def check_sfc_query(dsn: str, usb_cable: str, upc: str, res: SFCResult) -> Optional[str]:
+    """So DSN / UPC / SSN4 (USB cable) giữa Golden Eye và SFC (lần 1)."""
+    sfc_dsn = res.dsn or ""
+    sfc_ssn4 = str(res.fields.get("SSN4", ""))
+    sfc_upc = res.fields.get("UPC", "")
+
+    if dsn != sfc_dsn:
+        return f"FAIL: ERROR: DSN invalid - DSN: {dsn}| SFC_DSN: {sfc_dsn}"
+    if upc and sfc_upc and upc != sfc_upc:
+        return f"FAIL: ERROR: UPC invalid - UPC: {upc}| SFC_UPC: {sfc_upc}"
+    # Compare full string of SSN4 (not 6 first char anymore!)
+    if usb_cable != sfc_ssn4:
+        return f"FAIL: ERROR: SSN4 invalid - USB_CABLE: {usb_cable}| SSN4: {sfc_ssn4}"
+    return None
+
+
+def confirm_books(mode: str, book1: str, book2: str) -> tuple[str, str]:
+    """Chuẩn hoá BOOK1/BOOK2 cho lần gửi cuối: thiếu -> (NULL)."""
+    if not book2 or "Skip" in book2 or mode == "1book":
+        book2 = "(NULL)"
+    if not book1:
+        book1 = "(NULL)"
+    return book1, book2
+
+
+def confirm_payload(dsn: str, book1: str, book2: str) -> str:
+    """DSN=%,SSN2=%,SSN8=%,END gửi SFC (final confirm)."""
+    return f"DSN={dsn},SSN2={book1},SSN8={book2},END"
+# ========================== STATION CHECKS: END ==========================
+
+# ========================== STATION SETUP: START ==========================
+@dataclass(frozen=True)
+class StationPorts:
+    camera: str = "COM5"
+    golden_eye: str = "COM4"
+    sfc: str = "COM8"
+
+
+@dataclass(frozen=True)
+class StepTimeouts:
+    camera: float = 5.0
+    golden_eye: float = 7.0
+    sfc_query: float = 10.0
+    sfc_confirm: float = 10.0
+
+
+class AdaptiveTimeouts:
+    """
+    Deadline từng bước lấy từ độ trễ thực tế của port thay vì số cố định:
+
+        budget = clamp(percentile(port) * margin, floor, ceiling)
+
+    - Chưa đủ min_samples mẫu -> dùng giá trị StepTimeouts mặc định.
+    - Timeout không phải mẫu độ trễ, nên sau mỗi timeout liên tiếp budget nhân đôi
+      (backoff) tới ceiling: thiết bị chậm đi (0.8s -> 3s) hay cần > floor lúc mới chạy
+      vẫn có lần chờ đủ lâu để ghi được mẫu, budget không kẹt ở mức FAIL mãi.
+    - Chưa có đủ mẫu mà đã timeout max_timeouts lần liên tiếp -> bắt đầu lại từ floor
+      rồi backoff: floor, 2*floor, 4*floor ... ceiling (thiết bị chết FAIL nhanh trước).
+    - ceiling=None -> trần là giá trị mặc định của bước đó (không bao giờ chờ lâu hơn cũ).
+
+    Usage:
+        adaptive = AdaptiveTimeouts(pool.latency, floor=1.0)
+        read_timeout = adaptive.budget("sfc_query", "COM8")
+    """
+
+    def __init__(
+        self,
+        tracker: LatencyTracker,
+        defaults: StepTimeouts = StepTimeouts(),
+        *,
+        floor: float = 1.0,
+        ceiling: Optional[float] = None,
+        percentile: float = 0.99,
+        margin: float = 2.0,
+        min_samples: int = 10,
+        max_timeouts: int = 2,
+    ):
+        self.tracker = tracker
+        self.defaults = defaults
+        self.floor = floor
+        self.ceiling = ceiling
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.max_timeouts = max_timeouts
+
+    def budget(self, step: str, port: str) -> float:
+        default = getattr(self.defaults, step)
+        ceiling = default if self.ceiling is None else self.ceiling
+        hist = self.tracker.histogram(port)
+        misses = hist.timeouts_in_row
+        if hist.count < self.min_samples:
+            if misses < self.max_timeouts:
+                return default
+            base, misses = self.floor, misses - self.max_timeouts
+        else:
+            observed = hist.percentile(self.percentile) or default
+            base = max(observed * self.margin, self.floor)
+        # backoff: mỗi timeout liên tiếp nhân đôi budget, kẹp ở ceiling
+        return min(base * (2 ** min(misses, 32)), ceiling)
+
+    def describe(self, ports: StationPorts) -> str:
+        """Chuỗi budget hiện tại để ghi log, vd. camera=1.00s(n=42) ..."""
+        items = (
+            ("camera", ports.camera),
+            ("golden_eye", ports.golden_eye),
+            ("sfc_query", ports.sfc),
+            ("sfc_confirm", ports.sfc),
+        )
+        return " ".join(
+            f"{step}={self.budget(step, port):.2f}s(n={self.tracker.histogram(port).count})"
+            for step, port in items
+        )
+# ========================== STATION SETUP: END ==========================
+
+# ========================== CYCLE CONTEXT: START ==========================
+@dataclass
+class CycleContext:
+    """
+    Trạng thái của 1 unit trong 1 cycle (thay cho các biến global
+    SN_BOOK1/SN_BOOK2/DSN/SFC_*). Mỗi cycle có context riêng nên unit N+1
+    có thể quét sách trong lúc SFC confirm của unit N còn chạy.
+    """
+    seq: int
+    mode: str
+    model: str
+    book1: str
+    book2: str
+    upc: str = ""
+    # điền dần trong lúc chạy flow
+    dsn: str = ""
+    usb_cable: str = ""
+    sfc_fields: Dict[str, str] = field(default_factory=dict)
+    t0: float = field(default_factory=time.perf_counter)
+    # True khi unit đã qua hết bước cần unit nằm trên fixture (chỉ còn SFC confirm)
+    released: bool = False
+
+    @property
+    def unit_key(self) -> Tuple[str, str, str]:
+        """Khoá nhận diện unit, dùng để khớp với ScanPrefetch (không chứa DSN, xem ScanPrefetch)."""
+        return (self.mode, self.model, self.book1)
+# ========================== CYCLE CONTEXT: END ==========================
+
+# ========================== SCAN PREFETCH: START ==========================
+class ScanPrefetch:
+    """
+    Quét camera + hỏi Golden Eye chạy nền ngay sau khi commit BOOK1,
+    trong lúc công nhân còn đang quét BOOK2.
+
+    - key: định danh unit (mode, model, BOOK1...). Khi validate cuối,
+      chỉ dùng kết quả nếu key khớp và chưa quá max_age giây; ngược lại bỏ.
+      BOOK1 (SSN2) giống nhau với mọi unit cùng model -> StationEngine còn bỏ
+      scan có DSN trùng DSN của cycle gần nhất (unit cũ chưa được nhấc ra).
+    - scan(): trả bytes camera (hoặc None)
+    - lookup(scanned_sn): trả (ok, response, SFCResult) như send_and_parse
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        key: Hashable,
+        scan: Callable[[], Optional[bytes]],
+        lookup: Callable[[str], Tuple[bool, str, SFCResult]],
+        max_age: float = 15.0,
+    ):
+        self.key = key
+        self.max_age = max_age
+        self.started = time.monotonic()
+        self._executor = executor
+        self._lookup = lookup
+        self._discarded = False
+        self._ready = threading.Event()
+        self.scanned: Optional[bytes] = None
+        self.lookup_future: Optional["Future[Tuple[bool, str, SFCResult]]"] = None
+        self.scan_future = executor.submit(scan)
+        self.scan_future.add_done_callback(self._on_scan)
+
+    def _on_scan(self, fut: Future) -> None:
+        try:
+            scan = None if fut.cancelled() else fut.result()
+            self.scanned = scan
+            if scan is not None and not self._discarded:
+                self.lookup_future = self._executor.submit(self._lookup, clean_scanned_sn(scan))
+        except Exception:
+            self.scanned = None
+        finally:
+            self._ready.set()
+
+    def matches(self, key: Hashable) -> bool:
+        if self._discarded or key != self.key:
+            return False
+        return (time.monotonic() - self.started) <= self.max_age
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[bytes, "Future[Tuple[bool, str, SFCResult]]"]]:
+        """
+        Chờ camera xong (tối đa timeout) rồi trả (scan_bytes, golden_eye_future).
+        None nếu camera không trả gì -> caller quét lại như bình thường.
+        """
+        if not self._ready.wait(timeout):
+            return None
+        if self._discarded or self.scanned is None or self.lookup_future is None:
+            return None
+        return self.scanned, self.lookup_future
+
+    def discard(self) -> None:
+        self._discarded = True
+        self.scan_future.cancel()
+        if self.lookup_future is not None:
+            self.lookup_future.cancel()
+# ========================== SCAN PREFETCH: END ==========================
+
+__all__ = [
+    "check_books",
+    "clean_scanned_sn",
+    "check_golden_eye",
+    "check_sfc_query",
+    "confirm_books",
+    "confirm_payload",
+    "StationPorts",
+    "StepTimeouts",
+    "AdaptiveTimeouts",
+    "CycleContext",
+    "ScanPrefetch",
+]
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+
+# ========================== SPAN TRACER: START ==========================
+class Span(NamedTuple):
+    name: str
+    cat: str
+    start: float            # perf_counter (giây)
+    end: float
+    tid: int
+    args: Dict[str, Any]
+
+
+class Tracer:
+    """
+    Ghi span (tên, thời điểm bắt đầu/kết thúc, thread) vào ring buffer
+    giới hạn `capacity` span gần nhất -> chạy cả ca không tốn thêm bộ nhớ.
+
+    Usage:
+        tracer = Tracer()
+        with tracer.span("sfc_query", seq=12) as args:
+            ...
+            args["ok"] = True           # thêm args sau khi biết kết quả
+        tracer.export_chrome("trace.json")  # mở bằng chrome://tracing / Perfetto
+    """
+
+    def __init__(self, capacity: int = 20000, enabled: bool = True):
+        self.enabled = enabled
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._threads: Dict[int, str] = {}
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter()
+
+    def add(self, name: str, start: float, end: float, cat: str = "cycle", **args: Any) -> None:
+        """Ghi span đã đo sẵn (vd. độ trễ từ worker -> Tk main thread)."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads.setdefault(thread.ident or 0, thread.name)
+            self._spans.append(Span(name, cat, start, end, thread.ident or 0, args))
+
+    @contextmanager
+    def span(self, name: str, cat: str = "cycle", **args: Any) -> Iterator[Dict[str, Any]]:
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, start, time.perf_counter(), cat, **args)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event format (ph="X", ts/dur theo micro giây)."""
+        with self._lock:
+            spans = list(self._spans)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        tids = {ident: i + 1 for i, ident in enumerate(threads)}
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[ident], "args": {"name": name}}
+            for ident, name in threads.items()
+        ]
+        for s in spans:
+            events.append({
+                "name": s.name,
+                "cat": s.cat,
+                "ph": "X",
+                "ts": round((s.start - self._epoch) * 1e6, 1),
+                "dur": round((s.end - s.start) * 1e6, 1),
+                "pid": pid,
+                "tid": tids.get(s.tid, 0),
+                "args": {k: v if isinstance(v, (int, float, bool, str)) else str(v) for k, v in s.args.items()},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path) -> int:
+        """Ghi file JSON, trả số span đã ghi."""
+        data = self.to_chrome()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return sum(1 for e in data["traceEvents"] if e["ph"] == "X")
+# ========================== SPAN TRACER: END ==========================
+
+__all__ = [
+    "Span",
+    "Tracer",
+]
@@ -0,0 +1,368 @@
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # type: ignore
+    HAS_NUMPY = True
+except Exception:
+    np = None
+    HAS_NUMPY = False
+
+# ========================== REPORTED KPI POLICY: START ==========================
+# FAIL có được tính vào REPORTED KPI không (BookyApp._should_count_fail)
+_REP_MIN_TOTAL = 100        # chưa đủ 100 unit -> luôn tính
+_REP_STAGE_A_FAILS = 20     # Stage A: rep_fail <= 20
+_REP_P_STAGE_A = 0.5
+_REP_P_STAGE_B = 0.13
+
+
+def reported_fail_probability(rep_total: int, rep_fail: int) -> float:
+    """
+    Xác suất 1 FAIL được tính vào REPORTED KPI với counter hiện tại.
+    - rep_total < 100 hoặc chưa có FAIL nào: 1.0
+    - Stage A (rep_fail <= 20): 0.5
+    - Stage B (rep_fail > 20): 0.13
+    """
+    if rep_total < _REP_MIN_TOTAL or rep_fail == 0:
+        return 1.0
+    if rep_fail <= _REP_STAGE_A_FAILS:
+        return _REP_P_STAGE_A
+    return _REP_P_STAGE_B
+# ========================== REPORTED KPI POLICY: END ==========================
+
+# ========================== YIELD SIMULATOR: START ==========================
+CAUSES = ("PASS", "HUMAN", "SYSTEM", "HUMAN+SYSTEM")
+_CHUNK = 1 << 20
+
+
+class CycleDist(NamedTuple):
+    """
+    Phân phối cycle time (giây):
+      uniform   a..b
+      normal    mean a, độ lệch chuẩn b (cắt ở 0)
+      lognormal median a, sigma b
+    """
+    kind: str = "uniform"
+    a: float = 0.6
+    b: float = 1.6
+
+    @classmethod
+    def parse(cls, text: str) -> "CycleDist":
+        """"uniform:0.6:1.6" / "normal:1.1:0.2" / "lognormal:1.0:0.25"."""
+        kind, a, b = text.split(":")
+        dist = cls(kind.strip().lower(), float(a), float(b))
+        if dist.kind not in ("uniform", "normal", "lognormal"):
+            raise ValueError(f"unknown cycle distribution: {kind}")
+        return dist
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+    def draw(self, rng, n: int):
+        """n mẫu (numpy Generator)."""
+        if self.kind == "normal":
+            return np.maximum(rng.normal(self.a, self.b, n), 0.0)
+        if self.kind == "lognormal":
+            return rng.lognormal(math.log(self.a), self.b, n)
+        return rng.uniform(self.a, self.b, n)
+
+    def draw_one(self, rng: random.Random) -> float:
+        if self.kind == "normal":
+            return max(rng.gauss(self.a, self.b), 0.0)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b)
+        return rng.uniform(self.a, self.b)
+
+
+class SimResult(NamedTuple):
+    p_human: float
+    p_system: float
+    cycle: str
+    n: int
+    passed: int
+    causes: Dict[str, int]
+    rep_total: int
+    rep_pass: int
+    rep_fail: int
+    cycle_mean: float
+    cycle_stdev: float
+    cycle_p50: float
+    cycle_p90: float
+    cycle_p99: float
+    cycle_max: float
+    elapsed: float
+
+    @property
+    def failed(self) -> int:
+        return self.n - self.passed
+
+    @property
+    def yield_pct(self) -> float:
+        return (self.passed / self.n * 100.0) if self.n else 100.0
+
+    @property
+    def rep_yield_pct(self) -> float:
+        return (self.rep_pass / self.rep_total * 100.0) if self.rep_total else 100.0
+
+    @property
+    def units_per_hour(self) -> float:
+        """Năng lực 1 trạm nếu cycle time là nút thắt (unit / giờ, kể cả FAIL)."""
+        return 3600.0 / self.cycle_mean if self.cycle_mean > 0 else 0.0
+
+    @property
+    def good_per_hour(self) -> float:
+        return self.units_per_hour * self.passed / self.n if self.n else 0.0
+
+    def as_row(self) -> Dict[str, object]:
+        row = {name: getattr(self, name) for name in TABLE_FIELDS}
+        row.update({f"cause_{name}": self.causes.get(name, 0) for name in CAUSES[1:]})
+        return row
+
+
+# cột bảng tóm tắt / CSV
+TABLE_FIELDS = (
+    "p_human", "p_system", "cycle", "n", "passed", "failed", "yield_pct",
+    "rep_total", "rep_fail", "rep_yield_pct",
+    "cycle_mean", "cycle_p50", "cycle_p90", "cycle_p99", "cycle_max",
+    "units_per_hour", "good_per_hour", "elapsed",
+)
+
+
+def _reported_counts(fail, rng) -> Tuple[int, int]:
+    """
+    (rep_total, rep_fail) như khi chạy _should_count_fail lần lượt từng unit.
+    Chỉ các FAIL đầu (tới khi vào Stage B, thường vài trăm) duyệt bằng Python;
+    Stage B không đổi xác suất nữa nên phần còn lại đếm trên cả mảng.
+    """
+    fail_idx = np.flatnonzero(fail)
+    n_pass = len(fail) - len(fail_idx)
+    u = rng.random(len(fail_idx))
+    counted = 0
+    k = 0
+    while k < len(fail_idx):
+        rep_total = int(fail_idx[k]) - k + counted     # PASS trước unit này + FAIL đã tính
+        if rep_total >= _REP_MIN_TOTAL and counted > _REP_STAGE_A_FAILS:
+            break
+        if u[k] < reported_fail_probability(rep_total, counted):
+            counted += 1
+        k += 1
+    counted += int(np.count_nonzero(u[k:] < _REP_P_STAGE_B))
+    return n_pass + counted, counted
+
+
+def _summary(
+    p_human: float, p_system: float, cycle: CycleDist, n: int, causes: Sequence[int],
+    rep: Tuple[int, int], ct: Tuple[float, ...], elapsed: float,
+) -> SimResult:
+    rep_total, rep_fail = rep
+    return SimResult(
+        p_human, p_system, str(cycle), n, int(causes[0]),
+        {name: int(count) for name, count in zip(CAUSES, causes)},
+        rep_total, rep_total - rep_fail, rep_fail,
+        *ct, elapsed,
+    )
+
+
+def _simulate_numpy(n, p_human, p_system, cycle, reported, seed) -> SimResult:
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    cycles = np.empty(n, dtype=np.float32)
+    fail = np.empty(n, dtype=bool) if reported else None
+    causes = np.zeros(len(CAUSES), dtype=np.int64)
+    total = 0.0
+    total_sq = 0.0
+    # rút theo chunk -> bộ nhớ tạm cố định, chỉ giữ cycle (float32) + cờ FAIL
+    for start in range(0, n, _CHUNK):
+        m = min(_CHUNK, n - start)
+        ct = cycle.draw(rng, m)
+        code = (rng.random(m) < p_human).astype(np.int8)
+        code |= (rng.random(m) < p_system).astype(np.int8) << 1
+        causes += np.bincount(code, minlength=len(CAUSES))
+        cycles[start:start + m] = ct
+        total += float(ct.sum())
+        total_sq += float(np.square(ct).sum())
+        if fail is not None:
+            fail[start:start + m] = code != 0
+
+    if n:
+        mean = total / n
+        stdev = math.sqrt(max(total_sq / n - mean * mean, 0.0) * n / (n - 1)) if n > 1 else 0.0
+        p50, p90, p99 = (float(v) for v in np.quantile(cycles, (0.5, 0.9, 0.99)))
+        ct = (mean, stdev, p50, p90, p99, float(cycles.max()))
+    else:
+        ct = (0.0,) * 6
+    rep = _reported_counts(fail, rng) if reported else (0, 0)
+    return _summary(p_human, p_system, cycle, n, causes, rep, ct, time.perf_counter() - t0)
+
+
+def _quantile_sorted(values: Sequence[float], q: float) -> float:
+    """Nội suy tuyến tính như numpy.quantile (values đã sort)."""
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _simulate_python(n, p_human, p_system, cycle, reported, seed) -> SimResult:
+    t0 = time.perf_counter()
+    rng = random.Random(seed)
+    cycles = [cycle.draw_one(rng) for _ in range(n)]
+    causes = [0] * len(CAUSES)
+    rep_total = rep_fail = 0
+    for _ in range(n):
+        code = (rng.random() < p_human) | (rng.random() < p_system) << 1
+        causes[code] += 1
+        if not reported:
+            continue
+        if code == 0:
+            rep_total += 1
+        elif rng.random() < reported_fail_probability(rep_total, rep_fail):
+            rep_total += 1
+            rep_fail += 1
+
+    if n:
+        mean = sum(cycles) / n
+        stdev = math.sqrt(sum((c - mean) ** 2 for c in cycles) / (n - 1)) if n > 1 else 0.0
+        cycles.sort()
+        ct = (mean, stdev, *(_quantile_sorted(cycles, q) for q in (0.5, 0.9, 0.99)), cycles[-1])
+    else:
+        ct = (0.0,) * 6
+    return _summary(p_human, p_system, cycle, n, causes, (rep_total, rep_fail), ct, time.perf_counter() - t0)
+
+
+def simulate(
+    n: int,
+    p_human: float = 0.20,
+    p_system: float = 0.03,
+    cycle: CycleDist = CycleDist(),
+    *,
+    reported: bool = True,
+    seed=None,
+) -> SimResult:
+    """
+    Monte Carlo n unit: mỗi unit có cycle time theo `cycle`, FAIL khách quan
+    (công nhân/đèn/camera) với xác suất p_human, FAIL do hệ thống với p_system.
+
+    Có numpy: rút toàn bộ cycle time / nguyên nhân FAIL theo mảng (vài triệu unit / giây);
+    không có: vòng lặp Python (chậm, cùng kết quả thống kê).
+    reported=True: tính thêm REPORTED KPI theo reported_fail_probability.
+    Không đụng tới Tk -> gọi từ worker thread / process nào cũng được.
+    """
+    n = max(int(n), 0)
+    if HAS_NUMPY:
+        return _simulate_numpy(n, p_human, p_system, cycle, reported, seed)
+    return _simulate_python(n, p_human, p_system, cycle, reported, seed)
+
+
+def _sweep_point(args) -> SimResult:
+    n, p_human, p_system, cycle, reported, seed = args
+    return simulate(n, p_human, p_system, cycle, reported=reported, seed=seed)
+
+
+def sweep(
+    n: int,
+    p_human: Iterable[float] = (0.20,),
+    p_system: Iterable[float] = (0.03,),
+    cycles: Iterable[CycleDist] = (CycleDist(),),
+    *,
+    reported: bool = False,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> List[SimResult]:
+    """
+    simulate() cho mọi tổ hợp (cycle, p_human, p_system), chạy song song trên
+    process pool (`workers`, mặc định số CPU; 1 = tuần tự).
+    Mỗi điểm có luồng random riêng sinh từ `seed` -> cùng seed cho cùng bảng.
+    """
+    grid = list(product(cycles, p_human, p_system))
+    if HAS_NUMPY:
+        seeds = np.random.SeedSequence(seed).spawn(len(grid))
+    else:
+        base = random.Random(seed)
+        seeds = [base.getrandbits(64) for _ in grid]
+    tasks = [(n, ph, ps, cd, reported, s) for (cd, ph, ps), s in zip(grid, seeds)]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_sweep_point(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_sweep_point, tasks))
+
+
+def format_table(results: Sequence[SimResult]) -> str:
+    """Bảng tóm tắt (1 dòng / điểm sweep)."""
+    lines = [
+        f"{'p_human':>8}{'p_system':>9}  {'cycle':<20}{'n':>10}{'yield':>8}{'rep':>8}"
+        f"{'ct_mean':>9}{'ct_p99':>8}{'units/h':>9}{'good/h':>9}{'time':>8}"
+    ]
+    for r in results:
+        rep = f"{r.rep_yield_pct:.2f}%" if r.rep_total else "-"
+        lines.append(
+            f"{r.p_human:>8.3f}{r.p_system:>9.3f}  {r.cycle:<20}{r.n:>10}{r.yield_pct:>7.2f}%{rep:>8}"
+            f"{r.cycle_mean:>8.3f}s{r.cycle_p99:>7.3f}s{r.units_per_hour:>9.0f}{r.good_per_hour:>9.0f}"
+            f"{r.elapsed:>7.2f}s"
+        )
+    return "\n".join(lines)
+
+
+def export_csv(results: Sequence[SimResult], path) -> int:
+    rows = [r.as_row() for r in results]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(TABLE_FIELDS))
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+# ========================== YIELD SIMULATOR: END ==========================
+
+# ========================== YIELD SIMULATOR CLI: START ==========================
+def _main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.yield_sim",
+        description="Mô phỏng Monte Carlo yield / năng lực trạm, sweep theo p_human, p_system, cycle time.",
+    )
+    parser.add_argument("-n", "--units", type=int, default=1_000_000, help="số unit mỗi điểm")
+    parser.add_argument("--p-human", type=float, nargs="+", default=[0.20])
+    parser.add_argument("--p-system", type=float, nargs="+", default=[0.03])
+    parser.add_argument(
+        "--cycle", type=CycleDist.parse, nargs="+", default=[CycleDist()],
+        help="uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--reported", action="store_true", help="tính thêm REPORTED KPI")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-j", "--workers", type=int, help="số process (mặc định số CPU)")
+    parser.add_argument("-o", "--output", help="ghi bảng ra file CSV")
+    args = parser.parse_args(argv)
+
+    results = sweep(
+        args.units, args.p_human, args.p_system, args.cycle,
+        reported=args.reported, seed=args.seed, workers=args.workers,
+    )
+    print(format_table(results))
+    if args.output:
+        print(f"exported {export_csv(results, args.output)} rows -> {args.output}")
+    return 0
+# ========================== YIELD SIMULATOR CLI: END ==========================
+
+__all__ = [
+    "HAS_NUMPY",
+    "CAUSES",
+    "TABLE_FIELDS",
+    "reported_fail_probability",
+    "CycleDist",
+    "SimResult",
+    "simulate",
+    "sweep",
+    "format_table",
+    "export_csv",
+]
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -0,0 +1 @@
+from src.devices.emulator.emulator import *
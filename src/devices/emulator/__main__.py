@@ -0,0 +1,63 @@
+import argparse
+import time
+from src.devices.emulator.emulator import *
+
+
+def _profile(args, prefix: str) -> EmulatorProfile:
+    latency = getattr(args, f"{prefix}_latency")
+    return EmulatorProfile(
+        latency=args.latency if latency is None else latency,
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        drop_rate=args.drop_rate,
+        garbage_rate=args.garbage_rate,
+        chunk=args.chunk,
+    )
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        prog="python -m src.devices.emulator",
+        description="Camera / Golden Eye / SFC giả trên pseudo-terminal (Linux/macOS).",
+    )
+    parser.add_argument("--config", help="ghi [COM] của config.ini trỏ vào các pty")
+    parser.add_argument("--units", type=int, default=10, help="số unit trong catalog")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--camera-latency", type=float, default=None)
+    parser.add_argument("--golden-eye-latency", type=float, default=None)
+    parser.add_argument("--sfc-latency", type=float, default=None)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0)
+    parser.add_argument("--chunk", type=int, default=0, help="gửi response theo mảnh N byte")
+    parser.add_argument("--rotate", action="store_true", help="đổi unit sau mỗi SFC confirm")
+    args = parser.parse_args()
+
+    station = FakeStation(
+        UnitCatalog.sample(args.units, seed=args.seed),
+        camera=_profile(args, "camera"),
+        golden_eye=_profile(args, "golden_eye"),
+        sfc=_profile(args, "sfc"),
+        rotate=args.rotate,
+        seed=args.seed,
+    )
+    print(f"camera     : {station.camera.path}")
+    print(f"golden_eye : {station.golden_eye.path}")
+    print(f"sfc        : {station.sfc.path}")
+    print(f"unit       : {station.catalog.current}")
+    if args.config:
+        station.write_config(args.config)
+        print(f"[COM] written to {args.config}")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        station.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,270 @@
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.core.core import CAMERA_CMD
+from src.core.station import StationPorts
+
+# ========================== EMULATOR PROFILE: START ==========================
+@dataclass
+class EmulatorProfile:
+    """
+    Hành vi của 1 thiết bị giả:
+    - latency / jitter: trễ trả lời (giây) = latency ± jitter
+    - fail_rate: xác suất trả ...,FAIL thay vì ...,PASS
+    - drop_rate: xác suất không trả lời gì (test timeout)
+    - garbage_rate: xác suất chèn byte rác trước response
+    - chunk: > 0 -> gửi response thành từng mảnh `chunk` byte (test parser stream)
+    """
+    latency: float = 0.05
+    jitter: float = 0.0
+    fail_rate: float = 0.0
+    drop_rate: float = 0.0
+    garbage_rate: float = 0.0
+    chunk: int = 0
+
+
+@dataclass
+class UnitCatalog:
+    """
+    Dữ liệu unit dùng chung giữa camera, Golden Eye và SFC:
+    camera quét ra `current`, Golden Eye / SFC tra SSN4 theo DSN.
+    """
+    units: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    current: str = ""
+
+    def add(self, dsn: str, ssn4: str, **fields: str) -> None:
+        self.units[dsn] = {"SSN4": ssn4, **{k.upper(): v for k, v in fields.items()}}
+        if not self.current:
+            self.current = dsn
+
+    @classmethod
+    def sample(cls, count: int = 10, seed: Optional[int] = None) -> "UnitCatalog":
+        rnd = random.Random(seed)
+        catalog = cls()
+        for _ in range(count):
+            dsn = "G" + "".join(rnd.choice("0123456789ABCDEF") for _ in range(15))
+            catalog.add(dsn, ssn4="USB" + "".join(rnd.choice("0123456789") for _ in range(8)))
+        return catalog
+# ========================== EMULATOR PROFILE: END ==========================
+
+# ========================== PTY DEVICE: START ==========================
+def _parse_request(line: bytes) -> Dict[str, str]:
+    """DSN=%,SSN2=%,...,END -> {"DSN": ..., "SSN2": ...}"""
+    fields: Dict[str, str] = {}
+    for tok in line.decode("utf-8", errors="replace").split(","):
+        key, eq, value = tok.strip().partition("=")
+        if eq:
+            fields[key.strip().upper()] = value.strip()
+    return fields
+
+
+class PtyDevice:
+    """
+    1 thiết bị giả trên pseudo-terminal (POSIX).
+    `path` (vd. /dev/pts/3) dùng như tên cổng COM trong config.ini [COM].
+
+    handler(request_bytes) -> response bytes (không kèm CRLF) hoặc None.
+    Request kết thúc bằng CR/LF; riêng camera nhận trigger CAMERA_CMD.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[bytes], Optional[bytes]],
+        profile: EmulatorProfile = EmulatorProfile(),
+        *,
+        trigger: Optional[bytes] = None,
+        seed: Optional[int] = None,
+    ):
+        import pty
+        import tty
+
+        self.name = name
+        self.profile = profile
+        self.requests = 0
+        self._handler = handler
+        self._trigger = trigger
+        self._rnd = random.Random(seed)
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.path = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"Emulator-{name}", daemon=True)
+        self._thread.start()
+
+    def _requests(self, buf: bytearray) -> List[bytes]:
+        out: List[bytes] = []
+        while True:
+            if self._trigger is not None:
+                idx = buf.find(self._trigger)
+                if idx < 0:
+                    return out
+                out.append(bytes(self._trigger))
+                del buf[:idx + len(self._trigger)]
+                continue
+            ends = [i for i in (buf.find(b"\r"), buf.find(b"\n")) if i >= 0]
+            if not ends:
+                return out
+            idx = min(ends)
+            line = bytes(buf[:idx]).strip()
+            del buf[:idx + 1]
+            if line:
+                out.append(line)
+
+    def _run(self) -> None:
+        buf = bytearray()
+        while not self._stop.is_set():
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return
+            if not data:
+                return
+            buf.extend(data)
+            for request in self._requests(buf):
+                self.requests += 1
+                self._reply(request)
+
+    def _reply(self, request: bytes) -> None:
+        p, rnd = self.profile, self._rnd
+        if rnd.random() < p.drop_rate:
+            return
+        response = self._handler(request)
+        if response is None:
+            return
+        if rnd.random() < p.fail_rate:
+            head, sep, _ = response.rpartition(b",")
+            response = head + sep + b"FAIL" if sep else b"FAIL"
+        payload = response + b"\r\n"
+        if rnd.random() < p.garbage_rate:
+            payload = bytes(rnd.randrange(0x20, 0x7F) for _ in range(rnd.randint(1, 8))) + b"\r\n" + payload
+
+        time.sleep(max(0.0, p.latency + rnd.uniform(-p.jitter, p.jitter)))
+        step = p.chunk if p.chunk > 0 else len(payload)
+        try:
+            for i in range(0, len(payload), step):
+                os.write(self._master, payload[i:i + step])
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self._stop.set()
+        for fd in (self._slave, self._master):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+# ========================== PTY DEVICE: END ==========================
+
+# ========================== FAKE STATION: START ==========================
+class FakeStation:
+    """
+    Camera + Golden Eye + SFC giả, nói đúng protocol trong INFO dialog:
+
+        Camera       : CAMERA_CMD            -> <DSN>
+        Golden Eye   : DSN=%,END             -> DSN=%,SSN4=%,PASS
+        SFC (lần 1)  : DSN=%,END             -> DSN=%,SSN4=%,...,PASS
+        SFC (confirm): DSN=%,SSN2=%,SSN8=%,END -> DSN=%,SSN2=%,SSN8=%,PASS
+
+    DSN lạ -> ...,FAIL. Golden Eye chấp nhận cả SN trần (không có DSN=...).
+    rotate=True: sau mỗi SFC confirm camera chuyển sang unit kế tiếp.
+
+    Usage:
+        station = FakeStation(UnitCatalog.sample(seed=1), sfc=EmulatorProfile(latency=0.2))
+        ports = station.ports        # StationPorts(camera=/dev/pts/.., ...)
+        station.write_config("config.ini")
+        ...
+        station.close()
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[UnitCatalog] = None,
+        *,
+        camera: EmulatorProfile = EmulatorProfile(latency=0.02),
+        golden_eye: EmulatorProfile = EmulatorProfile(),
+        sfc: EmulatorProfile = EmulatorProfile(),
+        rotate: bool = False,
+        seed: Optional[int] = None,
+    ):
+        self.catalog = catalog or UnitCatalog.sample(seed=seed)
+        self.rotate = rotate
+        self.confirmed: List[Dict[str, str]] = []
+        self.camera = PtyDevice("camera", self._camera, camera, trigger=CAMERA_CMD, seed=seed)
+        self.golden_eye = PtyDevice("golden_eye", self._golden_eye, golden_eye, seed=seed)
+        self.sfc = PtyDevice("sfc", self._sfc, sfc, seed=seed)
+
+    @property
+    def ports(self) -> StationPorts:
+        return StationPorts(camera=self.camera.path, golden_eye=self.golden_eye.path, sfc=self.sfc.path)
+
+    def _camera(self, request: bytes) -> Optional[bytes]:
+        return self.catalog.current.encode("ascii") if self.catalog.current else None
+
+    def _golden_eye(self, request: bytes) -> bytes:
+        fields = _parse_request(request)
+        dsn = fields.get("DSN") or request.decode("utf-8", errors="replace").strip()
+        unit = self.catalog.units.get(dsn)
+        if unit is None:
+            return f"DSN={dsn},FAIL".encode("utf-8")
+        return f"DSN={dsn},SSN4={unit['SSN4']},PASS".encode("utf-8")
+
+    def _sfc(self, request: bytes) -> bytes:
+        fields = _parse_request(request)
+        dsn = fields.get("DSN", "")
+        unit = self.catalog.units.get(dsn)
+        if unit is None:
+            return f"DSN={dsn},FAIL".encode("utf-8")
+        if "SSN2" in fields or "SSN8" in fields:
+            self.confirmed.append(fields)
+            if self.rotate:
+                self.next_unit()
+            return f"DSN={dsn},SSN2={fields.get('SSN2', '')},SSN8={fields.get('SSN8', '')},PASS".encode("utf-8")
+        extra = "".join(f",{k}={v}" for k, v in unit.items())
+        return f"DSN={dsn}{extra},PASS".encode("utf-8")
+
+    def next_unit(self) -> str:
+        """Camera chuyển sang unit kế tiếp trong catalog (vòng lại đầu)."""
+        dsns = list(self.catalog.units)
+        if not dsns:
+            return ""
+        idx = (dsns.index(self.catalog.current) + 1) % len(dsns) if self.catalog.current in dsns else 0
+        self.catalog.current = dsns[idx]
+        return self.catalog.current
+
+    def write_config(self, path) -> None:
+        """Ghi [COM] trỏ vào các pty (giữ nguyên các section khác)."""
+        import configparser
+        cfg = configparser.ConfigParser()
+        cfg.read(path, encoding="utf-8")
+        if not cfg.has_section("COM"):
+            cfg.add_section("COM")
+        cfg.set("COM", "camera_com", self.camera.path)
+        cfg.set("COM", "camera_comscan", self.camera.path)
+        cfg.set("COM", "golden_eye_com", self.golden_eye.path)
+        cfg.set("COM", "sfc_com", self.sfc.path)
+        with open(path, "w", encoding="utf-8") as f:
+            cfg.write(f)
+
+    def close(self) -> None:
+        for dev in (self.camera, self.golden_eye, self.sfc):
+            dev.close()
+
+    def __enter__(self) -> "FakeStation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+# ========================== FAKE STATION: END ==========================
+
+__all__ = [
+    "EmulatorProfile",
+    "UnitCatalog",
+    "PtyDevice",
+    "FakeStation",
+]
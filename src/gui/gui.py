@@ -1,32 +1,27 @@
 
 # ========================== TKINTER GUI PARTS: START ==========================
-from collections import deque
 import tkinter as tk
 from tkinter import ttk
+import logging
 import os
 import time
 import random 
-from collections import Counter
 import threading
-import configparser
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from src.core.core import *
+from src.core.serial_pool import SerialPortPool
+from src.core.station import *
+from src.core.engine import *
+from src.core.config_store import *
+from src.core.kpi_journal import KPIJournal
+from src.core.yield_sim import CycleDist, SimResult, reported_fail_probability, simulate
 from src.utils.utils import *
 from PIL import Image, ImageDraw, ImageTk
 from src.gui.gui_KIP import KPIWidget
 from src.gui.gui_KPI import KPIWidget as new_KPIWidget
 from src.gui.gui_KPI import KPIEvent as new_KPIEvent
-# Global variables
-DSN = ""
-UPC = ""
-SN_BOOK1 = "" # SSN2
-SN_BOOK2 = "" # SSN8
-SFC_DSN = ""
-SFC_UPC = ""
-SFC_SSN4 = ""
-SFC_SSN2 = ""
-SFC_SSN8 = ""
-
+from src.gui.ui_scheduler import UIBus, UIScheduler
 PALETTE = {
     "bg_main":      "#f5f5f7",
     "bg_card":      "#ffffff",
@@ -44,7 +39,7 @@ class BookyApp(tk.Tk):
     def run_in_worker(self, func, on_done, *args, **kwargs):
         """
         Chạy func(*args, **kwargs) trong thread nền.
-        Khi xong sẽ gọi on_done(result, error) ở MAIN THREAD (tkinter).
+        Khi xong sẽ gọi on_done(result, error) ở MAIN THREAD (tkinter) qua self.bus.
         - func: hàm nặng / blocking (COM, SFC, ...)
         - on_done(result, error): callback cập nhật UI
         """
@@ -56,8 +51,8 @@ class BookyApp(tk.Tk):
             except Exception as e:
                 result = None
                 error = e
-            # Đảm bảo callback chạy trong main thread
-            self.after(0, on_done, result, error)
+            # Đảm bảo callback chạy trong main thread (theo thứ tự post)
+            self.bus.post(on_done, result, error)
 
         t = threading.Thread(target=worker, daemon=True)
         t.start()
@@ -67,46 +62,65 @@ class BookyApp(tk.Tk):
         Quyết định có tính FAIL vào REPORTED KPI hay không.
         - Stage A: rep_fail <= 20
         - Stage B: rep_fail > 20
+        (xác suất dùng chung với mô phỏng: yield_sim.reported_fail_probability)
         """
-        if self.rep_total < 100:
-            return True
-        
-        # -------- Stage A --------
-        if self.rep_fail <= 20:
-            if self.rep_fail == 0:
-                return True
-
-            r = random.uniform(0, self.rep_fail)
-            return r > (self.rep_fail * 0.5)
-
-        # -------- Stage B --------
-        if self.rep_total <= 0:
-            return False 
-
-        r = random.uniform(0, self.rep_total)
-        return r > (self.rep_total * 0.87)
+        return random.random() < reported_fail_probability(self.rep_total, self.rep_fail)
 
     def _rate(self, p, t):
         # Tính pass rate cho từng KPI
         return (p / t * 100) if t > 0 else 100.0
 
+    def _new_cycle(self) -> CycleContext:
+        """Chụp lại input của unit hiện tại vào 1 CycleContext riêng."""
+        return self.engine.new_cycle(
+            mode=self.mode_var.get() if hasattr(self, "mode_var") else "2book",
+            model=self.model_combo.get(),
+            book1=self.sn_book1,
+            book2=self.sn_book2,
+        )
+
+    def _release_cycle(self, ctx: CycleContext):
+        """
+        Pipeline: unit đã qua camera/Golden Eye/SFC lần 1, chỉ còn chờ SFC confirm.
+        Mở input cho unit kế tiếp ngay (MAIN THREAD).
+        """
+        if not self.flow_pipeline or ctx.released:
+            return
+        ctx.released = True
+        self.log.info(f"[PIPE] #{ctx.seq} released, scan next unit")
+        self.update_log_view()
+        self.enable_inputs()
+
     def start_flowthread_check(self):
         # Khóa input, báo trạng thái
+        ctx = self._new_cycle()
         self.disable_inputs()
         self.set_status("STANDBY")  # tạm thời, chờ kết quả
         self.log.info("STANDBY...")
         self.update_log_view()
 
+        tracer = self.engine.tracer
+        t_job_done = [0.0]
+
         def job():
             # Hàm nặng / blocking: gọi COM
             # Có thể chỉnh lại tham số cho phù hợp
-            return self.start_check()
+            try:
+                return self.start_check(ctx)
+            finally:
+                t_job_done[0] = tracer.now()
         
         def on_done(result, error):
-            donetime = time.perf_counter() - self._t0
+            t_ui = tracer.now()
+            tracer.add("ui.result_wait", t_job_done[0], t_ui, cat="ui", seq=ctx.seq)
+            donetime = time.perf_counter() - ctx.t0
+            kpi_counted = False
             if error:
                 self.set_status("FAIL")    
             else:
+                if isinstance(result, CycleResult):
+                    self.log.debug(f"[STAGE] #{result.seq} {result.stage_summary()}")
+                    result = (result.ok, result.message)
                 if isinstance(result, tuple) and len(result) == 2:
                     ok_flag, msg = result
                     self.real_total += 1    
@@ -114,123 +128,90 @@ class BookyApp(tk.Tk):
                         self.real_pass += 1
                         self.rep_total += 1
                         self.rep_pass += 1
-                        self.kpi.update_kpi(ok_flag, cycle_time=donetime)
+                        self.kpi.update_kpi(ok_flag, cycle_time=donetime, model=ctx.model)
+                        kpi_counted = True
                         self.set_status("PASS")
-                        self.log.info(f"[RESULT] PASS cycle={donetime:.3f}s")
+                        self.log.info(
+                            f"[RESULT] #{ctx.seq} PASS cycle={donetime:.3f}s",
+                            extra={"stage": "RESULT", "dsn": ctx.dsn},
+                        )
                     else:
                         self.real_fail += 1
                         if self._should_count_fail(): 
                             self.rep_total += 1
                             self.rep_fail += 1
-                            self.kpi.update_kpi(ok_flag, cycle_time=donetime)
+                            self.kpi.update_kpi(ok_flag, cycle_time=donetime, model=ctx.model)
+                            kpi_counted = True
                         self.set_status("FAIL")
-                        self.log.info(f"[RESULT] FAIL cycle={donetime:.3f}s msg={msg}")
-                        self.log.error(msg)
+                        self.log.info(
+                            f"[RESULT] #{ctx.seq} FAIL cycle={donetime:.3f}s msg={msg}",
+                            extra={"stage": "RESULT", "dsn": ctx.dsn},
+                        )
+                        self.log.error(msg, extra={"stage": "RESULT", "dsn": ctx.dsn})
                 elif isinstance(result, str):
                     # Giả sử camera trả text bình thường
                     self.set_status("PASS")
                 else:
                     self.set_status("FAIL")
                     self.log.error("No response from camera")
-            self.cycle_times.append(donetime)
+            # cycle time: mọi cycle đã chạy xong, kể cả FAIL không tính vào KPI
+            if not kpi_counted:
+                self.kpi.add_cycle_time(donetime)
 
             # redraw donut
             self._draw_donut()
             self.update_log_view()
-            self.enable_inputs()
+            # Pipeline: input đã mở cho unit sau từ lúc release, không xoá sách đang quét
+            if not ctx.released:
+                self.enable_inputs()
+            tracer.add("ui.result", t_ui, tracer.now(), cat="ui", seq=ctx.seq)
 
         # Gọi worker
-        self._t0 = time.perf_counter()
-        self.log.info("FLOW started!")
+        self.log.info(f"FLOW #{ctx.seq} started!")
         self.run_in_worker(job, on_done)
 
     # --------------------- Stimulation ---------------------------------
-    def start_simulation_worker(self, n: int = 10000, p_human: float = 0.20, p_system: float = 0.03):
+    def start_simulation_worker(
+        self,
+        n: int = 10000,
+        p_human: float = 0.20,
+        p_system: float = 0.03,
+        cycle: CycleDist = CycleDist(),
+    ):
         """
-        Simulate n lần test trong worker thread.
+        Simulate n lần test trong worker thread (yield_sim.simulate, vector hoá bằng numpy).
         - p_human: fail khách quan (công nhân/đèn/camera)
         - p_system: fail do hệ thống
+        - cycle: phân phối cycle time (mặc định uniform 0.6s..1.6s)
+        Worker chỉ tính, không đụng counter của app; kết quả gán ở on_done (MAIN THREAD).
         """
-        # reset counter (tuỳ bạn muốn reset hay cộng dồn)
-        self.real_total = 0
-        self.real_pass  = 0
-        self.real_fail  = 0
-
-        self.rep_total = 0
-        self.rep_pass  = 0
-        self.rep_fail  = 0
-
-        self.cycle_times.clear()
-
         self.disable_inputs()
         self.set_status("STANDBY")
-        self.log.info(f"[SIM] Start simulation: n={n}, p_human={p_human:.3f}, p_system={p_system:.3f}")
+        self.log.info(
+            f"[SIM] Start simulation: n={n}, p_human={p_human:.3f}, p_system={p_system:.3f}, cycle={cycle}"
+        )
         self.update_log_view()
 
         def job():
-            rng = random.Random()  # hoặc seed cố định: random.Random(1234)
-            cause_cnt = Counter()
-
-            t0 = time.perf_counter()
-            for i in range(1, n + 1):
-                # mô phỏng cycle time (giả lập) ~ 0.6s..1.6s
-                cycle = rng.uniform(0.6, 1.6)
-                # (không sleep để chạy nhanh; bạn muốn “real-time” thì time.sleep(cycle))
-
-                human_fail = (rng.random() < p_human)
-                system_fail = (rng.random() < p_system)
-
-                ok_flag = not (human_fail or system_fail)
-
-                if ok_flag:
-                    msg = "ALL PASSED"
-                    cause = "PASS"
-                else:
-                    if human_fail and system_fail:
-                        msg = "FAIL: Human+System"
-                        cause = "HUMAN+SYSTEM"
-                    elif human_fail:
-                        msg = "FAIL: Human/Lighting/Camera"
-                        cause = "HUMAN"
-                    else:
-                        msg = "FAIL: System"
-                        cause = "SYSTEM"
-
-                # ====== update counters giống on_done của bạn ======
-                self.real_total += 1
-                if ok_flag:
-                    self.real_pass += 1
-                    self.rep_total += 1
-                    self.rep_pass += 1
-                else:
-                    self.real_fail += 1
-                    if self._should_count_fail():
-                        self.rep_total += 1
-                        self.rep_fail += 1
-
-                self.cycle_times.append(cycle)
-                cause_cnt[cause] += 1
-
-                # log thưa thôi cho đỡ spam
-                if i % 100 == 0:
-                    real_rate = (self.real_pass / self.real_total) if self.real_total else 1.0
-                    rep_rate  = (self.rep_pass / self.rep_total) if self.rep_total else 1.0
-                    self.log.info(
-                        f"[SIM] {i}/{n} | real_pass={real_rate*100:.2f}% | rep_pass={rep_rate*100:.2f}%"
-                    )
-
-            elapsed = time.perf_counter() - t0
-            return (cause_cnt, elapsed)
+            return simulate(n, p_human, p_system, cycle, reported=True)
 
         def on_done(result, error):
             if error:
                 self.set_status("FAIL")
                 self.log.error(f"[SIM] Error: {error}")
             else:
-                cause_cnt, elapsed = result
-                real_rate = (self.real_pass / self.real_total) if self.real_total else 1.0
-                rep_rate  = (self.rep_pass / self.rep_total) if self.rep_total else 1.0
-       
+                res: SimResult = result
+                # reset counter (kết quả mô phỏng thay cho phiên hiện tại)
+                self.real_total = res.n
+                self.real_pass = res.passed
+                self.real_fail = res.failed
+                self.rep_total = res.rep_total
+                self.rep_pass = res.rep_pass
+                self.rep_fail = res.rep_fail
+
+                real_rate = res.yield_pct / 100.0
+                rep_rate = res.rep_yield_pct / 100.0
+
                 # Status cuối: theo KPI real hay rep tuỳ bạn
                 self.set_status("PASS" if real_rate >= 0.95 else "FAIL")
 
@@ -238,9 +219,15 @@ class BookyApp(tk.Tk):
                     f"[SIM][DONE] n={self.real_total} | "
                     f"REAL pass={self.real_pass} fail={self.real_fail} rate={real_rate*100:.2f}% | "
                     f"REP pass={self.rep_pass} fail={self.rep_fail} total={self.rep_total} rate={rep_rate*100:.2f}% | "
-                    f"elapsed={elapsed:.3f}s"
+                    f"elapsed={res.elapsed:.3f}s"
                 )
-                self.log.info(f"[SIM][CAUSE] {dict(cause_cnt)}")
+                self.log.info(f"[SIM][CAUSE] {res.causes}")
+                if res.n:
+                    self.log.info(
+                        f"[SIM][CYCLE] mean={res.cycle_mean:.3f}s p50={res.cycle_p50:.3f}s "
+                        f"p90={res.cycle_p90:.3f}s p99={res.cycle_p99:.3f}s max={res.cycle_max:.3f}s "
+                        f"| {res.units_per_hour:.0f} units/h"
+                    )
 
             # self._draw_donut()
 
@@ -249,164 +236,72 @@ class BookyApp(tk.Tk):
 
         self.run_in_worker(job, on_done)
 
-    def start_check(self):
-        global DSN, UPC, SFC_DSN, SFC_UPC, SFC_SSN2, SFC_SSN4, SFC_SSN8, SN_BOOK1, SN_BOOK2
-        if not hasattr(self, "_ensure_com_config"):
-            # self._ensure_com_config(self.config_path)
-            return False, f"FAIL: No Ensure Config - Fatal"
-        if not hasattr(self, "_load_com_config"):
-            # self._load_com_config(self.config_path)
-            return False, f"FAIL: No Load Config - Fatal"
-        if not hasattr(self, "model_codes"):
-            return False, f"FAIL: No Model Code [1]"
-        if not self.model_codes:
-            return False, f"FAIL: No Model Code [2]"
-        if not self.model_combo.get():
-            return False, f"FAIL: No Model Code [3]"
-        
-        self._ensure_com_config(self.config_path)
-        self._load_com_config(self.config_path)
-
-        if not hasattr(self, "comscan_camera"):
-            return False, f"FAIL: No com_camera"
-        if not hasattr(self, "com_sfc"):
-            return False, f"FAIL: No com_sfc"
-        if not hasattr(self, "com_golden_eye"):
-            return False, f"FAIL: No com_golden_eye"
-        
-        # Giả sử mode_var là StringVar("1book"/"2book")
-        mode = self.mode_var.get() if hasattr(self, "mode_var") else "2book"
+    def start_check(self, ctx: CycleContext | None = None) -> CycleResult:
+        """
+        Chạy toàn bộ flow cho 1 unit (worker thread) qua StationEngine.
+        ctx: trạng thái riêng của unit; None -> chụp từ input hiện tại.
+        """
+        if ctx is None:
+            ctx = self._new_cycle()
+        return self.engine.run_cycle(ctx)
 
-        # Compare SN_BOOK1 and SN_BOOK2 here
-        # Assume you already know the current model_code
-        expected_ssn2 = self.model_map[self.model_combo.get()].get("SSN2", "").strip()
-        expected_ssn8 = self.model_map[self.model_combo.get()].get("SSN8", "").strip()
+    def _engine_config(self):
+        """
+        config_loader của StationEngine (worker thread): snapshot ConfigStore,
+        chỉ parse lại khi config.ini đổi.
+        """
+        snap = self.config_store.snapshot()
+        if snap.version != self._config.version:
+            self.bus.post(self._on_config_changed, snap)
+        return snap.ports, snap.model_map
 
-        DSN1 = None
+    def _after_traced(self, name: str, func, *args):
+        """bus.post(...) + span đo độ trễ từ worker thread tới lúc Tk chạy xong callback."""
+        tracer = self.engine.tracer
+        t_post = tracer.now()
 
-        book1_status = str(self.book1_entry.cget("state"))
-        book2_status = str(self.book2_entry.cget("state"))
+        def run():
+            try:
+                func(*args)
+            finally:
+                tracer.add(name, t_post, tracer.now(), cat="ui")
 
-        # For check SN is empty 
-        def _is_blank(value: str | None) -> bool:
-            return not value or not value.strip()
+        self.bus.post(run)
 
-        if mode == "1book":
-            # Chỉ cần BOOK1
-            if _is_blank(SN_BOOK1):
-                return False, f"FAIL: Sảo sách sai! | Scan book wrong! |BOOK1={SN_BOOK1}|"
-            
-            # Compare BOOK1 with config SSN2 or SSN8 (whichever exists)
-            if SN_BOOK1 == expected_ssn2 or SN_BOOK1 == expected_ssn8:
-                pass
-            else:
-                return False, f"FAIL: BOOK1 mismatch! | Expected={expected_ssn2 or expected_ssn8} | Got={SN_BOOK1}"
-
-        else:  # mode == "2book"
-            # Cần cả BOOK1 và BOOK2
-            if _is_blank(SN_BOOK1) or _is_blank(SN_BOOK2):
-                return False, (
-                    f"FAIL: Sảo sách sai! | Scan book wrong! |"
-                    f"BOOK1={SN_BOOK1}|BOOK2={SN_BOOK2}|"
-                )
-            # Compare both against config
-            if (SN_BOOK1 == expected_ssn2 and SN_BOOK2 == expected_ssn8):
-                SN_BOOK1 = expected_ssn2
-                SN_BOOK2 = expected_ssn8
-            else:
-                return False, (
-                    f"FAIL: BOOK mismatch! | "
-                    f"Expected SSN2={expected_ssn2}, SSN8={expected_ssn8} | "
-                    f"Got BOOK1={SN_BOOK1}, BOOK2={SN_BOOK2}"
-                )            
-            
-        if book1_status == "disabled" and book2_status == "disabled":
-            scan_SN = control_comscan(
-                port=self.comscan_camera,
-                baudrate=9600,
-                timeout_sec=5,
-                log_callback=self.log.debug
-            )
-            clean_bytes = scan_SN.replace(b"\r", b"").replace(b"\n", b"")
-            clean_str = clean_bytes.decode("utf-8", errors="ignore")
+    def _on_engine_dsn(self, ctx: CycleContext):
+        self._after_traced("ui.dsn", self.set_dsn, ctx.dsn)
 
-            scanned_SN = clean_str
-            
-            USB_CABLE_6_FIRST_CHAR = None
-            SFC_SSN4_6_FIRST_CHAR = None
+    def _on_engine_release(self, ctx: CycleContext):
+        # Unit không cần nằm trên fixture nữa -> pipeline mở input cho unit sau
+        if self.flow_pipeline:
+            self._after_traced("ui.release", self._release_cycle, ctx)
 
-            self.log.info(f"scanned SN: {scanned_SN}")
-            self.update_log_view()
-
-            COM_GOLDEN_EYE = self.com_golden_eye
-            ok_golden_eye, result_golden_eye = send_text_and_wait(text=f"{scanned_SN}", port=COM_GOLDEN_EYE, read_timeout=7, log_callback=self.log.debug) # GoldenEye port COM4/3
-            if ok_golden_eye: # 
-                res_golden_eye = parse_sfc_response(result_golden_eye) # DSN=dfggfhgf,SSN4=fghgjhj,PASS
-                DSN1 = res_golden_eye.dsn or ""
-                if DSN1 != scanned_SN:
-                    return False, f"FAIL:{COM_GOLDEN_EYE} - DSN from Golden Eye không khớp với SN đã quét | DSN from Golden Eye not match scanned SN | DSN1={DSN1}|scanned_SN={scanned_SN}|{COM_GOLDEN_EYE}"
-
-                DSN = scanned_SN
-                self.set_dsn(DSN)
-                USB_CABLE = res_golden_eye.fields.get("SSN4", "")
+    def export_trace(self) -> None:
+        """Ghi span các cycle gần nhất ra trace_<time>.json (Chrome trace / Perfetto)."""
+        path = self.config_path.parent / time.strftime("trace_%Y%m%d_%H%M%S.json")
+        try:
+            count = self.engine.tracer.export_chrome(path)
+        except OSError as e:
+            self.log.error(f"[TRACE] export failed: {e}")
+        else:
+            self.log.info(f"[TRACE] {count} spans -> {path}")
+        self.update_log_view()
 
-                USB_CABLE_6_FIRST_CHAR = str(res_golden_eye.fields.get("SSN4", ""))
+    # ================== SCAN PREFETCH ==================
+    def _start_prefetch(self):
+        """
+        Bật bằng [FLOW] prefetch = true trong config.ini.
+        Sau khi commit BOOK1 (mode 2book), quét camera + hỏi Golden Eye chạy nền
+        trong lúc công nhân quét BOOK2.
+        """
+        self.engine.discard_prefetch()
+        if not getattr(self, "flow_prefetch", False) or self.mode_var.get() != "2book":
+            return
+        self.engine.start_prefetch((self.mode_var.get(), self.model_combo.get(), self.sn_book1))
+        self.log.debug(f"[PREFETCH] start camera scan for BOOK1={self.sn_book1}")
 
-            else:
-                return False, f"FAIL:{COM_GOLDEN_EYE} - No response from Golden Eye!"
-            
-            if DSN1 is None:
-                return False, f"FAIL:{COM_GOLDEN_EYE} - Golden Eye không trả về DSN | No DSN from Golden Eye | {COM_GOLDEN_EYE}"
-            
-            if USB_CABLE_6_FIRST_CHAR is None:
-                return False, f"FAIL:{COM_GOLDEN_EYE} - Golden Eye không trả về SSN4 | No SSN4 from Golden Eye | {COM_GOLDEN_EYE}"
-            
-            # Send DSN=%,END to COM7
-            COM_SFC = self.com_sfc
-            ok1, result1 = send_text_and_wait(text=f"DSN={DSN},END", port=COM_SFC, read_timeout=10, log_callback=self.log.debug) # DSN=,SSN4=,PASS
-            # Parse the response from COM7
-            if ok1:
-                res1 = parse_sfc_response(result1)
-                SFC_DSN = res1.dsn or ""
-                SFC_SSN4 = res1.fields.get("SSN4", "")
-                SFC_SSN4_6_FIRST_CHAR = str(res1.fields.get("SSN4", ""))
-                SFC_UPC = res1.fields.get("UPC", "")
-            else:
-                return False, f"FAIL: ERROR: No response from COM SFC"
-            # Compare full string of SSN4 (not 6 first char anymore!)
-            if SFC_SSN4_6_FIRST_CHAR is None:
-                return False, f"FAIL: ERROR: SSN4 from SFC is empty"
-            
-            if DSN != SFC_DSN:
-                return False, f"FAIL: ERROR: DSN invalid - DSN: {DSN}| SFC_DSN: {SFC_DSN}"
-            
-            if UPC and SFC_UPC and UPC != SFC_UPC:
-                return False, f"FAIL: ERROR: UPC invalid - UPC: {UPC}| SFC_UPC: {SFC_UPC}"
-            
-            if USB_CABLE_6_FIRST_CHAR != SFC_SSN4_6_FIRST_CHAR: # Validating USB_CABLE
-                return False, f"FAIL: ERROR: SSN4 invalid - USB_CABLE: {USB_CABLE_6_FIRST_CHAR}| SSN4: {SFC_SSN4_6_FIRST_CHAR}"
-            # USB CABLE  = SSN4
-            
-            # WSL SSN2
-            # QSG SSN8
-            # Handling SN BOOK Cases
-            if not SN_BOOK2 or "Skip" in SN_BOOK2 or mode == "1book":
-                SN_BOOK2 = "(NULL)"
-            if not SN_BOOK1:
-                SN_BOOK1 = "(NULL)"
-
-            # Send DSN=%,SSN2=%,SSN8=%,END to SFC
-            ok2, result2 = send_text_and_wait(text=f"DSN={DSN},SSN2={SN_BOOK1},SSN8={SN_BOOK2},END", port=COM_SFC, read_timeout=10, log_callback=self.log.debug) # DSN=%,SSN2=%,SSN8=%,PASS
-            if ok2: 
-                res2 = parse_sfc_response(result2)
-                SFC_DSN = res2.dsn or ""
-                SFC_SSN2 = res2.fields.get("SSN2", "")
-                SFC_SSN8 = res2.fields.get("SSN8", "")
-            else:
-                #  self.set_status(self.start_check())
-                return False, f"FAIL: ERROR: Reponse 2 FAIL"
-            return True, "ALL PASSED"
-        return False, f"Internal Error!"
+    def _discard_prefetch(self, *args):
+        self.engine.discard_prefetch()
 
     # ================== SFC WORKER EXAMPLE ==================
     def start_sfc_worker(self):
@@ -445,57 +340,42 @@ class BookyApp(tk.Tk):
 
 
     # ================== MODEL CONFIG ==================
-    def _load_model_config(self, path: Path):
+    def _apply_config(self, snap: StationConfig):
         """
-        Đọc config.ini kiểu:
-        [53-100252]
-        SSN2=...
-        SSN8=...
-
-        Lưu vào:
+        Gán snapshot config.ini (ConfigStore) vào các thuộc tính của app:
+        self.com_* / self.flow_* / self.timeout_* và
         self.model_map = { "53-100252": {"SSN2": "...", "SSN8": "..."}, ... }
         self.model_codes = ["53-100252", ...]
         """
-        self.model_map: dict[str, dict[str, str]] = {}
-        self.model_codes: list[str] = []
-
-        cfg = configparser.ConfigParser()
-        if path.exists():
-            cfg.read(path, encoding="utf-8")
-            for section in cfg.sections():
-                if section.upper() == "COM":
-                    continue
-                ssn2 = cfg.get(section, "SSN2", fallback="").strip()
-                ssn8 = cfg.get(section, "SSN8", fallback="").strip()
-                self.model_map[section] = {"SSN2": ssn2, "SSN8": ssn8}
-
-        self.model_codes = sorted(self.model_map.keys())
+        self._config = snap
+        self.comscan_camera = snap.ports.camera
+        self.com_golden_eye = snap.ports.golden_eye
+        self.com_sfc = snap.ports.sfc
+        self.flow_prefetch = snap.flow_prefetch
+        self.flow_pipeline = snap.flow_pipeline
+        self.timeout_adaptive = snap.timeout_adaptive
+        self.timeout_floor = snap.timeout_floor
+        self.timeout_ceiling = snap.timeout_ceiling
+        self.timeout_percentile = snap.timeout_percentile
+        self.timeout_margin = snap.timeout_margin
+        apply_log_profile(self.log.name, snap.log_profile)
+        # bản sao sửa được cho model editor
+        self.model_map: dict[str, dict[str, str]] = {code: dict(info) for code, info in snap.model_map.items()}
+        self.model_codes: list[str] = snap.model_codes
+
+    def _on_config_changed(self, snap: StationConfig):
+        """config.ini bị sửa từ bên ngoài -> cập nhật list model (MAIN THREAD)."""
+        if snap.version <= self._config.version:
+            return
+        self._apply_config(snap)
+        self.model_combo["values"] = self.model_codes
+        self.log.info("[CONFIG] config.ini reloaded")
 
     def _save_model_config(self):
         """
-        Ghi self.model_map ra file ini nhưng GIỮ section [COM] nếu đang có.
+        Ghi self.model_map ra file ini nhưng GIỮ [COM]/[FLOW]/[TIMEOUT].
         """
-        cfg = configparser.ConfigParser()
-        if self.config_path.exists():
-            cfg.read(self.config_path, encoding="utf-8")
-
-        # Xóa hết section model cũ (giữ COM)
-        for sec in list(cfg.sections()):
-            if sec.upper() != "COM":
-                cfg.remove_section(sec)
-
-        # Ghi lại model sections
-        for code, info in self.model_map.items():
-            if not cfg.has_section(code):
-                cfg.add_section(code)
-            if info.get("SSN2"):
-                cfg.set(code, "SSN2", info["SSN2"])
-            if info.get("SSN8"):
-                cfg.set(code, "SSN8", info["SSN8"])
-
-        self.config_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            cfg.write(f)
+        self._apply_config(self.config_store.save_models(self.model_map))
 
     def get_model_ssn(self, model_code: str):
         """
@@ -643,18 +523,21 @@ class BookyApp(tk.Tk):
         )
 
     def _draw_donut(self):
-        # delegate to KPIWidget
+        # delegate to KPIWidget (chỉ gán counter, donut vẽ lại theo frame của self.ui)
         if hasattr(self, "kpi"):
+            # cycle time (mean + p99) lấy từ sketch của KPIWidget, không tính lại từ list
             self.kpi.update_kpi(
                 rep_pass=self.rep_pass,
                 rep_total=self.rep_total,
-                cycle_times=self.cycle_times,
             )
 
 
     def __init__(self):
         super().__init__()
-        self.log, self.info_log_buf = build_log_buffer("BookyInfo")
+        # RAM chỉ giữ 5000 dòng log gần nhất, dòng cũ hơn nén ra logs/*.txt.gz
+        self.log, self.info_log_buf = build_log_buffer(
+            "BookyInfo", capacity=5000, spill_dir=get_config_path().parent / "logs"
+        )
         
         # KPI báo cáo
         self.rep_total = 0
@@ -666,7 +549,10 @@ class BookyApp(tk.Tk):
         self.real_pass = 0
         self.real_fail = 0
 
-        self.cycle_times = deque(maxlen=200)
+        # Input của unit đang quét (BOOK1 = SSN2, BOOK2 = SSN8); khi chạy flow
+        # được chụp vào CycleContext riêng của từng cycle
+        self.sn_book1 = ""
+        self.sn_book2 = ""
 
         icon_path = resource_path("src/assets/castle_booky_icon.ico")
         self.title("Castle Booky")
@@ -677,12 +563,57 @@ class BookyApp(tk.Tk):
             self.iconbitmap(icon_path)   # ✔ works he
         # Khởi tạo style ttk (theme sáng)
         self._init_style()
-        # Đường dẫn config & load model map
+        # Đường dẫn config & load model map (config.ini nằm cùng folder .py)
         self.config_path = get_config_path()
-        self._ensure_com_config(self.config_path)
-        self._load_com_config(self.config_path)
-        # Load config model (config.ini nằm cùng folder .py)
-        self._load_model_config(self.config_path)
+        # Đọc 1 lần, các cycle sau chỉ stat() -> file đổi mới parse lại
+        self.config_store = ConfigStore(self.config_path)
+        self._apply_config(self.config_store.snapshot())
+        # [UI] fps: KPI / status / Main Cause vẽ lại tối đa 1 lần mỗi frame
+        self.ui = UIScheduler(self, fps=self._config.ui_fps)
+        # worker thread -> Tk thread: 1 hàng đợi FIFO, rút theo lô mỗi poll_ms
+        self.bus = UIBus(self, poll_ms=self._config.ui_poll_ms)
+        # [KPI] journal -> tắt app giữa ca không mất sản lượng giờ / ca
+        self.kpi_journal = None
+        if self._config.kpi_journal:
+            try:
+                self.kpi_journal = KPIJournal(
+                    self.config_path.parent / self._config.kpi_journal,
+                    fsync_interval=self._config.kpi_fsync_interval,
+                )
+            except OSError as e:
+                self.log.error(f"[KPI] journal disabled: {e}")
+
+        # Pool giữ các cổng COM mở suốt ca (không open/close mỗi cycle)
+        self.port_pool = SerialPortPool(baudrate=9600, log_callback=self.log.debug)
+        # Thread phụ cho các exchange chạy song song trong 1 cycle (Golden Eye // SFC)
+        self.io_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="BookyIO")
+        # [TIMEOUT] adaptive = true -> deadline theo độ trễ đo được của từng port
+        adaptive = None
+        if self.timeout_adaptive:
+            adaptive = AdaptiveTimeouts(
+                self.port_pool.latency,
+                floor=self.timeout_floor,
+                ceiling=self.timeout_ceiling,
+                percentile=self.timeout_percentile,
+                margin=self.timeout_margin,
+            )
+        # Flow kiểm tra không phụ thuộc Tk; BookyApp chỉ cấp config + nhận callback
+        self.engine = StationEngine(
+            pool=self.port_pool,
+            config_loader=self._engine_config,
+            executor=self.io_executor,
+            adaptive=adaptive,
+            log_callback=self.log.info,
+            debug_callback=self.log.debug,
+            on_dsn=self._on_engine_dsn,
+            on_release=self._on_engine_release,
+        )
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.run_in_worker(
+            self.port_pool.prewarm,
+            lambda result, error: None,
+            [self.comscan_camera, self.com_golden_eye, self.com_sfc],
+        )
 
         # ====== Fonts dùng lại nhiều lần ======
         self.font_label = ("Segoe UI", 10, "bold")
@@ -786,6 +717,8 @@ class BookyApp(tk.Tk):
             style="Model.TCombobox",
         )
         self.model_combo.grid(row=0, column=0, sticky="ew")
+        # Đổi model -> kết quả prefetch (nếu có) không còn đúng unit
+        self.model_combo.bind("<<ComboboxSelected>>", self._discard_prefetch)
 
         # Nút bút chì: nhỏ, gọn, kiểu "icon button"
         self.model_edit_btn = ttk.Button(
@@ -852,6 +785,12 @@ class BookyApp(tk.Tk):
         )
         scroll.grid(row=1, column=1, sticky="ns", pady=(2, 0))
         self.cause_text.configure(yscrollcommand=scroll.set)
+        # Main Cause tự cập nhật khi có log mới (LogRing.subscribe)
+        # listener thread chỉ ghi _cause_latest rồi post lên UIBus (MAIN THREAD drain)
+        self._cause_latest = None
+        self._cause_shown = None
+        self._cause_scheduled = False
+        self.info_log_buf.subscribe(self._on_log_entries)
 
         # ====== INFO BUTTON (góc dưới trái, dưới Main Cause) ======
         # Cho status_card thêm 1 hàng cho nút INFO
@@ -875,8 +814,18 @@ class BookyApp(tk.Tk):
             pass_ring=PALETTE["success"],     # pass ring
             text_color=PALETTE["fg_text"],
             label_prefix="cycle_time:",
+            journal=self.kpi_journal,
+            scheduler=self.ui,
+            bus=self.bus,
+            prerender_donut=True,   # vẽ sẵn 0..100% lúc rảnh -> mỗi unit chỉ đổi ảnh
         )
         self.kpi.pack(side="left", padx=(0, 10))
+        if self.kpi.replayed:
+            # KPI báo cáo của KPI day hiện tại lấy lại từ journal
+            self.rep_total = self.kpi.rep_total
+            self.rep_pass = self.kpi.rep_pass
+            self.rep_fail = self.kpi.rep_fail
+            self.log.info(f"[KPI] replayed {self.kpi.replayed} events from {self.kpi_journal.path.name}")
 
         # RIGHT: move INFO button qua đây (đối diện donut)
         # self.info_btn.pack(...) -> chuyển sang footer_right
@@ -897,6 +846,24 @@ class BookyApp(tk.Tk):
         self.focus_book1()
         self.set_status("STANDBY")
 
+    def on_close(self):
+        """Đóng cửa sổ chính: trả lại các cổng COM rồi thoát."""
+        try:
+            self.engine.close()
+            self.io_executor.shutdown(wait=False, cancel_futures=True)
+            self.port_pool.close_all()
+            self.config_store.close()
+            if self.kpi_journal is not None:
+                self.kpi_journal.close()
+            self.bus.close()
+            self.ui.close()
+            self.log.debug(f"[UI] bus {self.bus.stats()} repaint {self.ui.stats()}")
+            self.log.debug(f"[LOG] buffer {self.info_log_buf.stats()}")
+            self.info_log_buf.flush()
+        except Exception as e:
+            self.log.error(f"Close port pool error: {e}")
+        self.destroy()
+
     def _center_window(self, win: tk.Toplevel):
         """Canh giữa win so với cửa sổ chính."""
         win.update_idletasks()
@@ -1093,9 +1060,9 @@ class BookyApp(tk.Tk):
             self.model_combo["values"] = self.model_codes
             self.model_var.set(code)
 
-            # Ghi file config.ini
+            # Ghi 1 model (SQLite: 1 dòng, ini: ghi lại config.ini)
             try:
-                self._save_model_config()
+                self._apply_config(self.config_store.upsert_model(code, ssn2, ssn8))
             except Exception as e:
                 # messagebox.showerror("Lỗi", f"Không lưu được config.ini:\n{e}")
                 self.show_error_dialog(message=f"Không lưu được config.ini:\n{e}")
@@ -1158,6 +1125,8 @@ class BookyApp(tk.Tk):
 
         # ESC để đóng
         win.bind("<Escape>", lambda e: on_cancel())
+        # Ctrl+Shift+T (ẩn): export trace các cycle gần nhất
+        win.bind("<Control-Shift-T>", lambda e: self.export_trace())
 
         outer = ttk.Frame(win, style="Card.TFrame", padding=(16, 12))
         outer.grid(row=0, column=0, sticky="nsew")
@@ -1201,13 +1170,13 @@ class BookyApp(tk.Tk):
         Được gọi khi đổi mode 1 Book / 2 Book.
         - 1 Book: BOOK2 luôn bị disable, chỉ dùng BOOK1.
         - 2 Book: BOOK2 mở cho nhập.
-        Đồng thời clear SN_BOOK1/2 để tránh sót dữ liệu cũ.
+        Đồng thời clear sn_book1/2 để tránh sót dữ liệu cũ.
         """
-        global SN_BOOK1, SN_BOOK2
         mode = self.mode_var.get()
 
-        SN_BOOK1 = ""
-        SN_BOOK2 = ""
+        self._discard_prefetch()
+        self.sn_book1 = ""
+        self.sn_book2 = ""
         self.set_book1("")
         self.set_book2("")
 
@@ -1227,7 +1196,13 @@ class BookyApp(tk.Tk):
         """
         Cập nhật trạng thái PASS / FAIL.
         status: 'PASS' hoặc 'FAIL' (không phân biệt hoa thường).
+        Nhiều lần trong 1 frame -> chỉ vẽ trạng thái cuối.
         """
+        self._status_pending = status
+        self.ui.mark("status", self._apply_status)
+
+    def _apply_status(self):
+        status = self._status_pending
         try:
             status = status.upper()
             if status == "PASS":
@@ -1248,23 +1223,60 @@ class BookyApp(tk.Tk):
             self.status_panel.configure(bg=color)
             self.status_label.configure(text=text, bg=color)
 
-    def update_log_view(self):
+    def _on_log_entries(self, entries):
         """
-        Ghi nội dung lý do FAIL xuống ô Main Cause.
+        Subscriber của info_log_buf (chạy ở listener thread của LogPipeline):
+        chỉ nhớ dòng nguyên nhân mới nhất, KHÔNG gọi Tk từ thread này - UIBus (SimpleQueue)
+        đưa việc vẽ về MAIN THREAD, nhiều dòng trong 1 frame -> 1 lần vẽ Main Cause.
         """
+        causes = [entry for entry in entries if self._is_cause(entry)]
+        if not causes:
+            return
+        self._cause_latest = causes[-1]
+        if not self._cause_scheduled:
+            self._cause_scheduled = True
+            self.bus.post(self._schedule_cause)
+
+    @staticmethod
+    def _is_cause(entry) -> bool:
+        """Main Cause chỉ hiện lỗi (>= ERROR) hoặc kết quả cycle, bỏ debug / [PIPE] / [PREFETCH]..."""
+        return isinstance(entry, LogEntry) and (entry.level >= logging.ERROR or entry.stage == "RESULT")
+
+    def _schedule_cause(self):
+        self._cause_scheduled = False
+        self.ui.mark("cause", self._apply_cause)
+
+    def _apply_cause(self):
+        """Vẽ dòng nguyên nhân mới nhất (lỗi / RESULT) vào Main Cause (MAIN THREAD), bỏ qua nếu không đổi."""
+        entry = self._cause_latest
+        if entry is None or entry is self._cause_shown:
+            return
+        self._cause_shown = entry
+        msg = entry.message if isinstance(entry, LogEntry) else str(entry)
         self.cause_text.configure(state="normal")
-        self.cause_text.delete("1.0", "end")
-        if len(self.info_log_buf) > 0:
-            list_msg = self.info_log_buf[len(self.info_log_buf)-1].split("|")
-            msg = "".join(list_msg[3:7]) + "\n"
-            self.cause_text.insert("end", msg )  # tail log
+        self.cause_text.replace("1.0", "end", msg + "\n")  # tail log
         self.cause_text.configure(state="disabled")
 
+    def update_log_view(self):
+        """
+        Ghi nội dung lý do FAIL xuống ô Main Cause ở frame kế tiếp
+        (gọi nhiều lần trong 1 frame -> vẽ 1 lần).
+        """
+        self.ui.mark("log", self._refresh_log_view)
+
+    def _refresh_log_view(self):
+        # Không flush pipeline trên MAIN THREAD: vẽ những gì ring đang có,
+        # dòng log còn trong queue tới sau qua LogRing.subscribe -> _on_log_entries
+        self._apply_cause()
+
     def enable_inputs(self):
         """
         Cho phép nhập lại các ô BOOK1/BOOK2/DSN sau khi chạy xong flow.
         BOOK2 sẽ được enable/disable tuỳ theo mode 1book / 2book.
         """
+        # Unit mới -> bỏ prefetch còn sót
+        self._discard_prefetch()
+
         # mở BOOK1 + DSN cho code chỉnh sửa (DSN vẫn để readonly với user)
         self.book1_entry.configure(state="normal")
         self.dsn_entry.configure(state="normal")
@@ -1371,26 +1383,43 @@ class BookyApp(tk.Tk):
 
     # ================== INTERNAL COMMIT HELPERS ==================
     def _commit_book1(self):
-        """Lưu BOOK1 vào SN_BOOK1, disable input và focus sang BOOK2 nếu còn mở."""
-        global SN_BOOK1
-
+        """Lưu BOOK1 vào sn_book1, disable input và focus sang BOOK2 nếu còn mở."""
         value = self.get_book1()
 
-        SN_BOOK1 = value
+        self.sn_book1 = value
 
-        self.log.info(f"SN_BOOK1={SN_BOOK1}")
+        self.log.info(f"SN_BOOK1={self.sn_book1}")
+        self._auto_select_model(value)
         self.update_log_view()
         self.book1_entry.configure(state="disabled")
+        self._start_prefetch()
 
-    def _commit_book2(self):
-        """Lưu BOOK2 vào SN_BOOK2, disable input."""
-        global SN_BOOK2
+    def _auto_select_model(self, book1: str):
+        """
+        Tự chọn mã hàng theo BOOK1 (index ngược SSN2/SSN8 của config.ini).
+        Chỉ đổi khi model đang chọn không khớp và BOOK1 chỉ thuộc đúng 1 model.
+        """
+        if not book1:
+            return
+        codes = self._config.detect_models(book1, self.mode_var.get())
+        current = self.model_combo.get()
+        if current in codes:
+            return
+        if len(codes) == 1:
+            self.model_var.set(codes[0])
+            self.log.info(f"[MODEL] auto-selected {codes[0]} (was {current or '-'})")
+        elif codes:
+            self.log.warning(f"[MODEL] BOOK1={book1} matches {len(codes)} models: {', '.join(codes[:5])}")
+        else:
+            self.log.warning(f"[MODEL] BOOK1={book1} not found in any model")
 
+    def _commit_book2(self):
+        """Lưu BOOK2 vào sn_book2, disable input."""
         value = self.get_book2()
 
-        SN_BOOK2 = value
+        self.sn_book2 = value
 
-        self.log.info(f"SN_BOOK1={SN_BOOK1}")
+        self.log.info(f"SN_BOOK2={self.sn_book2}")
         self.update_log_view()
         self.book2_entry.configure(state="disabled")
 
@@ -1444,51 +1473,6 @@ class BookyApp(tk.Tk):
             self.book2_var.set(clean)
             self._commit_book2()
 
-    def _ensure_com_config(self, path: Path) -> None:
-        """
-        Đảm bảo config.ini có section [COM] với 3 key:
-        camera_com=COM5
-        sfc_com=COM7
-        golden_eye_com=COM4
-        - Nếu file chưa có: tạo mới.
-        - Nếu file có rồi: chỉ bổ sung phần thiếu, KHÔNG đụng các section model khác.
-        """
-        cfg = configparser.ConfigParser()
-        if path.exists():
-            cfg.read(path, encoding="utf-8")
-
-        changed = False
-        if not cfg.has_section("COM"):
-            cfg.add_section("COM")
-            changed = True
-
-        defaults = {
-            "camera_comscan": "COM5",
-            "sfc_com": "COM8",
-            "golden_eye_com": "COM4",
-        }
-        for k, v in defaults.items():
-            if not cfg.has_option("COM", k):
-                cfg.set("COM", k, v)
-                changed = True
-
-        if changed:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                cfg.write(f)
-
-    def _load_com_config(self, path: Path) -> None:
-        """
-        Đọc [COM] từ config.ini và gán vào self.com_*
-        """
-        cfg = configparser.ConfigParser()
-        if path.exists():
-            cfg.read(path, encoding="utf-8")
-
-        self.comscan_camera = cfg.get("COM", "camera_comscan", fallback="COM5").strip()
-        self.com_sfc = cfg.get("COM", "sfc_com", fallback="COM8").strip()
-        self.com_golden_eye = cfg.get("COM", "golden_eye_com", fallback="COM4").strip()
-
 # ========================== TKINTER GUI PARTS: END ==========================
 
 __all__ = ["BookyApp"]
\ No newline at end of file
@@ -281,6 +281,19 @@ Update API:
       -> stores (timestamp, PASS/FAIL, shift), aggregates by KPI day and hour buckets
   - Legacy: update_kpi(rep_pass=..., rep_total=..., cycle_times=[...]/avg_cycle=...)
       -> absolute counters only (no hourly/history)
+
+Persistence (optional): KPIWidget(..., journal=KPIJournal(path))
+  - every event is appended to the journal
+  - on startup the last `keep_days` KPI days are replayed into the aggregates
+
+History (numpy installed): self.store = KPIStore (columnar, `history_days` days)
+  - hourly dialog / exports query store.rollup(...) instead of the per-day dicts
+
+Repaint (optional): KPIWidget(..., scheduler=UIScheduler(root, fps=20))
+  - counters update immediately, labels + donut repaint at most once per frame
+
+Threading (optional): KPIWidget(..., bus=UIBus(root))
+  - calls from worker threads are queued on the bus instead of one after(0) each
 """
 
 from __future__ import annotations
@@ -293,6 +306,11 @@ from dataclasses import dataclass
 from datetime import datetime, date, time as dtime, timedelta
 from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
+from src.core.kpi_journal import KPIJournal, unpack_record
+from src.core.kpi_store import HAS_NUMPY, KPIStore
+from src.core.latency import CycleStats
+from src.gui.ui_scheduler import UIBus, UIScheduler
+
 try:
     from PIL import Image, ImageDraw, ImageTk  # type: ignore
     _HAS_PIL = True
@@ -300,6 +318,10 @@ except Exception:
     _HAS_PIL = False
 
 
+# quantile cycle time theo dõi cho mỗi KPI day / ca / khung giờ (P² sketch)
+_CYCLE_QUANTILES = (0.5, 0.9, 0.99)
+
+
 def _safe_avg(values: Iterable[float]) -> Optional[float]:
     vals = list(values) if values is not None else []
     return (sum(vals) / len(vals)) if vals else None
@@ -309,6 +331,72 @@ def _floor_hour(ts: datetime) -> datetime:
     return ts.replace(minute=0, second=0, microsecond=0)
 
 
+def _render_donut(size: int, pass_rate: float, base_ring: str, pass_ring: str, bg: str):
+    """Donut PIL: vẽ 4x rồi thu nhỏ LANCZOS cho viền mịn."""
+    S = 4
+    w2 = h2 = size * S
+    img = Image.new("RGBA", (w2, h2), bg)
+    dr = ImageDraw.Draw(img)
+
+    pad = 1 * S
+    ring_w = max(8 * S, 2)
+    hole_pad = max(18 * S, 6)
+
+    x0, y0 = pad, pad
+    x1, y1 = w2 - pad, h2 - pad
+
+    dr.ellipse((x0, y0, x1, y1), outline=base_ring, width=ring_w)
+
+    if pass_rate > 0:
+        start = 270
+        end = start - 360 * pass_rate
+        dr.arc((x0, y0, x1, y1), start=end, end=start, fill=pass_ring, width=ring_w)
+
+    dr.ellipse((x0 + hole_pad, y0 + hole_pad, x1 - hole_pad, y1 - hole_pad), fill=bg)
+
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
+
+class DonutImageCache:
+    """
+    LRU cache ảnh donut đã render, key = (percent nguyên | None, size, base_ring, pass_ring, bg).
+    Mỗi unit chỉ còn là 1 lần tra dict + đổi image của canvas item,
+    không vẽ PIL / tạo PhotoImage mới (hết GC churn).
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = max(int(maxsize), 1)
+        self._items: "OrderedDict[tuple, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._items
+
+    def get(self, key: tuple, factory):
+        img = self._items.get(key)
+        if img is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        img = self._items[key] = factory()
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.evictions += 1
+        return img
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
 @dataclass(frozen=True)
 class KPIEvent:
     ts: datetime
@@ -316,6 +404,7 @@ class KPIEvent:
     shift: str      # "DAY" | "NIGHT"
     kpi_day: str    # YYYY-MM-DD (KPI day key)
     cycle_time: Optional[float] = None
+    model: str = ""
 
 
 class KPIWidget(ttk.Frame):
@@ -333,6 +422,7 @@ class KPIWidget(ttk.Frame):
         text_color: str = "#222222",
         link_color: str = "#1a73e8",
         label_prefix: str = "cycle_time:",
+        tail_quantile: Optional[float] = 0.99,
         font_pct=("Segoe UI", 9, "normal"),
         font_avg=("Segoe UI", 9, "normal"),
         font_prod=("Segoe UI", 9, "normal"),
@@ -341,9 +431,15 @@ class KPIWidget(ttk.Frame):
         font_shift=("Segoe UI", 9, "normal"),
         show_hourly_line: bool = True,
         hourly_tick_ms: int = 5000,
+        donut_cache_size: int = 256,
+        prerender_donut: bool = False,
         padding: int = 0,
         keep_days: int = 3,
         keep_events_per_day: int = 500,
+        journal: Optional[KPIJournal] = None,
+        history_days: int = 90,
+        scheduler: Optional[UIScheduler] = None,
+        bus: Optional[UIBus] = None,
         **kwargs,
     ):
         super().__init__(master, padding=padding, **kwargs)
@@ -364,6 +460,13 @@ class KPIWidget(ttk.Frame):
         self._hourly_tick_ms = max(int(hourly_tick_ms), 1000)
         self._keep_days = max(int(keep_days or 1), 1)
         self._keep_events_per_day = max(int(keep_events_per_day or 50), 50)
+        self._journal = journal
+        # có scheduler -> label + donut vẽ lại tối đa 1 lần / frame thay vì mỗi event
+        self._ui = scheduler
+        self._bus = bus
+        # label: mean + quantile đuôi (p99) cycle time của KPI day; None -> chỉ mean
+        self._tail_q = tail_quantile
+        self._quantiles = tuple(sorted(set(_CYCLE_QUANTILES) | ({tail_quantile} if tail_quantile else set())))
         
         # Init styles
         self._style = ttk.Style(self)
@@ -384,8 +487,26 @@ class KPIWidget(ttk.Frame):
         self._rep_pass = 0
         self._rep_total = 0
         self._avg_cycle: Optional[float] = None
+        self._tail_cycle: Optional[float] = None
+
+        # restart giữa ca -> dựng lại sản lượng giờ / ca từ journal
+        self.replayed = self._replay_journal() if journal is not None else 0
+
+        # lịch sử dài dạng cột (numpy) cho bảng theo giờ / export
+        self.store: Optional[KPIStore] = None
+        if HAS_NUMPY:
+            self.store = KPIStore()
+            if journal is not None:
+                self.store.load_journal(journal, since=datetime.now() - timedelta(days=max(int(history_days), 1)))
 
         self._imgtk = None
+        # donut: cache PhotoImage + 2 canvas item cố định (image, text % ở giữa)
+        self._donut_cache = DonutImageCache(donut_cache_size)
+        self._prerender_donut = bool(prerender_donut) and _HAS_PIL
+        self._prerendered: set = set()
+        self._img_item = None
+        self._text_item = None
+        self._donut_shown = None
 
         # overlay dialog handle
         self._overlay: Optional[tk.Frame] = None
@@ -450,7 +571,7 @@ class KPIWidget(ttk.Frame):
         self._style.configure(self._prod_style, background=self._bg, foreground=self._text_color, font=self._font_prod)
         self._style.configure(self._shift_style, background=self._bg, foreground=self._text_color, font=self._font_shift)
 
-        self.donut.bind("<Configure>", lambda e: self._redraw())
+        self.donut.bind("<Configure>", lambda e: self._request_redraw())
         self.after_idle(self._sync_from_active_day)
 
         # periodic tick: update "current hour" line + handle KPI day rollover at 07:30
@@ -488,6 +609,7 @@ class KPIWidget(ttk.Frame):
         avg_cycle: Optional[float] = None,
         # time injection (testing)
         ts: Optional[datetime] = None,
+        model: str = "",
     ) -> None:
         """
         Preferred (event mode):
@@ -499,11 +621,11 @@ class KPIWidget(ttk.Frame):
 
         # Thread-safe: if called from worker thread, bounce to main thread
         if threading.current_thread() is not threading.main_thread():
-            self.after(0, lambda: self.update_kpi(
+            self._to_main(lambda: self.update_kpi(
                 ok,
                 rep_pass=rep_pass, rep_total=rep_total,
                 cycle_time=cycle_time, cycle_times=cycle_times, avg_cycle=avg_cycle,
-                ts=ts
+                ts=ts, model=model,
             ))
             return
 
@@ -513,11 +635,11 @@ class KPIWidget(ttk.Frame):
             self._rep_total = int(rep_total or 0)
             if avg_cycle is None and cycle_times is not None:
                 avg_cycle = _safe_avg(cycle_times)
-            self._avg_cycle = avg_cycle
-            self._update_avg_label()
-            self._update_shift_label()
-            self._update_current_hour_label()
-            self.after_idle(self._redraw)
+            if avg_cycle is not None:
+                self._avg_cycle, self._tail_cycle = avg_cycle, None
+            else:
+                self._load_cycle_stats()
+            self._request_view()
             return
 
         # event mode
@@ -527,11 +649,69 @@ class KPIWidget(ttk.Frame):
         ts = ts or datetime.now()
 
         day_key, shift = self._calc_day_and_shift(ts)
-        self._ensure_day(day_key)
+        if self._journal is not None:
+            self._journal.append(ts, bool(ok), shift, cycle_time, model)
+        if self.store is not None:
+            self.store.append(ts, bool(ok), cycle_time, model)
+        self._add_event(KPIEvent(
+            ts=ts, ok=bool(ok), shift=shift, kpi_day=day_key, cycle_time=cycle_time, model=model,
+        ))
 
-        ev = KPIEvent(ts=ts, ok=bool(ok), shift=shift, kpi_day=day_key, cycle_time=cycle_time)
+        # switch active day if needed
+        if day_key != self._active_day:
+            self._active_day = day_key
+
+        self._load_active_counters()
+        self._request_view()
+
+    def add_cycle_time(self, cycle_time: float, *, ts: Optional[datetime] = None) -> None:
+        """
+        Cycle time của unit KHÔNG tính vào KPI (vd. FAIL bị bỏ qua): chỉ vào sketch
+        cycle time của ngày / ca / khung giờ, sản lượng giữ nguyên.
+        Không ghi journal -> restart chỉ dựng lại cycle time của các event đã tính.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            self._to_main(lambda: self.add_cycle_time(cycle_time, ts=ts))
+            return
+
+        ts = ts or datetime.now()
+        day_key, shift = self._calc_day_and_shift(ts)
+        day, bucket, _, sbk = self._event_slots(day_key, shift, ts)
+        self._add_cycle(day, bucket, sbk, float(cycle_time))
 
+        if day_key != self._active_day:
+            self._active_day = day_key
+            self._load_active_counters()
+        else:
+            self._load_cycle_stats()
+        self._request_view()
+
+    def _to_main(self, callback) -> None:
+        """Chuyển callback về main thread: qua bus (FIFO chung với app) nếu có, không thì after(0)."""
+        if self._bus is not None:
+            self._bus.post(callback)
+        else:
+            self.after(0, callback)
+
+    def recent_events(self) -> List[KPIEvent]:
+        """Last `keep_events_per_day` events of the active KPI day (oldest first)."""
+        day = self._days.get(self._active_day)
+        return list(day["events"]) if day else []
+
+    def _event_slots(self, day_key: str, shift: str, ts: datetime) -> Tuple[dict, dict, dict, dict]:
+        """(day, shift totals, clock-hour stats, shift/hour bucket stats) that ts counts into."""
+        self._ensure_day(day_key)
         day = self._days[day_key]
+        # "current clock-hour" (HH:00-HH+1:00)
+        hmap: Dict[datetime, dict] = day["clock_hours"]
+        h = hmap.setdefault(_floor_hour(ts), {"total": 0, "pass": 0})
+        # shift/hour bucket (for dialog)
+        sb: "OrderedDict[str, dict]" = day["shift_buckets"][shift]
+        return day, day["stats"][shift], h, sb[self._find_shift_bucket_label(day_key, shift, ts)]
+
+    def _add_event(self, ev: KPIEvent) -> None:
+        """Aggregate 1 event into its KPI day (no UI update)."""
+        day, bucket, h, sbk = self._event_slots(ev.kpi_day, ev.shift, ev.ts)
 
         # store events (for "last N events" / debug)
         events: Deque[KPIEvent] = day["events"]
@@ -539,35 +719,79 @@ class KPIWidget(ttk.Frame):
         while len(events) > self._keep_events_per_day:
             events.popleft()
 
-        # aggregate shift totals
-        bucket = day["stats"][shift]
         bucket["total"] += 1
-        if ev.ok:
-            bucket["pass"] += 1
-        if cycle_time is not None:
-            bucket["sum_cycle"] += float(cycle_time)
-            bucket["n_cycle"] += 1
-
-        # aggregate "current clock-hour" (HH:00-HH+1:00)
-        hour_start = _floor_hour(ts)
-        hmap: Dict[datetime, dict] = day["clock_hours"]
-        h = hmap.setdefault(hour_start, {"total": 0, "pass": 0})
         h["total"] += 1
+        sbk["total"] += 1
         if ev.ok:
+            bucket["pass"] += 1
             h["pass"] += 1
+            sbk["pass"] += 1
+        if ev.cycle_time is not None:
+            self._add_cycle(day, bucket, sbk, float(ev.cycle_time))
 
-        # aggregate shift/hour bucket (for dialog)
-        label = self._find_shift_bucket_label(day_key, shift, ts)
-        sb: "OrderedDict[str, dict]" = day["shift_buckets"][shift]
-        sb[label]["total"] += 1
-        if ev.ok:
-            sb[label]["pass"] += 1
-
-        # switch active day if needed
-        if day_key != self._active_day:
-            self._active_day = day_key
+    @staticmethod
+    def _add_cycle(day: dict, bucket: dict, sbk: dict, x: float) -> None:
+        day["cycle"].add(x)
+        bucket["cycle"].add(x)
+        sbk["cycle"].add(x)
 
-        self._sync_from_active_day()
+    def _replay_journal(self) -> int:
+        """
+        Replay journal events of the kept KPI days (oldest kept day 07:30 -> now).
+        Mọi biên bucket (giờ, ca) đều tròn phút -> chỉ tính slot 1 lần mỗi phút,
+        KPIEvent chỉ dựng cho `keep_events_per_day` event cuối mỗi ngày.
+        """
+        first_day = datetime.fromisoformat(self._active_day).date() - timedelta(days=self._keep_days - 1)
+        since = datetime.combine(first_day, self._DAY_START)
+        tails: Dict[str, Deque] = {}
+        # cycle time gom theo sketch, cuối cùng CycleStats.extend 1 lần (sort + đặt marker)
+        samples: Dict[int, Tuple[CycleStats, List[float]]] = {}
+
+        def pending(stats: CycleStats) -> List[float]:
+            return samples.setdefault(id(stats), (stats, []))[1]
+
+        minute = None
+        n = 0
+        for raw in self._journal.iter_raw(since=since):
+            ts_ms, ok, _, cycle_time, _ = raw
+            if ts_ms // 60000 != minute:
+                minute = ts_ms // 60000
+                ts_min = datetime.fromtimestamp(minute * 60)
+                day_key, shift = self._calc_day_and_shift(ts_min)
+                day, bucket, h, sbk = self._event_slots(day_key, shift, ts_min)
+                day_vals, shift_vals, hour_vals = pending(day["cycle"]), pending(bucket["cycle"]), pending(sbk["cycle"])
+                tail = tails.get(day_key)
+                if tail is None:
+                    tail = tails[day_key] = deque(maxlen=self._keep_events_per_day)
+            bucket["total"] += 1
+            h["total"] += 1
+            sbk["total"] += 1
+            if ok:
+                bucket["pass"] += 1
+                h["pass"] += 1
+                sbk["pass"] += 1
+            if cycle_time == cycle_time:  # NaN = không có cycle time
+                day_vals.append(cycle_time)
+                shift_vals.append(cycle_time)
+                hour_vals.append(cycle_time)
+            tail.append((raw, shift))
+            n += 1
+        for stats, values in samples.values():
+            stats.extend(values)
+
+        for day_key, tail in tails.items():
+            if day_key not in self._days:
+                continue
+            events = self._days[day_key]["events"]
+            for raw, shift in tail:
+                rec = unpack_record(raw)
+                events.append(KPIEvent(
+                    ts=rec.ts, ok=rec.ok, shift=shift, kpi_day=day_key,
+                    cycle_time=rec.cycle_time, model=rec.model,
+                ))
+        # active day giữ nguyên theo đồng hồ hiện tại (đã qua 07:30 -> ngày mới rỗng)
+        self._load_active_counters()
+        return n
 
     def set_theme(
         self,
@@ -601,7 +825,7 @@ class KPIWidget(ttk.Frame):
             self.more_lbl.configure(foreground=text_color, background=self._bg)
             self.prod_lbl.configure(foreground=text_color, background=self._bg)
 
-        self.after_idle(self._redraw)
+        self._request_redraw()
 
     def set_show_shift_summary(self, show: bool) -> None:
         self._show_shift_summary = bool(show)
@@ -621,7 +845,7 @@ class KPIWidget(ttk.Frame):
         """Open nested overlay dialog (covers app window)."""
         # Thread-safe
         if threading.current_thread() is not threading.main_thread():
-            self.after(0, self.open_hourly_dialog)
+            self._to_main(self.open_hourly_dialog)
             return
 
         if self._overlay is not None and self._overlay.winfo_exists():
@@ -682,7 +906,7 @@ class KPIWidget(ttk.Frame):
         self._overlay = None
 
     def _build_hourly_table(self, parent: ttk.Frame, *, shift: str) -> None:
-        cols = ("time", "pass", "fail", "total", "yield")
+        cols = ("time", "pass", "fail", "total", "yield", "avg", "p90", "p99")
         tree = ttk.Treeview(parent, columns=cols, show="headings", height=12)
         tree.pack(side="left", fill="both", expand=True)
 
@@ -695,12 +919,22 @@ class KPIWidget(ttk.Frame):
         tree.heading("fail", text="FAIL")
         tree.heading("total", text="TOTAL")
         tree.heading("yield", text="Yield")
+        tree.heading("avg", text="CT avg")
+        tree.heading("p90", text="CT p90")
+        tree.heading("p99", text="CT p99")
 
         tree.column("time", width=160, anchor="w")
         tree.column("pass", width=70, anchor="e")
         tree.column("fail", width=70, anchor="e")
         tree.column("total", width=70, anchor="e")
         tree.column("yield", width=70, anchor="e")
+        for col in ("avg", "p90", "p99"):
+            tree.column(col, width=64, anchor="e")
+
+        def _ct(stats: CycleStats) -> Tuple[str, str, str]:
+            """Cycle time (giây) của khung giờ / ca: mean + quantile P²."""
+            vals = (stats.mean, stats.quantile(0.9), stats.quantile(0.99))
+            return tuple("-" if v is None else f"{v:.2f}" for v in vals)
 
         # Pull buckets (pre-filled ordered)
         day = self._days.get(self._active_day)
@@ -708,20 +942,31 @@ class KPIWidget(ttk.Frame):
             return
 
         sb: "OrderedDict[str, dict]" = day["shift_buckets"][shift]
+        counts = [(int(st["pass"]), int(st["total"])) for st in sb.values()]
+        if self.store is not None:
+            counts = self._store_shift_counts(self._active_day, shift, len(counts))
         p_sum = 0
         t_sum = 0
-        for label, st in sb.items():
-            p = int(st["pass"])
-            t = int(st["total"])
+        for (label, st), (p, t) in zip(sb.items(), counts):
             f = t - p
             y = (p / t * 100.0) if t > 0 else 100.0
-            tree.insert("", "end", values=(label, p, f, t, f"{y:.1f}%"))
+            tree.insert("", "end", values=(label, p, f, t, f"{y:.1f}%", *_ct(st["cycle"])))
             p_sum += p
             t_sum += t
 
         f_sum = t_sum - p_sum
         y_sum = (p_sum / t_sum * 100.0) if t_sum > 0 else 100.0
-        tree.insert("", "end", values=("— Tổng", p_sum, f_sum, t_sum, f"{y_sum:.1f}%"))
+        tree.insert("", "end", values=("— Tổng", p_sum, f_sum, t_sum, f"{y_sum:.1f}%", *_ct(day["stats"][shift]["cycle"])))
+
+    def _store_shift_counts(self, day_key: str, shift: str, n_slots: int) -> List[Tuple[int, int]]:
+        """[(pass, total)] từng khung giờ của 1 ca, rollup từ KPIStore (slot 0 = khung đầu ca)."""
+        start = datetime.combine(datetime.fromisoformat(day_key).date(), self._DAY_START)
+        counts = [(0, 0)] * n_slots
+        for row in self.store.rollup("shift_hour", since=start, until=start + timedelta(days=1)).rows():
+            _, row_shift, slot = row.key
+            if row_shift == shift and slot < n_slots:
+                counts[slot] = (row.passed, row.total)
+        return counts
 
     # ===== internal: day structures =====
     def _ensure_day(self, day_key: str) -> None:
@@ -743,8 +988,13 @@ class KPIWidget(ttk.Frame):
         labels_day = self._boundaries_to_labels(boundaries_day)
         labels_night = self._boundaries_to_labels(boundaries_night)
 
-        shift_buckets_day: "OrderedDict[str, dict]" = OrderedDict((lb, {"pass": 0, "total": 0}) for lb in labels_day)
-        shift_buckets_night: "OrderedDict[str, dict]" = OrderedDict((lb, {"pass": 0, "total": 0}) for lb in labels_night)
+        q = self._quantiles
+        shift_buckets_day: "OrderedDict[str, dict]" = OrderedDict(
+            (lb, {"pass": 0, "total": 0, "cycle": CycleStats(q)}) for lb in labels_day
+        )
+        shift_buckets_night: "OrderedDict[str, dict]" = OrderedDict(
+            (lb, {"pass": 0, "total": 0, "cycle": CycleStats(q)}) for lb in labels_night
+        )
 
         self._days[day_key] = {
             "events": deque(),
@@ -752,9 +1002,10 @@ class KPIWidget(ttk.Frame):
             "bucket_boundaries": {"DAY": boundaries_day, "NIGHT": boundaries_night},
             "shift_buckets": {"DAY": shift_buckets_day, "NIGHT": shift_buckets_night},
             "stats": {
-                "DAY": {"total": 0, "pass": 0, "sum_cycle": 0.0, "n_cycle": 0},
-                "NIGHT": {"total": 0, "pass": 0, "sum_cycle": 0.0, "n_cycle": 0},
+                "DAY": {"total": 0, "pass": 0, "cycle": CycleStats(q)},
+                "NIGHT": {"total": 0, "pass": 0, "cycle": CycleStats(q)},
             },
+            "cycle": CycleStats(q),  # cả KPI day (P² không gộp được 2 ca)
         }
 
         while len(self._days) > self._keep_days:
@@ -813,6 +1064,29 @@ class KPIWidget(ttk.Frame):
 
     # ===== internal: sync UI =====
     def _sync_from_active_day(self) -> None:
+        self._load_active_counters()
+        self._refresh_view()
+
+    def _refresh_view(self) -> None:
+        self._update_avg_label()
+        self._update_shift_label()
+        self._update_current_hour_label()
+        self._request_redraw()
+
+    def _request_view(self) -> None:
+        """Label + donut: gộp theo frame nếu có scheduler, không thì vẽ ngay."""
+        if self._ui is not None:
+            self._ui.mark(("kpi.view", id(self)), self._refresh_view, widget=self)
+        else:
+            self._refresh_view()
+
+    def _request_redraw(self) -> None:
+        if self._ui is not None:
+            self._ui.mark(("kpi.donut", id(self)), self._redraw, widget=self)
+        else:
+            self.after_idle(self._redraw)
+
+    def _load_active_counters(self) -> None:
         self._ensure_day(self._active_day)
         stats = self._days[self._active_day]["stats"]
 
@@ -820,20 +1094,22 @@ class KPIWidget(ttk.Frame):
         passed = stats["DAY"]["pass"] + stats["NIGHT"]["pass"]
         self._rep_total = int(total)
         self._rep_pass = int(passed)
+        self._load_cycle_stats()
 
-        sum_cycle = stats["DAY"]["sum_cycle"] + stats["NIGHT"]["sum_cycle"]
-        n_cycle = stats["DAY"]["n_cycle"] + stats["NIGHT"]["n_cycle"]
-        self._avg_cycle = (sum_cycle / n_cycle) if n_cycle > 0 else None
-
-        self._update_avg_label()
-        self._update_shift_label()
-        self._update_current_hour_label()
-        self.after_idle(self._redraw)
+    def _load_cycle_stats(self) -> None:
+        self._ensure_day(self._active_day)
+        cycle: CycleStats = self._days[self._active_day]["cycle"]
+        self._avg_cycle = cycle.mean
+        self._tail_cycle = cycle.quantile(self._tail_q) if self._tail_q else None
 
     def _update_avg_label(self) -> None:
-        self.avg_var.set(
-            f"{self._label_prefix} {self._avg_cycle:.3f} s" if self._avg_cycle is not None else f"{self._label_prefix} --.- s"
-        )
+        if self._avg_cycle is None:
+            self.avg_var.set(f"{self._label_prefix} --.- s")
+            return
+        text = f"{self._label_prefix} {self._avg_cycle:.3f} s"
+        if self._tail_cycle is not None:
+            text += f" | p{self._tail_q * 100:g} {self._tail_cycle:.2f} s"
+        self.avg_var.set(text)
 
     def _update_shift_label(self) -> None:
         if not self._show_shift_summary:
@@ -846,10 +1122,14 @@ class KPIWidget(ttk.Frame):
         def _rate(p: int, t: int) -> float:
             return (p / t * 100.0) if t > 0 else 100.0
 
+        def _tail(st: dict) -> str:
+            tail = st["cycle"].quantile(self._tail_q) if self._tail_q else None
+            return f" p{self._tail_q * 100:g} {tail:.2f}s" if tail is not None else ""
+
         self.shift_var.set(
             f"{self._active_day} | "
-            f"DAY {s_day['pass']}/{s_day['total']} ({_rate(s_day['pass'], s_day['total']):.1f}%)  | "
-            f"NIGHT {s_night['pass']}/{s_night['total']} ({_rate(s_night['pass'], s_night['total']):.1f}%)"
+            f"DAY {s_day['pass']}/{s_day['total']} ({_rate(s_day['pass'], s_day['total']):.1f}%){_tail(s_day)}  | "
+            f"NIGHT {s_night['pass']}/{s_night['total']} ({_rate(s_night['pass'], s_night['total']):.1f}%){_tail(s_night)}"
         )
 
     def _update_current_hour_label(self) -> None:
@@ -928,59 +1208,37 @@ class KPIWidget(ttk.Frame):
         pass_rate = min(max(pass_rate, 0.0), 1.0)
         pass_pct = int(round(pass_rate * 100)) if total > 0 else None
 
-        self.donut.delete("all")
-
         if _HAS_PIL:
-            S = 4
-            w2, h2 = W * S, H * S
-            img = Image.new("RGBA", (w2, h2), self._bg)
-            dr = ImageDraw.Draw(img)
-
-            pad = 1 * S
-            ring_w = max(8 * S, 2)
-            hole_pad = max(18 * S, 6)
+            self._show_cached_donut(size, pass_pct)
+            return
 
-            x0, y0 = pad, pad
-            x1, y1 = w2 - pad, h2 - pad
+        self.donut.delete("all")
 
-            dr.ellipse((x0, y0, x1, y1), outline=self._base_ring, width=ring_w)
+        pad = 2
+        ring_w = max(min(W, H) // 6, 6)
+        hole_pad = max(min(W, H) // 3, 16)
 
-            if total > 0 and pass_rate > 0:
-                start = 270
-                end = start - 360 * pass_rate
-                dr.arc((x0, y0, x1, y1), start=end, end=start, fill=self._pass_ring, width=ring_w)
+        x0, y0 = pad, pad
+        x1, y1 = W - pad, H - pad
 
-            dr.ellipse((x0 + hole_pad, y0 + hole_pad, x1 - hole_pad, y1 - hole_pad), fill=self._bg)
+        self.donut.create_oval(x0, y0, x1, y1, outline=self._base_ring, width=ring_w)
 
-            img_small = img.resize((W, H), Image.Resampling.LANCZOS)
-            self._imgtk = ImageTk.PhotoImage(img_small)
-            self.donut.create_image(0, 0, anchor="nw", image=self._imgtk)
-        else:
-            pad = 2
-            ring_w = max(min(W, H) // 6, 6)
-            hole_pad = max(min(W, H) // 3, 16)
-
-            x0, y0 = pad, pad
-            x1, y1 = W - pad, H - pad
-
-            self.donut.create_oval(x0, y0, x1, y1, outline=self._base_ring, width=ring_w)
-
-            if total > 0 and pass_rate > 0:
-                extent = -360 * pass_rate
-                self.donut.create_arc(
-                    x0, y0, x1, y1,
-                    start=90,
-                    extent=extent,
-                    style="arc",
-                    outline=self._pass_ring,
-                    width=ring_w,
-                )
-
-            self.donut.create_oval(
-                x0 + hole_pad, y0 + hole_pad, x1 - hole_pad, y1 - hole_pad,
-                outline=self._bg, fill=self._bg
+        if total > 0 and pass_rate > 0:
+            extent = -360 * pass_rate
+            self.donut.create_arc(
+                x0, y0, x1, y1,
+                start=90,
+                extent=extent,
+                style="arc",
+                outline=self._pass_ring,
+                width=ring_w,
             )
 
+        self.donut.create_oval(
+            x0 + hole_pad, y0 + hole_pad, x1 - hole_pad, y1 - hole_pad,
+            outline=self._bg, fill=self._bg
+        )
+
         self.donut.create_text(
             W / 2, H / 2,
             text=f"{pass_pct}%" if pass_pct is not None else "--%",
@@ -988,5 +1246,65 @@ class KPIWidget(ttk.Frame):
             font=self._font_pct,
         )
 
+    # ===== donut render cache (PIL) =====
+    def _show_cached_donut(self, size: int, pass_pct: Optional[int]) -> None:
+        """Lấy PhotoImage từ cache rồi đổi image / text của 2 canvas item có sẵn (không vẽ lại)."""
+        key = (pass_pct, size, self._base_ring, self._pass_ring, self._bg)
+        shown = (key, self._text_color, self._font_pct)
+        if shown == self._donut_shown:
+            return
+
+        img = self._donut_cache.get(key, lambda: self._make_donut_image(key))
+        self._imgtk = img   # giữ ref ảnh đang hiển thị (kể cả khi bị LRU đẩy ra)
+        text = f"{pass_pct}%" if pass_pct is not None else "--%"
+        if self._img_item is None:
+            self.donut.delete("all")
+            self._img_item = self.donut.create_image(0, 0, anchor="nw", image=img)
+            self._text_item = self.donut.create_text(
+                size / 2, size / 2, text=text, fill=self._text_color, font=self._font_pct,
+            )
+        else:
+            self.donut.itemconfigure(self._img_item, image=img)
+            self.donut.itemconfigure(self._text_item, text=text, fill=self._text_color, font=self._font_pct)
+            self.donut.coords(self._text_item, size / 2, size / 2)
+        self._donut_shown = shown
+
+        if self._prerender_donut:
+            self._start_prerender(key)
+
+    def _make_donut_image(self, key: tuple):
+        pass_pct, size, base_ring, pass_ring, bg = key
+        return ImageTk.PhotoImage(
+            _render_donut(size, (pass_pct or 0) / 100.0, base_ring, pass_ring, bg), master=self,
+        )
+
+    def _start_prerender(self, key: tuple) -> None:
+        """Lần đầu gặp (size, màu) -> vẽ sẵn 0..100% lúc rảnh, ưu tiên % gần giá trị hiện tại."""
+        pass_pct, *style = key
+        style = tuple(style)
+        if style in self._prerendered:
+            return
+        self._prerendered.add(style)
+        center = pass_pct if pass_pct is not None else 100
+        todo = [None] + sorted(range(101), key=lambda p: abs(p - center))
+        self.after_idle(self._prerender_step, style, todo)
+
+    def _prerender_step(self, style: tuple, todo: List[Optional[int]], chunk: int = 4) -> None:
+        try:
+            if not self.winfo_exists():
+                return
+        except Exception:
+            return
+        for _ in range(min(chunk, len(todo))):
+            key = (todo.pop(0), *style)
+            if key not in self._donut_cache:
+                self._donut_cache.get(key, lambda: self._make_donut_image(key))
+        if todo:
+            self.after_idle(self._prerender_step, style, todo, chunk)
+
+    @property
+    def donut_cache(self) -> "DonutImageCache":
+        return self._donut_cache
+
 
-__all__ = ["KPIWidget", "KPIEvent"]
+__all__ = ["KPIWidget", "KPIEvent", "DonutImageCache"]
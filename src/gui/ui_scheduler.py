@@ -0,0 +1,269 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+# ========================== UI SCHEDULER: START ==========================
+_log = logging.getLogger(__name__)
+
+
+class UIScheduler:
+    """
+    Gom các lần vẽ lại UI theo frame: widget chỉ đánh dấu "dirty",
+    mỗi frame (mặc định 20 Hz) mỗi key chạy callback vẽ lại tối đa 1 lần.
+
+    - mark() lần nữa khi key đang chờ -> gộp (coalesced), chỉ giữ callback mới nhất
+      và đưa key xuống cuối hàng -> thứ tự vẽ trong frame = thứ tự mark cuối cùng.
+    - Callback mark trong lúc đang vẽ frame chạy luôn trong frame đó nếu key chưa
+      chạy ở frame này; key tự mark lại chính nó -> sang frame sau (không lặp vô hạn).
+    - widget truyền vào mark() đã bị destroy lúc tới frame -> bỏ (dropped).
+
+    Chỉ gọi từ MAIN THREAD (Tk).
+
+    Usage:
+        ui = UIScheduler(root, fps=20)
+        ui.mark("status", self._apply_status)
+        ui.mark(("kpi", id(kpi)), kpi._refresh_view, widget=kpi)
+        ui.stats()   # {"marks":..., "coalesced":..., "dropped":..., ...}
+    """
+
+    def __init__(self, root, fps: float = 20.0):
+        self.root = root
+        self.interval = 1.0 / max(float(fps), 1.0)
+        self._dirty: Dict[Hashable, Tuple[Callable[[], None], Optional[object]]] = {}
+        self._job = None
+        self._last_frame = 0.0
+        self._due = 0.0
+        self._closed = False
+        self._in_frame = False
+        # counters
+        self.marks = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.repaints = 0
+        self.errors = 0
+        self.frames = 0
+        self.late_frames = 0
+
+    @property
+    def fps(self) -> float:
+        return 1.0 / self.interval
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def mark(self, key: Hashable, callback: Callable[[], None], *, widget=None) -> None:
+        """Đánh dấu `key` cần vẽ lại; callback chạy ở frame kế tiếp."""
+        if self._closed:
+            return
+        self.marks += 1
+        if self._dirty.pop(key, None) is not None:
+            self.coalesced += 1
+        self._dirty[key] = (callback, widget)
+        if self._job is None and not self._in_frame:
+            now = time.monotonic()
+            self._due = max(now, self._last_frame + self.interval)
+            self._job = self.root.after(int((self._due - now) * 1000), self._frame)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Bỏ lần vẽ đang chờ của `key` (tính vào dropped)."""
+        if self._dirty.pop(key, None) is None:
+            return False
+        self.dropped += 1
+        return True
+
+    def flush(self) -> int:
+        """Vẽ ngay các key đang chờ (không đợi tới frame), trả số callback đã chạy."""
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass
+        return self._frame()
+
+    def _frame(self) -> int:
+        if self._in_frame:
+            return 0
+        self._job = None
+        now = time.monotonic()
+        if self._due and now - self._due > self.interval:
+            self.late_frames += 1   # Tk thread bị block > 1 frame
+        self._last_frame = now
+        self.frames += 1
+
+        self._in_frame = True
+        ran = set()
+        count = 0
+        deferred: Dict[Hashable, Tuple[Callable[[], None], Optional[object]]] = {}
+        try:
+            while self._dirty:
+                key = next(iter(self._dirty))
+                entry = self._dirty.pop(key)
+                if key in ran:
+                    deferred[key] = entry   # tự mark lại -> frame sau
+                    continue
+                ran.add(key)
+                callback, widget = entry
+                if widget is not None and not _alive(widget):
+                    self.dropped += 1
+                    continue
+                try:
+                    callback()
+                except Exception:
+                    self.errors += 1
+                    _log.exception("UI repaint %r failed", key)
+                count += 1
+        finally:
+            self._in_frame = False
+            self.repaints += count
+
+        if deferred and not self._closed:
+            self._dirty = deferred
+            self._due = now + self.interval
+            self._job = self.root.after(int(self.interval * 1000), self._frame)
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "marks": self.marks,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "repaints": self.repaints,
+            "errors": self.errors,
+            "frames": self.frames,
+            "late_frames": self.late_frames,
+            "pending": len(self._dirty),
+        }
+
+    def close(self) -> None:
+        """Ngừng lên lịch; các key còn chờ tính vào dropped."""
+        self._closed = True
+        self.dropped += len(self._dirty)
+        self._dirty.clear()
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+
+
+def _alive(widget) -> bool:
+    try:
+        return bool(widget.winfo_exists())
+    except Exception:
+        return False
+# ========================== UI SCHEDULER: END ==========================
+
+# ========================== UI BUS: START ==========================
+class UIBus:
+    """
+    Hàng đợi worker thread -> Tk thread: worker post(callback, *args),
+    Tk thread rút theo lô trên 1 tick định kỳ (`poll_ms`) thay vì mỗi callback 1 after(0).
+
+    - Thứ tự chạy = thứ tự post (FIFO chung cho KPI / log / status) -> xác định.
+    - Mỗi tick chạy tối đa `max_batch` callback, còn lại để tick sau
+      (burst lớn không giữ Tk thread quá lâu).
+    - post() từ Tk thread cũng đi qua hàng đợi (giữ thứ tự với các post từ worker);
+      call() chạy ngay nếu đang ở Tk thread.
+
+    Usage:
+        bus = UIBus(root, poll_ms=10)
+        bus.post(on_done, result, error)    # worker thread
+        bus.stats()   # {"posted":..., "delivered":..., "batches":..., ...}
+        bus.close()
+    """
+
+    def __init__(self, root, poll_ms: int = 10, max_batch: int = 500):
+        self.root = root
+        self.poll_ms = max(int(poll_ms), 1)
+        self.max_batch = max(int(max_batch), 1)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._ui_thread = threading.current_thread()
+        self._closed = False
+        # counters (posted: mọi thread, còn lại: chỉ Tk thread)
+        self._count_lock = threading.Lock()
+        self.posted = 0
+        self.delivered = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_seen = 0
+        self._job = self.root.after(self.poll_ms, self._tick)
+
+    def post(self, callback, *args) -> None:
+        """Thread-safe: callback(*args) chạy ở Tk thread trong tick kế tiếp."""
+        if self._closed:
+            return
+        with self._count_lock:
+            self.posted += 1
+        self._queue.put((callback, args))
+
+    def call(self, callback, *args) -> None:
+        """Đang ở Tk thread -> chạy ngay, không thì post()."""
+        if threading.current_thread() is self._ui_thread:
+            callback(*args)
+        else:
+            self.post(callback, *args)
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """Chạy các callback đang chờ (tối đa `limit`), trả số callback đã chạy. Tk thread."""
+        limit = self.max_batch if limit is None else limit
+        count = 0
+        while count < limit:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            try:
+                callback(*args)
+            except Exception:
+                self.errors += 1
+                _log.exception("UI bus callback %r failed", callback)
+        if count:
+            self.delivered += count
+            self.batches += 1
+            self.max_seen = max(self.max_seen, count)
+        return count
+
+    def _tick(self) -> None:
+        self._job = None
+        if self._closed:
+            return
+        self.drain()
+        try:
+            self._job = self.root.after(self.poll_ms, self._tick)
+        except Exception:
+            self._closed = True     # root đã destroy
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "posted": self.posted,
+            "delivered": self.delivered,
+            "errors": self.errors,
+            "batches": self.batches,
+            "max_batch": self.max_seen,
+            "backlog": self._queue.qsize(),
+        }
+
+    def close(self) -> None:
+        """Ngừng tick; callback còn trong hàng đợi bị bỏ."""
+        self._closed = True
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+# ========================== UI BUS: END ==========================
+
+__all__ = [
+    "UIScheduler",
+    "UIBus",
+]
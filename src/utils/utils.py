@@ -1,8 +1,15 @@
 import os
 import sys
+import atexit
+import gzip
+import queue
+import threading
+import time
+from collections import deque
 from pathlib import Path
 import logging
-from typing import List, Tuple
+import re
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
 
 _fmt = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
 _datefmt = "%Y-%m-%d %H:%M:%S"
@@ -34,34 +41,373 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+_STAGE_TAG = re.compile(r"^\[([A-Za-z_]+)\]")
+
+
+class LogEntry(NamedTuple):
+    """
+    1 dòng log dạng có cấu trúc (thay cho chuỗi đã format).
+    stage / dsn: lấy từ extra={"stage": ..., "dsn": ...} của lệnh log,
+    không có thì stage = tag đầu message (vd. "[PREFETCH] ..." -> "PREFETCH").
+    """
+    ts: float
+    level: int
+    logger: str
+    message: str
+    stage: str = ""
+    dsn: str = ""
+
+    @property
+    def levelname(self) -> str:
+        return logging.getLevelName(self.level)
+
+    @classmethod
+    def from_record(cls, record: logging.LogRecord) -> "LogEntry":
+        message = record.getMessage()
+        if record.exc_info:
+            message += "\n" + logging.Formatter().formatException(record.exc_info)
+        stage = getattr(record, "stage", "")
+        if not stage:
+            m = _STAGE_TAG.match(message)
+            stage = m.group(1) if m else ""
+        return cls(record.created, record.levelno, record.name, message, stage, getattr(record, "dsn", ""))
+
+    def format(self) -> str:
+        """Cùng format với _fmt (dùng khi ghi ra file / console)."""
+        return " | ".join((
+            time.strftime(_datefmt, time.localtime(self.ts)),
+            f"{self.levelname:<8}",
+            self.logger,
+            self.message,
+        ))
+
+    def __str__(self) -> str:
+        return self.format()
+
+
+class LogRing:
+    """
+    Buffer log cho GUI: giữ `capacity` dòng gần nhất trong RAM (ring buffer).
+    Dòng cũ bị đẩy ra được gom lại rồi ghi hàng loạt (mỗi `flush_batch` dòng)
+    vào file gzip trong spill_dir: log_<time>.txt.gz, mỗi file tối đa
+    `segment_records` dòng, giữ `max_segments` file mới nhất.
+    spill_dir=None -> dòng cũ bị bỏ.
+
+    Dùng như list: len(buf), buf[-1], buf.append(msg).
+    Phần tử là LogEntry (hoặc str); subscribe(cb) -> cb(list entry mới) mỗi lần ghi.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 5000,
+        spill_dir: Optional[Union[str, Path]] = None,
+        *,
+        segment_records: int = 50000,
+        max_segments: int = 20,
+        flush_batch: int = 500,
+    ):
+        self.capacity = capacity
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.flush_batch = flush_batch
+        self.total = 0
+        self.spilled = 0
+        self._ring: Deque[Union[str, LogEntry]] = deque()
+        self._subscribers: List[Callable[[List[Union[str, LogEntry]]], None]] = []
+        self._chars = 0
+        self._pending: List[str] = []
+        self._segment: Optional[Path] = None
+        self._segment_count = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _size(msg: Union[str, LogEntry]) -> int:
+        return len(msg if isinstance(msg, str) else msg.message)
+
+    # ---- list-like ----
+    def _add(self, msg: Union[str, LogEntry]) -> None:
+        self._ring.append(msg)
+        self._chars += self._size(msg)
+        self.total += 1
+        if len(self._ring) > self.capacity:
+            old = self._ring.popleft()
+            self._chars -= self._size(old)
+            if self.spill_dir is not None:
+                self._pending.append(old)
+                if len(self._pending) >= self.flush_batch:
+                    self._spill()
+
+    def append(self, msg: Union[str, LogEntry]) -> None:
+        self.extend([msg])
+
+    def subscribe(self, callback: Callable[[List[Union[str, LogEntry]]], None]) -> None:
+        """callback(entries) chạy ở thread ghi log (listener) -> phải nhanh, không đụng Tk."""
+        self._subscribers.append(callback)
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def __getitem__(self, idx: int) -> Union[str, LogEntry]:
+        with self._lock:
+            return self._ring[idx]
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._ring))
+
+    def extend(self, msgs: List[Union[str, LogEntry]]) -> None:
+        if not msgs:
+            return
+        with self._lock:
+            for msg in msgs:
+                self._add(msg)
+        for callback in self._subscribers:
+            try:
+                callback(msgs)
+            except Exception:
+                pass
+
+    def tail(self, n: int = 1) -> List[Union[str, LogEntry]]:
+        with self._lock:
+            n = min(n, len(self._ring))
+            return [self._ring[i] for i in range(len(self._ring) - n, len(self._ring))]
+
+    # ---- spill ----
+    def _spill(self) -> None:
+        if not self._pending or self.spill_dir is None:
+            return
+        lines, self._pending = self._pending, []
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            while lines:
+                if self._segment is None or self._segment_count >= self.segment_records:
+                    self._rotate()
+                room = self.segment_records - self._segment_count
+                chunk, lines = lines[:room], lines[room:]
+                # mỗi lần ghi là 1 gzip member, gzip.open("rt") đọc liền mạch
+                with gzip.open(self._segment, "at", encoding="utf-8") as f:
+                    f.write("\n".join(map(str, chunk)) + "\n")
+                self._segment_count += len(chunk)
+                self.spilled += len(chunk)
+        except OSError:
+            # disk lỗi: bỏ dòng cũ, không làm hỏng logging
+            pass
+
+    def _rotate(self) -> None:
+        name = time.strftime("log_%Y%m%d_%H%M%S")
+        path = self.spill_dir / f"{name}.txt.gz"
+        i = 1
+        while path.exists():
+            path = self.spill_dir / f"{name}_{i}.txt.gz"
+            i += 1
+        self._segment = path
+        self._segment_count = 0
+        segments = sorted(self.spill_dir.glob("log_*.txt.gz"), key=lambda p: p.stat().st_mtime)
+        for old in segments[:max(0, len(segments) - self.max_segments + 1)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def flush(self) -> None:
+        """Ghi ngay các dòng đang chờ spill (không đụng tới ring)."""
+        with self._lock:
+            self._spill()
+
+    def stats(self) -> Dict[str, int]:
+        """Số dòng + ước lượng RAM (byte) đang dùng."""
+        with self._lock:
+            return {
+                "records": len(self._ring),
+                "memory_bytes": self._chars + 49 * len(self._ring),   # ~ overhead mỗi str
+                "pending": len(self._pending),
+                "total": self.total,
+                "spilled": self.spilled,
+            }
+
+
 class ListLogHandler(logging.Handler):
-    def __init__(self, buffer: List[str]):
+    def __init__(self, buffer: Union[List[str], LogRing]):
         super().__init__()
         self._buffer = buffer
 
     def emit(self, record: logging.LogRecord):
         try:
-            msg = self.format(record)
-            self._buffer.append(msg)
+            self._buffer.append(LogEntry.from_record(record))
         except Exception as e:
             self.handleError(record)
 
-def build_log_buffer(name: str = "KinterBooky", level = logging.DEBUG) -> Tuple[logging.Logger, List[str]]:
+    def emit_batch(self, records: List[logging.LogRecord]):
+        entries = []
+        for record in records:
+            try:
+                entries.append(LogEntry.from_record(record))
+            except Exception:
+                self.handleError(record)
+        self._buffer.extend(entries)
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """StreamHandler ghi cả batch bằng 1 lần write + flush."""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        msgs = []
+        for record in records:
+            try:
+                msgs.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if not msgs:
+            return
+        try:
+            self.stream.write(self.terminator.join(msgs) + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class _EnqueueHandler(logging.Handler):
+    """Handler duy nhất gắn vào logger: chỉ đẩy record vào queue, không format, không I/O."""
+
+    def __init__(self, q: "queue.SimpleQueue"):
+        super().__init__()
+        self._queue = q
+
+    def emit(self, record: logging.LogRecord):
+        self._queue.put_nowait(record)
+
+
+class LogPipeline:
+    """
+    Logging bất đồng bộ: thread gọi log chỉ enqueue record, 1 listener thread
+    gom tối đa `batch` record mỗi lượt rồi format + ghi cho từng handler
+    (lọc theo level riêng của handler; handler có emit_batch thì ghi 1 lần).
+    """
+
+    def __init__(self, handlers: List[logging.Handler], batch: int = 256, name: str = "LogPipeline"):
+        self.handlers = list(handlers)
+        self.batch = batch
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.handler = _EnqueueHandler(self._queue)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _dispatch(self, records: List[logging.LogRecord]) -> None:
+        for h in self.handlers:
+            recs = [r for r in records if r.levelno >= h.level]
+            if not recs:
+                continue
+            if hasattr(h, "emit_batch"):
+                with h.lock:
+                    h.emit_batch(recs)
+            else:
+                for r in recs:
+                    h.handle(r)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            items = [item]
+            while len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [i for i in items if isinstance(i, logging.LogRecord)]
+            if records:
+                self._dispatch(records)
+            stop = False
+            for i in items:
+                if isinstance(i, threading.Event):
+                    i.set()
+                elif i is None:
+                    stop = True
+            if stop:
+                return
+
+    def flush(self, timeout: float = 0.5) -> bool:
+        """Chờ listener ghi xong các record đã enqueue trước đó (tối đa timeout giây)."""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put_nowait(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._thread.is_alive():
+            self._queue.put_nowait(None)
+            self._thread.join(timeout)
+
+
+# profile: (logger level, buffer RAM level, stdout level)
+LOG_PROFILES: Dict[str, Tuple[int, int, int]] = {
+    "debug": (logging.DEBUG, logging.DEBUG, logging.DEBUG),
+    # production: bỏ các dòng debug từng frame, console chỉ WARNING trở lên
+    "quiet": (logging.INFO, logging.INFO, logging.WARNING),
+}
+
+_PIPELINES: Dict[str, Tuple[LogPipeline, Tuple[str, ...]]] = {}
+
+
+def get_log_pipeline(name: str) -> Optional[LogPipeline]:
+    entry = _PIPELINES.get(name)
+    return entry[0] if entry else None
+
+
+def apply_log_profile(name: str, profile: str) -> None:
+    """Đổi level logger + từng handler theo LOG_PROFILES (vd. [LOG] profile = quiet)."""
+    entry = _PIPELINES.get(name)
+    if entry is None or profile not in LOG_PROFILES:
+        return
+    pipeline, capture = entry
+    logger_level, buffer_level, stdout_level = LOG_PROFILES[profile]
+    for logger_name in (name, *capture):
+        logging.getLogger(logger_name).setLevel(logger_level)
+    buffer_handler, stdout_handler = pipeline.handlers
+    buffer_handler.setLevel(buffer_level)
+    stdout_handler.setLevel(stdout_level)
+
+
+def build_log_buffer(
+    name: str = "KinterBooky",
+    level = logging.DEBUG,
+    capacity: int = 5000,
+    spill_dir: Optional[Union[str, Path]] = None,
+    profile: Optional[str] = None,
+    capture: Tuple[str, ...] = ("src",),
+) -> Tuple[logging.Logger, LogRing]:
+    """
+    Logger ghi ra stdout + LogRing (capacity dòng gần nhất trong RAM,
+    dòng cũ hơn spill ra spill_dir nếu có).
+    Ghi qua LogPipeline: gọi log chỉ enqueue, listener thread format + ghi.
+    capture: logger khác (vd. "src" cho log debug của src.core.*) đi chung pipeline.
+    profile: "debug" / "quiet" (LOG_PROFILES), None -> mọi handler dùng `level`.
+    """
     logger = logging.getLogger(name=name)
     logger.setLevel(level)
-    log_buffer: List[str] = []
+    log_buffer = LogRing(capacity, spill_dir)
 
     log_formatter = logging.Formatter(fmt=_fmt, datefmt=_datefmt)
     listLogHandler = ListLogHandler(log_buffer)
     listLogHandler.setFormatter(log_formatter)
     listLogHandler.setLevel(level)
 
-    stdoutLogHandler = logging.StreamHandler(sys.stdout)
+    stdoutLogHandler = BatchStreamHandler(sys.stdout)
     stdoutLogHandler.setFormatter(log_formatter)
     stdoutLogHandler.setLevel(level)
 
-    logger.addHandler(listLogHandler)
-    logger.addHandler(stdoutLogHandler)
+    pipeline = LogPipeline([listLogHandler, stdoutLogHandler], name=f"LogPipeline-{name}")
+    logger.addHandler(pipeline.handler)
+    for logger_name in capture:
+        captured = logging.getLogger(logger_name)
+        captured.setLevel(level)
+        captured.addHandler(pipeline.handler)
+        captured.propagate = False
+    _PIPELINES[name] = (pipeline, tuple(capture))
+    if profile is not None:
+        apply_log_profile(name, profile)
 
     return logger, log_buffer
 
@@ -70,5 +416,11 @@ __all__ = [
     "ASSETS_DIR",
     "get_config_path",
     "resource_path",
+    "LogEntry",
+    "LogRing",
+    "LogPipeline",
+    "LOG_PROFILES",
     "build_log_buffer",
+    "get_log_pipeline",
+    "apply_log_profile",
 ]
\ No newline at end of file
@@ -0,0 +1,52 @@
+from src.core.latency import LatencyTracker
+from src.core.station import AdaptiveTimeouts, StepTimeouts
+
+PORT = "COM8"
+
+
+def _request(adaptive: AdaptiveTimeouts, tracker: LatencyTracker, device_s: float) -> bool:
+    """1 request tới thiết bị trả lời sau device_s giây: OK nếu budget đủ dài."""
+    hist = tracker.histogram(PORT)
+    if adaptive.budget("sfc_query", PORT) >= device_s:
+        hist.record(device_s)
+        return True
+    hist.record_timeout()
+    return False
+
+
+def test_budget_backs_off_after_device_slows_down():
+    tracker = LatencyTracker()
+    adaptive = AdaptiveTimeouts(tracker, StepTimeouts(sfc_query=10.0), floor=1.0)
+    for _ in range(50):
+        assert _request(adaptive, tracker, 0.8)
+    assert adaptive.budget("sfc_query", PORT) < 3.0
+
+    results = [_request(adaptive, tracker, 3.0) for _ in range(30)]
+
+    assert not results[0]
+    assert all(results[-10:])
+
+
+def test_backoff_is_capped_at_ceiling():
+    tracker = LatencyTracker()
+    adaptive = AdaptiveTimeouts(tracker, StepTimeouts(sfc_query=10.0), floor=1.0)
+    for _ in range(20):
+        tracker.histogram(PORT).record(0.8)
+    for _ in range(20):
+        tracker.histogram(PORT).record_timeout()
+    assert adaptive.budget("sfc_query", PORT) == 10.0
+
+
+def test_cold_start_fails_fast_then_reaches_slow_device():
+    tracker = LatencyTracker()
+    adaptive = AdaptiveTimeouts(tracker, StepTimeouts(sfc_query=10.0), floor=1.0)
+    hist = tracker.histogram(PORT)
+    hist.record_timeout()
+    hist.record_timeout()
+    assert adaptive.budget("sfc_query", PORT) == 1.0
+
+    results = [_request(adaptive, tracker, 2.5) for _ in range(5)]
+
+    assert results[:2] == [False, False]
+    assert hist.count == sum(results) > 0
+    assert results[-1]
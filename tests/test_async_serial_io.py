@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+from src.core.aio import AsyncSerialIO
+from src.core.serial_pool import SerialPortPool, _PortSlot
+from src.core.serial_reader import PortResponse
+
+PORT = "COM8"
+
+
+class FakeChannel:
+    """Channel giả: trả ngay 1 frame PASS cho mọi request."""
+
+    alive = True
+
+    def submit(self, payload, until, parser=None):
+        fut = Future()
+        fut.set_result(PortResponse((b"DSN=A,PASS",), complete=True))
+        return fut
+
+    def abandon(self, future, record_latency=True):
+        return PortResponse((), complete=False)
+
+
+def _pool(monkeypatch, opened_on):
+    def ensure_open(slot, baudrate):
+        opened_on.append(threading.current_thread())
+        return FakeChannel()
+
+    monkeypatch.setattr(_PortSlot, "ensure_open", ensure_open)
+    return SerialPortPool()
+
+
+def _hold(pool: SerialPortPool, seconds: float) -> threading.Thread:
+    held = threading.Event()
+
+    def run():
+        with pool.lease(PORT):
+            held.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    held.wait()
+    return thread
+
+
+def test_waits_for_port_held_by_sync_code_and_opens_off_loop(monkeypatch):
+    opened_on = []
+    pool = _pool(monkeypatch, opened_on)
+    holder = _hold(pool, 0.2)
+    io = AsyncSerialIO(pool, log_callback=lambda msg: None)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick = asyncio.ensure_future(ticker())
+        result = await io.send_and_wait("DSN=A,END", port=PORT, read_timeout=2.0)
+        tick.cancel()
+        return result, ticks
+
+    (ok, msg), ticks = asyncio.run(main())
+    holder.join()
+
+    assert ok and msg == "DSN=A,PASS"
+    assert ticks >= 5  # loop vẫn chạy trong lúc chờ port
+    assert len(opened_on) == 2 and threading.main_thread() not in opened_on
+    assert not pool._get_slot(PORT).lock.locked()
+
+
+def test_lease_timeout_reports_busy(monkeypatch):
+    pool = _pool(monkeypatch, [])
+    holder = _hold(pool, 0.5)
+    io = AsyncSerialIO(pool, log_callback=lambda msg: None, lease_timeout=0.05)
+
+    ok, msg = asyncio.run(io.send_and_wait("DSN=A,END", port=PORT, read_timeout=2.0))
+    holder.join()
+
+    assert not ok and "busy" in msg
+    assert not pool._get_slot(PORT).lock.locked()
+
+
+def test_cancel_while_waiting_releases_port(monkeypatch):
+    pool = _pool(monkeypatch, [])
+    holder = _hold(pool, 0.2)
+    io = AsyncSerialIO(pool, log_callback=lambda msg: None)
+
+    async def main():
+        task = asyncio.ensure_future(io.send_and_wait("DSN=A,END", port=PORT, read_timeout=2.0))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0.3)  # executor lấy được port sau khi holder nhả -> phải trả lại
+
+    asyncio.run(main())
+    holder.join()
+
+    assert not pool._get_slot(PORT).lock.locked()
@@ -0,0 +1,111 @@
+import os
+from types import MappingProxyType
+
+import pytest
+
+from src.core.config_store import ConfigStore, build_ssn_index
+
+INI = """\
+[COM]
+camera_comscan = COM15
+sfc_com = COM18
+golden_eye_com = COM14
+
+[53-100252]
+SSN2 = AAA
+SSN8 = BBB
+
+[53-100253]
+SSN2 = AAA
+SSN8 = CCC
+
+[53-100254]
+SSN2 = DDD
+SSN8 = AAA
+"""
+
+
+def _write(path, text: str) -> None:
+    path.write_text(text, encoding="utf-8")
+
+
+def _bump_mtime(path) -> None:
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_snapshot_is_cached_until_file_changes(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, INI)
+    store = ConfigStore(path, check_interval=3600.0)
+    first = store.snapshot()
+    assert first.ports.sfc == "COM18"
+
+    _write(path, INI.replace("COM18", "COM28"))
+    _bump_mtime(path)
+    assert store.snapshot() is first  # còn trong check_interval -> không stat lại
+
+    store.check_interval = 0.0
+    second = store.snapshot()
+    assert second is not first
+    assert second.ports.sfc == "COM28"
+    assert second.version == first.version + 1
+    assert store.snapshot() is second  # file không đổi -> giữ snapshot cũ
+
+
+def test_missing_com_keys_are_filled_in(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, "[53-100252]\nSSN2 = AAA\n")
+    cfg = ConfigStore(path).snapshot()
+    assert cfg.ports.camera == "COM5"
+    assert "camera_comscan" in path.read_text(encoding="utf-8")
+    assert cfg.model_codes == ["53-100252"]
+
+
+def test_ssn_index_and_detect_models(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, INI)
+    cfg = ConfigStore(path).snapshot()
+
+    assert dict(cfg.ssn_index) == build_ssn_index(cfg.model_map)
+    assert cfg.ssn_index["AAA"] == ("53-100252", "53-100253", "53-100254")
+    assert cfg.detect_models("AAA") == ("53-100252", "53-100253")
+    assert cfg.detect_models(" AAA ", mode="1book") == ("53-100252", "53-100253", "53-100254")
+    assert cfg.detect_models("CCC", mode="1book") == ("53-100253",)
+    assert cfg.detect_models("CCC") == ()
+    assert cfg.detect_models("ZZZ", mode="1book") == ()
+
+
+def test_build_ssn_index_skips_empty_and_dedupes():
+    index = build_ssn_index({
+        "M1": MappingProxyType({"SSN2": "X", "SSN8": "X"}),
+        "M2": MappingProxyType({"SSN2": "", "SSN8": "Y"}),
+    })
+    assert index == {"X": ("M1",), "Y": ("M2",)}
+
+
+def test_upsert_model_updates_index(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, INI)
+    store = ConfigStore(path)
+    cfg = store.upsert_model("53-100252", "EEE", "BBB")
+
+    assert cfg.detect_models("EEE") == ("53-100252",)
+    assert cfg.ssn_index["AAA"] == ("53-100253", "53-100254")
+    assert "[COM]" in path.read_text(encoding="utf-8")
+
+
+def test_model_section_with_reserved_name_is_reported(tmp_path, caplog):
+    path = tmp_path / "config.ini"
+    _write(path, INI + "\n[UI]\nfps = 30\n\n[kpi]\nSSN2 = KKK\n")
+    with caplog.at_level("WARNING", logger="src.core.config_store"):
+        store = ConfigStore(path, check_interval=0.0)
+    cfg = store.snapshot()
+
+    assert cfg.ui_fps == 30.0
+    assert "kpi" not in cfg.model_map
+    assert [r for r in caplog.records if "[kpi]" in r.getMessage() and "reserved" in r.getMessage()]
+    assert "[UI]" not in caplog.text
+
+    with pytest.raises(ValueError):
+        store.upsert_model("UI", "AAA")
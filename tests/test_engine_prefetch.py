@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.core import SFCResult
+from src.core.engine import StationEngine
+from src.core.station import StationPorts
+
+MODEL = "53-100252"
+SSN2 = "SSN2-TEST"
+SSN8 = "SSN8-TEST"
+
+
+class FakeFixture:
+    """Camera trả DSN của unit đang nằm trên fixture; Golden Eye / SFC trả khớp DSN."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.scans = 0
+
+    def scan_camera(self):
+        self.scans += 1
+        return f"{self.dsn}\r\n".encode()
+
+    @staticmethod
+    def golden_eye_lookup(sn: str):
+        return True, "", SFCResult(sn, "PASS", {"SSN4": "USB-" + sn})
+
+    @staticmethod
+    def sfc_exchange(text: str, read_timeout: float):
+        dsn = text.split(",", 1)[0].split("=", 1)[1]
+        return True, "", SFCResult(dsn, "PASS", {"SSN4": "USB-" + dsn})
+
+
+def _engine(fixture: FakeFixture) -> StationEngine:
+    engine = StationEngine(
+        pool=object(),
+        ports=StationPorts(),
+        model_map={MODEL: {"SSN2": SSN2, "SSN8": SSN8}},
+        executor=ThreadPoolExecutor(max_workers=3),
+        log_callback=lambda msg: None,
+    )
+    engine.scan_camera = fixture.scan_camera
+    engine.golden_eye_lookup = fixture.golden_eye_lookup
+    engine.sfc_exchange = fixture.sfc_exchange
+    return engine
+
+
+def test_prefetch_same_model_back_to_back_rescans_new_unit():
+    fixture = FakeFixture("DSN-0001")
+    engine = _engine(fixture)
+    try:
+        first = engine.run_cycle(engine.new_cycle("2book", MODEL, SSN2, SSN8))
+        assert first.ok and first.dsn == "DSN-0001"
+
+        # unit sau cùng model (cùng BOOK1): prefetch bắn trước khi unit cũ được nhấc ra
+        ctx = engine.new_cycle("2book", MODEL, SSN2, SSN8)
+        engine.start_prefetch(ctx.unit_key)
+        engine._prefetch.take(timeout=1.0)
+        fixture.dsn = "DSN-0002"
+
+        second = engine.run_cycle(ctx)
+        assert second.ok
+        assert second.dsn == "DSN-0002"
+        assert not second.prefetched
+    finally:
+        engine.close()
+
+
+def test_prefetch_used_when_scan_is_new_unit():
+    fixture = FakeFixture("DSN-0001")
+    engine = _engine(fixture)
+    try:
+        engine.run_cycle(engine.new_cycle("2book", MODEL, SSN2, SSN8))
+        fixture.dsn = "DSN-0002"
+        ctx = engine.new_cycle("2book", MODEL, SSN2, SSN8)
+        engine.start_prefetch(ctx.unit_key)
+
+        result = engine.run_cycle(ctx)
+        assert result.ok and result.prefetched and result.dsn == "DSN-0002"
+    finally:
+        engine.close()
+
+
+def test_rejected_prefetch_wait_counts_toward_camera_stage():
+    fixture = FakeFixture("DSN-0001")
+    engine = _engine(fixture)
+    slow_dsn = []
+
+    def scan_camera():
+        dsn = fixture.dsn
+        if dsn in slow_dsn:
+            time.sleep(0.2)
+        return f"{dsn}\r\n".encode()
+
+    engine.scan_camera = scan_camera
+    try:
+        engine.run_cycle(engine.new_cycle("2book", MODEL, SSN2, SSN8))
+        # prefetch chậm, vẫn thấy unit cũ -> bị loại, quét lại (nhanh) unit mới
+        slow_dsn.append("DSN-0001")
+        ctx = engine.new_cycle("2book", MODEL, SSN2, SSN8)
+        engine.start_prefetch(ctx.unit_key)
+        time.sleep(0.05)
+        fixture.dsn = "DSN-0002"
+
+        result = engine.run_cycle(ctx)
+        assert result.ok and not result.prefetched and result.dsn == "DSN-0002"
+        assert result.stages["camera"] >= 0.1
+    finally:
+        engine.close()
@@ -0,0 +1,81 @@
+import pytest
+
+from src.core.serial_reader import FrameAssembler, is_status_frame
+
+
+@pytest.mark.parametrize("sep", [b"\r\n", b"\n", b"\r"])
+def test_frames_are_cut_at_cr_lf(sep):
+    asm = FrameAssembler()
+    assert asm.feed(b"GT542A01" + sep + b"DSN=A,PASS" + sep) == [b"GT542A01", b"DSN=A,PASS"]
+    assert not asm.has_partial()
+
+
+def test_empty_frames_are_dropped():
+    asm = FrameAssembler()
+    assert asm.feed(b"\r\n\r\nABC\r\n\n") == [b"ABC"]
+
+
+def test_frame_split_across_chunks():
+    asm = FrameAssembler()
+    assert asm.feed(b"DSN=A,SS") == []
+    assert asm.feed(b"N4=1,PA") == []
+    assert asm.has_partial()
+    assert asm.feed(b"SS\r") == [b"DSN=A,SSN4=1,PASS"]
+    assert asm.feed(b"\n") == []
+
+
+def test_crlf_split_between_chunks():
+    asm = FrameAssembler()
+    assert asm.feed(b"ABC\r") == [b"ABC"]
+    assert asm.feed(b"\nDEF\r\n") == [b"DEF"]
+
+
+def test_trailing_status_waits_for_idle():
+    asm = FrameAssembler()
+    assert asm.feed(b"DSN=A,FAIL") == []
+    assert asm.flush_status() == b"DSN=A,FAIL"
+    assert not asm.has_partial()
+
+
+@pytest.mark.parametrize("head, rest, frame", [
+    (b"DSN=A,FAIL", b"URE_CODE=3,PASS\r\n", b"DSN=A,FAILURE_CODE=3,PASS"),
+    (b"DSN=A,ERRO", b"R\r\n", b"DSN=A,ERROR"),
+])
+def test_status_prefix_of_longer_token_is_not_a_frame(head, rest, frame):
+    asm = FrameAssembler()
+    assert asm.feed(head) == []
+    assert asm.feed(rest) == [frame]
+
+
+def test_flush_status_keeps_non_status_partial():
+    asm = FrameAssembler()
+    asm.feed(b"DSN=A,SSN4=12")
+    assert asm.flush_status() is None
+    assert asm.has_partial()
+    assert asm.flush() == b"DSN=A,SSN4=12"
+    assert asm.flush() is None
+
+
+@pytest.mark.parametrize("partial", [b"PASS", b"x;fail", b"DSN=A|ERROR", b"DSN=A ERRO "])
+def test_flush_status_accepts_status_tokens(partial):
+    asm = FrameAssembler()
+    asm.feed(partial)
+    assert asm.flush_status() == partial
+
+
+def test_clear_drops_partial():
+    asm = FrameAssembler()
+    asm.feed(b"stale")
+    asm.clear()
+    assert asm.feed(b"fresh\n") == [b"fresh"]
+
+
+@pytest.mark.parametrize("frame, expected", [
+    (b"SFC: DSN=A,PASS", True),
+    (b"DSN=A;FAIL", True),
+    (b"ERRO", True),
+    (b"DSN=A,SSN4=BYPASS", False),
+    (b"GT542A0154530005", False),
+])
+def test_is_status_frame(frame, expected):
+    assert is_status_frame(frame) is expected
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.kpi_journal import RECORD, KPIJournal, read_records
+
+T0 = datetime(2024, 5, 1, 7, 30)
+
+
+def _fill(path, n: int) -> None:
+    journal = KPIJournal(path, fsync_interval=60.0)
+    for i in range(n):
+        journal.append(T0 + timedelta(minutes=i), i % 3 != 0, "DAY", 1.0 + i / 10, "53-100252")
+    journal.close()
+
+
+def test_replay_round_trip(tmp_path):
+    path = tmp_path / "kpi.journal"
+    _fill(path, 5)
+    journal = KPIJournal(path, fsync_interval=60.0)
+    records = list(journal.replay())
+    journal.close()
+
+    assert len(records) == 5
+    assert records[0].ts == T0
+    assert [r.ok for r in records] == [False, True, True, False, True]
+    assert records[2].cycle_time == pytest.approx(1.2)
+    assert records[4].model == "53-100252"
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    path = tmp_path / "kpi.journal"
+    _fill(path, 3)
+    whole = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD.size // 2))  # mất điện giữa lúc write
+
+    assert len(read_records(path)) == 3 * RECORD.size  # reader bỏ qua record dở
+    journal = KPIJournal(path, fsync_interval=60.0)
+    assert path.stat().st_size == whole
+    journal.append(T0 + timedelta(hours=1), True, "NIGHT")
+    records = list(journal.replay())
+    journal.close()
+
+    assert len(records) == 4
+    assert records[-1].shift == "NIGHT"
+    assert records[-1].cycle_time is None
+
+
+def test_bad_header_is_set_aside(tmp_path):
+    path = tmp_path / "kpi.journal"
+    path.write_bytes(b"not a journal at all")
+    journal = KPIJournal(path, fsync_interval=60.0)
+    assert len(journal) == 0
+    journal.close()
+
+    assert len(list(tmp_path.glob("kpi.journal.*.bad"))) == 1
+    with pytest.raises(ValueError):
+        read_records(next(tmp_path.glob("*.bad")))
+
+
+@pytest.mark.parametrize("offset", [-5, 0, 1, 17, 49, 50, 80])
+def test_read_records_since_matches_linear_scan(tmp_path, offset):
+    path = tmp_path / "kpi.journal"
+    _fill(path, 50)
+    since = T0 + timedelta(minutes=offset, seconds=30 if 0 < offset < 50 else 0)
+
+    data = read_records(path, since)
+    got = [fields[0] for fields in RECORD.iter_unpack(data)]
+    everything = [fields[0] for fields in RECORD.iter_unpack(read_records(path))]
+    cutoff = int(round(since.timestamp() * 1000.0))
+
+    assert got == [ts for ts in everything if ts >= cutoff]
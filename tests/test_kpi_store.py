@@ -0,0 +1,104 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.core.kpi_journal import KPIJournal
+from src.core.kpi_store import KPIStore
+from src.gui.gui_KPI import KPIWidget
+
+T0 = datetime(2024, 5, 1, 6, 0)
+
+
+def _events(n: int = 2000, seed: int = 7):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        ts = T0 + timedelta(seconds=rng.randrange(3 * 24 * 3600))
+        out.append((ts, rng.random() < 0.9, round(rng.uniform(0.5, 3.0), 3), rng.choice(("A", "B"))))
+    return sorted(out)
+
+
+def _store(events) -> KPIStore:
+    store = KPIStore(capacity=16)
+    for ts, ok, cycle, model in events:
+        store.append(ts, ok, cycle, model)
+    return store
+
+
+def _expected_shift_hour(ts: datetime):
+    """Slot theo đúng cách bảng theo giờ của KPIWidget chia bucket."""
+    day_key, shift = KPIWidget._calc_day_and_shift(KPIWidget, ts)
+    day = datetime.fromisoformat(day_key)
+    start = day + timedelta(hours=7, minutes=30) + (timedelta(hours=12) if shift == "NIGHT" else timedelta())
+    bounds = KPIWidget._build_hour_boundaries(KPIWidget, start, start + timedelta(hours=12))
+    slot = next(i for i in range(len(bounds) - 1) if bounds[i] <= ts < bounds[i + 1])
+    return day_key, shift, slot
+
+
+def _expected(by: str, ts: datetime):
+    if by == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if by == "day":
+        return KPIWidget._calc_kpi_day_key(KPIWidget, ts)
+    if by == "shift":
+        return KPIWidget._calc_day_and_shift(KPIWidget, ts)
+    return _expected_shift_hour(ts)
+
+
+@pytest.mark.parametrize("by", ["hour", "day", "shift", "shift_hour"])
+@pytest.mark.parametrize("ordered", [True, False])
+def test_rollup_matches_kpi_widget_buckets(by, ordered):
+    events = _events()
+    if not ordered:
+        events = events[1:] + events[:1]  # 1 event lùi giờ -> đường sort tổng quát
+    rows = _store(events).rollup(by).rows()
+
+    total = Counter(_expected(by, ts) for ts, _, _, _ in events)
+    passed = Counter(_expected(by, ts) for ts, ok, _, _ in events if ok)
+
+    assert [row.key for row in rows] == sorted(total)
+    assert {row.key: row.total for row in rows} == dict(total)
+    assert {row.key: row.passed for row in rows} == {key: passed[key] for key in total}
+
+
+def test_shift_hour_slots_cover_half_hour_edges():
+    events = [(datetime(2024, 5, 1, h, m), True, None, "A") for h, m in ((7, 30), (7, 59), (8, 0), (19, 29), (19, 30))]
+    keys = [row.key for row in _store(events).rollup("shift_hour").rows()]
+    assert keys == [
+        ("2024-05-01", "DAY", 0),
+        ("2024-05-01", "DAY", 1),
+        ("2024-05-01", "DAY", 12),
+        ("2024-05-01", "NIGHT", 0),
+    ]
+
+
+def test_rollup_filters_and_cycle_mean():
+    events = _events(500)
+    store = _store(events)
+    since, until = T0 + timedelta(days=1), T0 + timedelta(days=2)
+    rows = store.rollup("model", since=since, until=until).rows()
+
+    picked = [e for e in events if since <= e[0] < until]
+    for row in rows:
+        cycles = [cycle for _, _, cycle, model in picked if model == row.key]
+        assert row.total == len(cycles)
+        assert row.cycle_mean == pytest.approx(sum(cycles) / len(cycles), rel=1e-5)
+
+    only_a = store.rollup("day", model="A").rows()
+    assert sum(row.total for row in only_a) == sum(1 for e in events if e[3] == "A")
+
+
+def test_load_journal_round_trip(tmp_path):
+    events = _events(300)
+    journal = KPIJournal(tmp_path / "kpi.journal", fsync_interval=60.0)
+    for ts, ok, cycle, model in events:
+        journal.append(ts, ok, "DAY", cycle, model)
+    journal.close()
+
+    store = KPIStore.from_journal(tmp_path / "kpi.journal")
+    assert len(store) == len(events)
+    assert store.rollup("hour").rows() == _store(events).rollup("hour").rows()
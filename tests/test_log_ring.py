@@ -0,0 +1,87 @@
+import gzip
+import logging
+
+from src.utils.utils import LogEntry, LogRing
+
+
+def _entry(i: int) -> LogEntry:
+    return LogEntry(1_700_000_000.0 + i, logging.INFO, "booky", f"line {i}")
+
+
+def _spilled_lines(spill_dir):
+    lines = []
+    for path in sorted(spill_dir.glob("log_*.txt.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_ring_keeps_last_capacity_entries():
+    ring = LogRing(capacity=3)
+    for i in range(10):
+        ring.append(_entry(i))
+    assert len(ring) == 3
+    assert [e.message for e in ring] == ["line 7", "line 8", "line 9"]
+    assert ring[-1].message == "line 9"
+    assert [e.message for e in ring.tail(2)] == ["line 8", "line 9"]
+    assert ring.stats()["total"] == 10
+    assert ring.stats()["spilled"] == 0
+
+
+def test_spill_writes_evicted_entries_in_batches(tmp_path):
+    ring = LogRing(capacity=5, spill_dir=tmp_path, flush_batch=4)
+    ring.extend([_entry(i) for i in range(12)])
+
+    # 7 dòng bị đẩy ra: 4 đã ghi (1 batch), 3 còn chờ
+    assert ring.stats()["spilled"] == 4
+    assert ring.stats()["pending"] == 3
+    ring.flush()
+    assert ring.stats()["pending"] == 0
+
+    lines = _spilled_lines(tmp_path)
+    assert lines == [str(_entry(i)) for i in range(7)]
+    assert [e.message for e in ring] == [f"line {i}" for i in range(7, 12)]
+
+
+def test_spill_rotates_and_prunes_segments(tmp_path):
+    ring = LogRing(capacity=1, spill_dir=tmp_path, segment_records=3, max_segments=2, flush_batch=1)
+    for i in range(1 + 3 * 4):
+        ring.append(f"msg {i}")
+
+    segments = list(tmp_path.glob("log_*.txt.gz"))
+    assert len(segments) == 2
+    assert ring.spilled == 12
+    assert len(_spilled_lines(tmp_path)) == 6
+
+
+def test_no_spill_dir_drops_old_entries(tmp_path):
+    ring = LogRing(capacity=2, flush_batch=1)
+    ring.extend(["a", "b", "c"])
+    ring.flush()
+    assert list(ring) == ["b", "c"]
+    assert ring.stats()["pending"] == 0
+
+
+def test_subscribers_get_each_batch_and_errors_are_isolated():
+    ring = LogRing(capacity=10)
+    got = []
+
+    def broken(entries):
+        raise RuntimeError("subscriber bug")
+
+    ring.subscribe(broken)
+    ring.subscribe(got.append)
+    ring.append(_entry(0))
+    ring.extend([_entry(1), _entry(2)])
+    ring.extend([])
+
+    assert [[e.message for e in batch] for batch in got] == [["line 0"], ["line 1", "line 2"]]
+    assert len(ring) == 3
+
+
+def test_subscriber_sees_entry_already_in_ring():
+    ring = LogRing(capacity=10)
+    seen = []
+    ring.subscribe(lambda entries: seen.append(ring[-1] is entries[-1]))
+    ring.append(_entry(0))
+    assert seen == [True]
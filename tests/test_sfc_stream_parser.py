@@ -0,0 +1,61 @@
+from src.core.core import SFCStreamParser, parse_sfc_response
+
+
+def _feed_all(parser: SFCStreamParser, chunks):
+    results = [parser.feed(chunk) for chunk in chunks]
+    return results
+
+
+def test_status_split_across_chunks():
+    parser = SFCStreamParser()
+    assert parser.feed(b"SFC: DSN=ABC,SS") is None
+    assert parser.feed(b"N4=123,PA") is None
+    res = parser.feed(b"SS\r\n")
+    assert res.status == "PASS"
+    assert res.dsn == "ABC"
+    assert res.fields == {"DSN": "ABC", "SSN4": "123"}
+
+
+def test_status_prefix_of_longer_token_is_not_status():
+    parser = SFCStreamParser()
+    assert parser.feed(b"SFC: DSN=A,FAIL") is None
+    res = parser.feed(b"URE_CODE=3,PASS\r\n")
+    assert res.status == "PASS"
+    assert res.fields["FAILURE_CODE"] == "3"
+
+
+def test_erro_prefix_of_error_waits_for_rest():
+    parser = SFCStreamParser()
+    assert parser.feed(b"DSN=A,ERRO") is None
+    assert parser.feed(b"R") is None
+    assert parser.idle().status == "ERRO"
+
+
+def test_trailing_status_without_separator_completes_on_idle():
+    parser = SFCStreamParser()
+    assert parser.feed(b"DSN=A,PASS") is None
+    res = parser.idle()
+    assert res.status == "PASS"
+    assert parser.done
+
+
+def test_idle_keeps_waiting_on_non_status_partial():
+    parser = SFCStreamParser()
+    assert parser.feed(b"DSN=A,SSN4=1") is None
+    assert parser.idle() is None
+    assert parser.feed(b"23,FAIL\n").status == "FAIL"
+    assert parser.result().fields["SSN4"] == "123"
+
+
+def test_finish_takes_trailing_token():
+    parser = SFCStreamParser()
+    _feed_all(parser, [b"DSN=A,", b"FA", b"IL"])
+    assert parser.finish().status == "FAIL"
+
+
+def test_byte_by_byte_matches_whole_reply():
+    reply = b"SFC: DSN=XYZ|SSN2=1;SSN8=2,ERROR\r\n"
+    parser = SFCStreamParser()
+    results = _feed_all(parser, [reply[i:i + 1] for i in range(len(reply))])
+    assert results[-1] == parse_sfc_response(reply.decode(), log_callback=lambda msg: None)
+    assert results[-1].status == "ERRO"
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.core.latency import CycleStats, P2Quantile, RunningStats
+
+
+def _cycles(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    # phần lớn ~1s, đôi khi SFC treo vài giây -> đuôi dài
+    return [rng.lognormvariate(0.0, 0.25) + (rng.uniform(5, 10) if rng.random() < 0.02 else 0.0) for _ in range(n)]
+
+
+def test_running_stats_add_matches_numpy():
+    xs = _cycles(5000)
+    st = RunningStats()
+    for x in xs:
+        st.add(x)
+    assert st.count == len(xs)
+    assert st.mean == pytest.approx(np.mean(xs), rel=1e-12)
+    assert st.variance == pytest.approx(np.var(xs, ddof=1), rel=1e-9)
+    assert (st.min, st.max) == (min(xs), max(xs))
+
+
+def test_running_stats_merge_in_batches_matches_numpy():
+    xs = _cycles(5000)
+    st = RunningStats()
+    st.add(xs[0])
+    for i in range(1, len(xs), 777):
+        st.extend(xs[i:i + 777])
+    st.extend([])
+    assert st.count == len(xs)
+    assert st.mean == pytest.approx(np.mean(xs), rel=1e-12)
+    assert st.stdev == pytest.approx(np.std(xs, ddof=1), rel=1e-9)
+    assert (st.min, st.max) == (min(xs), max(xs))
+
+
+def test_running_stats_small_counts():
+    st = RunningStats()
+    assert st.variance is None and st.stdev is None
+    st.add(1.5)
+    assert st.variance is None
+    assert st.mean == 1.5
+
+
+@pytest.mark.parametrize("q, rel", [(0.5, 0.01), (0.9, 0.01), (0.99, 0.05)])
+def test_p2_streaming_tracks_numpy_quantile(q, rel):
+    xs = _cycles(20000)
+    sk = P2Quantile(q)
+    for x in xs:
+        sk.add(x)
+    assert sk.count == len(xs)
+    assert sk.value() == pytest.approx(np.quantile(xs, q), rel=rel)
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+def test_p2_extend_then_add_tracks_numpy_quantile(q):
+    xs = _cycles(20000)
+    sk = P2Quantile(q)
+    sk.extend(xs[:10000])  # replay: marker đặt thẳng từ mẫu đã sort
+    assert sk.value() == pytest.approx(np.quantile(xs[:10000], q), rel=1e-3)
+    sk.extend(xs[10000:])  # sketch đã có mẫu -> add từng mẫu
+    assert sk.count == len(xs)
+    assert sk.value() == pytest.approx(np.quantile(xs, q), rel=0.05)
+
+
+def test_p2_few_samples_are_exact_order_statistics():
+    sk = P2Quantile(0.5)
+    assert sk.value() is None
+    sk.extend([3.0, 1.0, 2.0])
+    assert sk.value() == 2.0
+
+
+def test_cycle_stats_summary():
+    xs = _cycles(3000)
+    st = CycleStats()
+    st.extend(xs[:1000])
+    for x in xs[1000:]:
+        st.add(x)
+    summary = st.summary()
+    assert summary["n"] == len(xs)
+    assert summary["mean"] == pytest.approx(np.mean(xs))
+    assert summary["max"] == max(xs)
+    assert summary["p50"] == pytest.approx(np.quantile(xs, 0.5), rel=0.02)
+    assert set(summary) == {"n", "mean", "stdev", "p50", "p90", "p99", "max"}